@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Dashboard API load benchmark.
+
+Drives every /api endpoint of dashboard.py with concurrent HTTP clients and
+reports p50/p95/p99 latency and throughput per endpoint as JSON, so results
+can be stored next to a commit and diffed later. Multi-request flows are
+timed end to end: export_job creates an export, polls it until it is done
+and downloads the workbook (jobs are deduplicated by filters and data
+version, so most runs reuse a finished job), and changes_stream opens the
+live change stream and times the arrival of its first event. POST
+/api/web-search is left out: it queries external search engines.
+
+Usage:
+    # Run against a dashboard on the default port
+    python3 benchmark/run_benchmark.py run --output results/$(git rev-parse --short HEAD).json
+
+    # More clients, more requests, only some endpoints
+    python3 benchmark/run_benchmark.py run --concurrency 32 --requests 500 --only payers_list,aggregates
+
+    # Include the write endpoints (PUT/POST mutate the database)
+    python3 benchmark/run_benchmark.py run --include-writes
+
+    # Compare two result files; exit 1 if any p95 regressed by more than 10%
+    python3 benchmark/run_benchmark.py compare base.json head.json --fail-over 10
+
+Seed the database with benchmark/seed_synthetic.py first.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+DEFAULT_BASE_URL = os.environ.get("BENCH_BASE_URL", "http://localhost:5002")
+
+# Sort fields accepted by /api/payers
+SORT_FIELDS = ['name', 'payer_type', 'coverage_status', 'coverage_category',
+               'prior_auth_required', 'investigational', 'policy_date', 'policy_number']
+
+COVERAGE_STATUSES = ["Covered", "Prior-Auth Required", "Not Covered"]
+
+# Detailed statuses /api/payers also filters on
+DETAILED_COVERAGE_STATUSES = ["Partial - OLE Unproven", "Covered with Criteria", "Investigational - Experimental"]
+
+
+# Each scenario builds one request from the shared context. "weight" scales the
+# request count for endpoints that are too slow to hit as often as the rest.
+def payers_list(ctx, rng):
+    return "GET", "/api/payers", {"page": 1, "per_page": 50}, None
+
+
+def payers_deep_page(ctx, rng):
+    pages = max(ctx["total_payers"] // 50, 1)
+    return "GET", "/api/payers", {"page": rng.randint(1, pages), "per_page": 50}, None
+
+
+def payers_filtered(ctx, rng):
+    params = {
+        "payer_type": rng.choice(ctx["payer_types"]) if ctx["payer_types"] else "",
+        "coverage_status": rng.choice(COVERAGE_STATUSES + DETAILED_COVERAGE_STATUSES),
+        "investigational": rng.choice(["", "Yes", "No"]),
+        "sort_by": rng.choice(SORT_FIELDS),
+        "sort_dir": rng.choice(["asc", "desc"]),
+    }
+    return "GET", "/api/payers", params, None
+
+
+def payers_faceted(ctx, rng):
+    _, path, params, body = payers_filtered(ctx, rng)
+    params["payer_type"] = rng.choice(["", params["payer_type"]])
+    params["facets"] = 1
+    return "GET", path, params, body
+
+
+def payers_sparse(ctx, rng):
+    fields = rng.choice(["id,name,payer_type", "id,name,coverage_category,color_code", "id,name,notes"])
+    return "GET", "/api/payers", {"page": 1, "per_page": 50, "fields": fields}, None
+
+
+def payers_name_search(ctx, rng):
+    return "GET", "/api/payers", {"name": rng.choice(ctx["name_terms"])}, None
+
+
+def payers_suggest(ctx, rng):
+    term = rng.choice(ctx["name_terms"])
+    return "GET", "/api/payers/suggest", {"q": term[:rng.randint(1, len(term))]}, None
+
+
+def payer_detail(ctx, rng):
+    return "GET", f"/api/payers/{rng.randint(1, max(ctx['total_payers'], 1))}", None, None
+
+
+def payers_batch(ctx, rng):
+    ids = rng.sample(range(1, max(ctx["total_payers"], 50) + 1), 50)
+    return "GET", "/api/payers/batch", {"ids": ",".join(map(str, ids))}, None
+
+
+def payer_history(ctx, rng):
+    return "GET", f"/api/payers/{rng.randint(1, max(ctx['total_payers'], 1))}/history", None, None
+
+
+def coverage_statuses(ctx, rng):
+    return "GET", "/api/coverage-statuses", None, None
+
+
+def payer_types(ctx, rng):
+    return "GET", "/api/payer-types", None, None
+
+
+def aggregates(ctx, rng):
+    return "GET", "/api/aggregates", None, None
+
+
+def coverage_trend(ctx, rng):
+    params = {"payer_type": rng.choice(["", *ctx["payer_types"]])}
+    return "GET", "/api/coverage-trend", params, None
+
+
+def searched_payers(ctx, rng):
+    pages = max(ctx["total_searched"] // 50, 1)
+    return "GET", "/api/searched-payers", {"page": rng.randint(1, pages), "per_page": 50}, None
+
+
+def bootstrap(ctx, rng):
+    return "GET", "/api/bootstrap", None, None
+
+
+def state_coverage(ctx, rng):
+    return "GET", "/api/state-coverage", None, None
+
+
+def state_payers(ctx, rng):
+    state = rng.choice(ctx["states"]) if ctx["states"] else "CA"
+    params = {"status": rng.choice(["", *COVERAGE_STATUSES]), "page": 1, "per_page": 50}
+    return "GET", f"/api/state-coverage/{state}", params, None
+
+
+def changes_first_page(ctx, rng):
+    return "GET", "/api/changes", {"limit": 500}, None
+
+
+def changes_resume(ctx, rng):
+    return "GET", "/api/changes", {"since": ctx["changes_cursor"], "limit": 500}, None
+
+
+def export(ctx, rng):
+    return "GET", "/api/export", {"payer_type": rng.choice(ctx["payer_types"]) if ctx["payer_types"] else ""}, None
+
+
+# Multi-request scenarios set "flow" instead of "build": flow(session, base_url,
+# ctx, rng, timeout) makes the requests and returns the last response and its body
+EXPORT_POLL_SECONDS = 0.1
+
+
+def export_job(session, base_url, ctx, rng, timeout):
+    body = {"payer_type": rng.choice(ctx["payer_types"]) if ctx["payer_types"] else ""}
+    response = session.post(f"{base_url}/api/exports", json=body, timeout=timeout)
+    if not response.ok:
+        return response, response.content
+    job = response.json()
+    deadline = time.monotonic() + timeout
+    while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(EXPORT_POLL_SECONDS)
+        response = session.get(f"{base_url}/api/exports/{job['id']}", timeout=timeout)
+        if not response.ok:
+            return response, response.content
+        job = response.json()
+    # A failed (or still running) job answers the download with 409
+    response = session.get(f"{base_url}/api/exports/{job['id']}/download", timeout=timeout)
+    return response, response.content
+
+
+def changes_stream(session, base_url, ctx, rng, timeout):
+    with session.get(f"{base_url}/api/changes/stream", stream=True, timeout=timeout) as response:
+        # The first chunk is the stream preamble, sent as soon as the client subscribes
+        return response, next(response.iter_content(chunk_size=None), b"")
+
+
+def update_payer(ctx, rng):
+    body = {"notes": f"Benchmark update {rng.random():.6f}"}
+    return "PUT", f"/api/payers/{rng.randint(1, max(ctx['total_payers'], 1))}", None, body
+
+
+def update_payers_batch(ctx, rng):
+    ids = rng.sample(range(1, max(ctx["total_payers"], 25) + 1), 25)
+    body = {"payers": [{"id": payer_id, "notes": f"Benchmark batch update {rng.random():.6f}"}
+                       for payer_id in ids]}
+    return "PUT", "/api/payers/batch", None, body
+
+
+def upsert_payers_batch(ctx, rng):
+    # Half new payers, half policy updates to existing ones
+    body = {"payers": [{"name": f"Benchmark Batch Payer {time.time_ns()}-{i}-{rng.random():.9f}",
+                        "coverage_status": rng.choice(COVERAGE_STATUSES)} for i in range(12)]
+            + [{"name": name, "notes": f"Benchmark batch upsert {rng.random():.6f}"}
+               for name in rng.sample(ctx["payer_names"], min(13, len(ctx["payer_names"])))]}
+    return "POST", "/api/payers/batch", None, body
+
+
+def add_payer(ctx, rng):
+    body = {
+        "name": f"Benchmark Payer {time.time_ns()}-{rng.random():.9f}",
+        "payer_type": rng.choice(ctx["payer_types"]) if ctx["payer_types"] else "",
+        "coverage_status": rng.choice(COVERAGE_STATUSES),
+        "notes": "Inserted by run_benchmark.py"
+    }
+    return "POST", "/api/payers", None, body
+
+
+SCENARIOS = [
+    {"name": "payers_list", "build": payers_list, "weight": 1.0},
+    {"name": "payers_deep_page", "build": payers_deep_page, "weight": 1.0},
+    {"name": "payers_filtered", "build": payers_filtered, "weight": 1.0},
+    {"name": "payers_faceted", "build": payers_faceted, "weight": 1.0},
+    {"name": "payers_sparse", "build": payers_sparse, "weight": 1.0},
+    {"name": "payers_name_search", "build": payers_name_search, "weight": 1.0},
+    {"name": "payers_suggest", "build": payers_suggest, "weight": 1.0},
+    {"name": "payer_detail", "build": payer_detail, "weight": 1.0},
+    {"name": "payers_batch", "build": payers_batch, "weight": 1.0},
+    {"name": "payer_history", "build": payer_history, "weight": 1.0},
+    {"name": "coverage_statuses", "build": coverage_statuses, "weight": 1.0},
+    {"name": "payer_types", "build": payer_types, "weight": 1.0},
+    {"name": "aggregates", "build": aggregates, "weight": 1.0},
+    {"name": "coverage_trend", "build": coverage_trend, "weight": 1.0},
+    {"name": "searched_payers", "build": searched_payers, "weight": 1.0},
+    {"name": "bootstrap", "build": bootstrap, "weight": 1.0},
+    {"name": "state_coverage", "build": state_coverage, "weight": 0.5},
+    {"name": "state_payers", "build": state_payers, "weight": 1.0},
+    {"name": "changes_first_page", "build": changes_first_page, "weight": 1.0},
+    {"name": "changes_resume", "build": changes_resume, "weight": 1.0},
+    {"name": "export", "build": export, "weight": 0.05},
+    {"name": "export_job", "flow": export_job, "weight": 0.05},
+    {"name": "changes_stream", "flow": changes_stream, "weight": 0.2},
+    {"name": "update_payer", "build": update_payer, "weight": 0.5, "write": True},
+    {"name": "add_payer", "build": add_payer, "weight": 0.5, "write": True},
+    {"name": "update_payers_batch", "build": update_payers_batch, "weight": 0.2, "write": True},
+    {"name": "upsert_payers_batch", "build": upsert_payers_batch, "weight": 0.2, "write": True},
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def discover_context(base_url):
+    """Collect ids, payer types and name fragments from the running dashboard."""
+    session = requests.Session()
+    payer_types_list = session.get(f"{base_url}/api/payer-types", timeout=60).json()
+    totals = session.get(f"{base_url}/api/aggregates", timeout=60).json()
+    sample = session.get(f"{base_url}/api/payers", params={"per_page": 100}, timeout=60).json()
+    states = [item["state"] for item in session.get(f"{base_url}/api/state-coverage", timeout=60).json()]
+    # A cursor partway through the feed, as a syncing consumer would hold
+    changes = session.get(f"{base_url}/api/changes", params={"limit": 500}, timeout=60).json()
+
+    # Short name fragments exercise the ILIKE search the way users type
+    name_terms = sorted({p["name"].split()[0][:6] for p in sample.get("payers", []) if p.get("name")})
+
+    return {
+        "payer_types": payer_types_list,
+        "total_payers": totals.get("total_payers", 0),
+        "total_searched": totals.get("total_searched", 0),
+        "name_terms": name_terms or ["Blue"],
+        "payer_names": [p["name"] for p in sample.get("payers", []) if p.get("name")],
+        "states": states,
+        "changes_cursor": changes.get("next_cursor") or "",
+    }
+
+
+def run_scenario(base_url, scenario, ctx, concurrency, total_requests, warmup, timeout, seed):
+    """Hammer one scenario with a pool of clients and return latency statistics."""
+    local = threading.local()
+    lock = threading.Lock()
+    latencies = []
+    errors = {}
+    response_bytes = [0]
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def one(index, record=True):
+        rng = random.Random(seed * 1000003 + index)
+        started = time.perf_counter()
+        try:
+            if "flow" in scenario:
+                response, content = scenario["flow"](session(), base_url, ctx, rng, timeout)
+            else:
+                method, path, params, body = scenario["build"](ctx, rng)
+                response = session().request(method, base_url + path, params=params, json=body,
+                                             timeout=timeout)
+                content = response.content
+            elapsed = time.perf_counter() - started
+            ok = response.status_code < 400
+            key = str(response.status_code)
+        except requests.RequestException as e:
+            elapsed = time.perf_counter() - started
+            content = b""
+            ok = False
+            key = type(e).__name__
+
+        if not record:
+            return
+        with lock:
+            if ok:
+                latencies.append(elapsed * 1000)
+                response_bytes[0] += len(content)
+            else:
+                errors[key] = errors.get(key, 0) + 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda i: one(i, record=False), range(warmup)))
+
+        started = time.perf_counter()
+        list(pool.map(one, range(total_requests)))
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+    completed = len(latencies)
+
+    return {
+        "requests": total_requests,
+        "completed": completed,
+        "errors": errors,
+        "wall_seconds": round(wall, 4),
+        "throughput_rps": round(completed / wall, 2) if wall > 0 else None,
+        "mean_ms": round(sum(latencies) / completed, 3) if completed else None,
+        "min_ms": round(latencies[0], 3) if completed else None,
+        "p50_ms": round(percentile(latencies, 50), 3) if completed else None,
+        "p95_ms": round(percentile(latencies, 95), 3) if completed else None,
+        "p99_ms": round(percentile(latencies, 99), 3) if completed else None,
+        "max_ms": round(latencies[-1], 3) if completed else None,
+        "mean_response_bytes": round(response_bytes[0] / completed) if completed else None,
+    }
+
+
+def git_revision():
+    """Current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def command_run(args):
+    base_url = args.base_url.rstrip("/")
+    ctx = discover_context(base_url)
+
+    scenarios = [s for s in SCENARIOS if args.include_writes or not s.get("write")]
+    if args.only:
+        wanted = set(args.only.split(","))
+        scenarios = [s for s in scenarios if s["name"] in wanted]
+
+    print(f"Benchmarking {base_url} ({ctx['total_payers']:,} payers, "
+          f"{ctx['total_searched']:,} searched) with {args.concurrency} clients", file=sys.stderr)
+
+    results = {}
+    for scenario in scenarios:
+        total = max(int(args.requests * scenario["weight"]), 1)
+        warmup = min(args.warmup, total)
+        stats = run_scenario(base_url, scenario, ctx, args.concurrency, total, warmup, args.timeout, args.seed)
+        results[scenario["name"]] = stats
+        print(f"  {scenario['name']:<20} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+              f"p99={stats['p99_ms']}ms {stats['throughput_rps']} req/s errors={stats['errors']}",
+              file=sys.stderr)
+
+    report = {
+        "meta": {
+            "label": args.label,
+            "git_revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "base_url": base_url,
+            "concurrency": args.concurrency,
+            "requests_per_endpoint": args.requests,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "dataset": {
+                "payers": ctx["total_payers"],
+                "searched_payers": ctx["total_searched"],
+            },
+        },
+        "endpoints": results,
+    }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    failed = any(stats["completed"] == 0 for stats in results.values())
+    return 1 if failed else 0
+
+
+def command_compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    metrics = ["p50_ms", "p95_ms", "p99_ms", "throughput_rps"]
+    print(f"{'endpoint':<20} " + " ".join(f"{m:>24}" for m in metrics))
+
+    regressions = []
+    for name in sorted(set(base["endpoints"]) | set(head["endpoints"])):
+        before = base["endpoints"].get(name, {})
+        after = head["endpoints"].get(name, {})
+        cells = []
+        for metric in metrics:
+            old, new = before.get(metric), after.get(metric)
+            if old is None or new is None:
+                cells.append(f"{'n/a':>24}")
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            cells.append(f"{old:>9} -> {new:<9} {change:+6.1f}%")
+
+            # Latency going up or throughput going down is a regression
+            worse = change if metric.endswith("_ms") else -change
+            if metric == "p95_ms" and args.fail_over is not None and worse > args.fail_over:
+                regressions.append(name)
+        print(f"{name:<20} " + " ".join(cells))
+
+    if regressions:
+        print(f"\np95 regressed by more than {args.fail_over}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark for the E0469 dashboard API.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="benchmark a running dashboard")
+    run.add_argument("--base-url", default=DEFAULT_BASE_URL, help=f"dashboard URL (default: {DEFAULT_BASE_URL})")
+    run.add_argument("--concurrency", type=int, default=8, help="concurrent clients (default: 8)")
+    run.add_argument("--requests", type=int, default=200, help="requests per endpoint before weighting (default: 200)")
+    run.add_argument("--warmup", type=int, default=10, help="unrecorded warmup requests per endpoint (default: 10)")
+    run.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    run.add_argument("--only", help="comma-separated scenario names to run")
+    run.add_argument("--include-writes", action="store_true", help="also benchmark PUT/POST endpoints")
+    run.add_argument("--label", help="free-form label stored in the results (e.g. wsgi, asgi)")
+    run.add_argument("--seed", type=int, default=0, help="random seed for request parameters")
+    run.add_argument("--output", help="write JSON results to this file instead of stdout")
+
+    compare = subparsers.add_parser("compare", help="diff two result files")
+    compare.add_argument("base", help="baseline results JSON")
+    compare.add_argument("head", help="candidate results JSON")
+    compare.add_argument("--fail-over", type=float, default=None,
+                         help="exit 1 if any endpoint's p95 regressed by more than this percentage")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        sys.exit(command_run(args))
+    sys.exit(command_compare(args))
+
+
+if __name__ == "__main__":
+    main()
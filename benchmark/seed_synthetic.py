@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Synthetic E0469 dataset generator for dashboard benchmarks.
+
+Seeds a PostgreSQL database with an arbitrary number of payers, policy rows
+and searched payers. Field values are sampled from the real payer_data and
+searched_no_e0469 lists in load_data.py, so payer types, coverage statuses,
+note lengths and URL shapes follow the same distributions as production.
+
+Usage:
+    # 10k payers, 1M policy rows, default searched payer ratio
+    python3 benchmark/seed_synthetic.py --payers 10000 --policies 1000000
+
+    # Recreate the schema first, fixed RNG seed
+    python3 benchmark/seed_synthetic.py --create-schema --seed 42
+
+The target database defaults to e0469_bench (override with BENCH_DB_NAME or
+the usual DB_HOST/DB_PORT/DB_USER variables) so a benchmark run never
+truncates the real analysis database by accident.
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_data import (  # noqa: E402
+    payer_data,
+    searched_no_e0469,
+    coverage_status_id,
+    load_coverage_status_ids,
+    normalize_investigational,
+)
+
+# Database configuration (separate default DB so real data is never touched)
+DB_CONFIG = {
+    "dbname": os.environ.get("BENCH_DB_NAME", "e0469_bench"),
+    "user": os.environ.get("DB_USER", "postgres"),
+    "host": os.environ.get("DB_HOST", "localhost"),
+    "port": int(os.environ.get("DB_PORT", 5432))
+}
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "schema.sql")
+
+# 50 states + DC, used for the heatmap endpoint
+STATES = [
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN', 'IA',
+    'KS', 'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM',
+    'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA',
+    'WV', 'WI', 'WY'
+]
+
+# E0469 became effective 10/1/2024; synthetic timestamps are spread from then until now
+EPOCH = datetime(2024, 10, 1)
+
+# Rows buffered per COPY chunk
+COPY_CHUNK = 50000
+
+
+def random_timestamp(rng, start=EPOCH, end=None):
+    """Pick a uniformly distributed timestamp between start and end."""
+    end = end or datetime.now()
+    span = (end - start).total_seconds()
+    return start + timedelta(seconds=rng.random() * span)
+
+
+def copy_rows(cur, table, columns, rows):
+    """Stream rows into a table with COPY in fixed-size chunks."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+
+    def flush():
+        buffer.seek(0)
+        cur.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer
+        )
+        buffer.seek(0)
+        buffer.truncate()
+
+    for row in rows:
+        writer.writerow(['\\N' if value is None else value for value in row])
+        count += 1
+        if count % COPY_CHUNK == 0:
+            flush()
+
+    if buffer.tell():
+        flush()
+
+    return count
+
+
+def payer_rows(rng, count):
+    """Generate synthetic payers shaped like payer_data."""
+    templates = payer_data
+    for payer_id in range(1, count + 1):
+        template = rng.choice(templates)
+        created = random_timestamp(rng)
+        updated = random_timestamp(rng, start=created)
+        yield (
+            payer_id,
+            f"{template['name']} #{payer_id:06d}",
+            template["type"],
+            rng.choice(STATES),
+            created,
+            updated
+        )
+
+
+def policy_payer_ids(rng, payers, policies):
+    """Assign policy rows to payers: one each, the rest skewed towards a few payers."""
+    for payer_id in range(1, payers + 1):
+        yield payer_id
+
+    # Pareto weights mimic the real data where a few carriers (UHC, BCBS)
+    # publish many revisions while most payers have a single policy.
+    extra = max(policies - payers, 0)
+    cum_weights = list(itertools.accumulate(rng.paretovariate(1.5) for _ in range(payers)))
+    population = range(1, payers + 1)
+    remaining = extra
+    while remaining > 0:
+        batch = min(remaining, COPY_CHUNK)
+        for payer_id in rng.choices(population, cum_weights=cum_weights, k=batch):
+            yield payer_id
+        remaining -= batch
+
+
+def policy_rows(rng, payers, policies, status_ids):
+    """Generate synthetic policy versions sampled field-by-field from payer_data.
+
+    Rows are loaded as archived; mark_current_versions() then makes the
+    newest version of each payer current and closes the rest.
+    """
+    for payer_id in policy_payer_ids(rng, payers, policies):
+        template = rng.choice(payer_data)
+        created = random_timestamp(rng)
+        updated = random_timestamp(rng, start=created)
+        yield (
+            payer_id,
+            coverage_status_id(status_ids, template["coverage"]),
+            template["prior_auth"],
+            normalize_investigational(template["investigational"]),
+            template["not_med_necessary"],
+            template["date"],
+            template["policy_num"],
+            rng.choice(payer_data)["notes"],
+            template["source"],
+            created,
+            updated,
+            created,
+            False
+        )
+
+
+def searched_rows(rng, count):
+    """Generate synthetic searched payers shaped like searched_no_e0469."""
+    for index in range(1, count + 1):
+        template = rng.choice(searched_no_e0469)
+        yield (
+            f"{template['name']} #{index:06d}",
+            template["type"],
+            template["notes"],
+            random_timestamp(rng).date()
+        )
+
+
+def mark_current_versions(cur):
+    """Chain each payer's policy versions by valid_from; the newest is current.
+
+    Run with payer_policies triggers disabled so this neither archives
+    versions nor touches updated_at.
+    """
+    cur.execute("""
+        WITH versions AS (
+            SELECT id, LEAD(valid_from) OVER (PARTITION BY payer_id ORDER BY valid_from, id) AS next_from
+            FROM payer_policies
+        )
+        UPDATE payer_policies pp
+        SET valid_to = v.next_from, is_current = v.next_from IS NULL
+        FROM versions v
+        WHERE pp.id = v.id
+    """)
+
+
+def seed(conn, payers, policies, searched, rng):
+    """Truncate and reload payers, payer_policies and searched_payers (dropping old tombstones).
+
+    The coverage trend rollup is rebuilt once the versions are chained.
+    """
+    cur = conn.cursor()
+
+    cur.execute("TRUNCATE payer_policies, payers, searched_payers, deleted_rows, coverage_trend_deltas "
+                "RESTART IDENTITY CASCADE")
+
+    started = time.perf_counter()
+    count = copy_rows(cur, "payers",
+                      ["id", "name", "payer_type", "state", "created_at", "updated_at"],
+                      payer_rows(rng, payers))
+    cur.execute("SELECT setval('payers_id_seq', %s)", [count])
+    print(f"  payers:          {count:>10,} rows in {time.perf_counter() - started:.1f}s")
+
+    status_ids = load_coverage_status_ids(cur)
+
+    started = time.perf_counter()
+    # Triggers off for the bulk load; versions are chained and rolled up once at the end
+    cur.execute("ALTER TABLE payer_policies DISABLE TRIGGER USER")
+    count = copy_rows(cur, "payer_policies",
+                      ["payer_id", "coverage_status_id", "prior_auth_required", "investigational",
+                       "not_med_necessary", "policy_date", "policy_number", "notes", "source_url",
+                       "created_at", "updated_at", "valid_from", "is_current"],
+                      policy_rows(rng, payers, policies, status_ids))
+    mark_current_versions(cur)
+    cur.execute("SELECT rebuild_coverage_trend()")
+    cur.execute("ALTER TABLE payer_policies ENABLE TRIGGER USER")
+    print(f"  payer_policies:  {count:>10,} rows in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    count = copy_rows(cur, "searched_payers",
+                      ["name", "payer_type", "notes", "date_searched"],
+                      searched_rows(rng, searched))
+    print(f"  searched_payers: {count:>10,} rows in {time.perf_counter() - started:.1f}s")
+
+    conn.commit()
+
+    # Fresh planner statistics so the benchmark measures steady-state plans
+    conn.autocommit = True
+    cur.execute("ANALYZE payers")
+    cur.execute("ANALYZE payer_policies")
+    cur.execute("ANALYZE searched_payers")
+    conn.autocommit = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a benchmark database with synthetic E0469 data.")
+    parser.add_argument("--payers", type=int, default=10000, help="number of payers (default: 10000)")
+    parser.add_argument("--policies", type=int, default=None,
+                        help="number of policy versions, at least one per payer (default: same as --payers)")
+    parser.add_argument("--searched", type=int, default=None,
+                        help="number of searched payers (default: real searched/payer ratio)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for reproducible datasets")
+    parser.add_argument("--create-schema", action="store_true", help="run schema.sql before seeding")
+    args = parser.parse_args()
+
+    policies = max(args.policies or args.payers, args.payers)
+    searched = args.searched
+    if searched is None:
+        searched = round(args.payers * len(searched_no_e0469) / len(payer_data))
+
+    print(f"Connecting to {DB_CONFIG['dbname']} on {DB_CONFIG['host']}:{DB_CONFIG['port']}...")
+    conn = psycopg2.connect(**DB_CONFIG)
+
+    try:
+        if args.create_schema:
+            with open(SCHEMA_PATH) as f:
+                conn.cursor().execute(f.read())
+            conn.commit()
+            print("Schema created.")
+
+        print(f"Seeding {args.payers:,} payers, {policies:,} policies, {searched:,} searched payers...")
+        seed(conn, args.payers, policies, searched, random.Random(args.seed))
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    print("Synthetic data loaded.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Build the pre-projected US state geometry used by the coverage map.
+
+Reads the us-atlas states TopoJSON, projects the 50 states and DC with the
+same Albers USA composite projection as d3.geoAlbersUsa (Alaska and Hawaii
+inset), fitted to a MAP_WIDTH x MAP_HEIGHT viewBox, and writes one SVG path
+string per state abbreviation to static/map/us-states.json. map.html draws
+those paths directly, so the browser needs neither d3, topojson nor the
+TopoJSON download. dashboard.py serves the file under a content-hashed URL
+with a one-year cache lifetime. The built file is committed, so a fresh
+checkout draws the map without running this; rebuild it after changing the
+projection, size or precision.
+
+Rings are rounded to PATH_PRECISION decimals; the adaptive resampling and
+rectangular clipping d3 applies are skipped, which is invisible at this scale.
+
+Usage:
+    # Fetch the pinned us-atlas release and build
+    python3 build_map_assets.py
+
+    # Build from a local copy of states-10m.json
+    python3 build_map_assets.py --topology states-10m.json
+"""
+
+import argparse
+import json
+import math
+import os
+
+import requests
+
+TOPOLOGY_URL = "https://cdn.jsdelivr.net/npm/us-atlas@3.0.1/states-10m.json"
+
+OUTPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "map", "us-states.json")
+
+# viewBox of the rendered map
+MAP_WIDTH = 960
+MAP_HEIGHT = 500
+
+# Decimal places kept in path coordinates (0.1 px at MAP_WIDTH)
+PATH_PRECISION = 1
+
+STATE_FIPS = {
+    '01': 'AL', '02': 'AK', '04': 'AZ', '05': 'AR', '06': 'CA', '08': 'CO', '09': 'CT', '10': 'DE',
+    '11': 'DC', '12': 'FL', '13': 'GA', '15': 'HI', '16': 'ID', '17': 'IL', '18': 'IN', '19': 'IA',
+    '20': 'KS', '21': 'KY', '22': 'LA', '23': 'ME', '24': 'MD', '25': 'MA', '26': 'MI', '27': 'MN',
+    '28': 'MS', '29': 'MO', '30': 'MT', '31': 'NE', '32': 'NV', '33': 'NH', '34': 'NJ', '35': 'NM',
+    '36': 'NY', '37': 'NC', '38': 'ND', '39': 'OH', '40': 'OK', '41': 'OR', '42': 'PA', '44': 'RI',
+    '45': 'SC', '46': 'SD', '47': 'TN', '48': 'TX', '49': 'UT', '50': 'VT', '51': 'VA', '53': 'WA',
+    '54': 'WV', '55': 'WI', '56': 'WY',
+}
+
+
+# ---------------------------------------------------------------------------
+# TopoJSON decoding
+# ---------------------------------------------------------------------------
+
+def decode_arcs(topology):
+    """Delta-decode quantized arcs into [lon, lat] point lists."""
+    transform = topology.get("transform")
+    arcs = []
+    for arc in topology["arcs"]:
+        if transform is None:
+            arcs.append([tuple(p[:2]) for p in arc])
+            continue
+        (sx, sy), (tx, ty) = transform["scale"], transform["translate"]
+        x = y = 0
+        points = []
+        for dx, dy in arc:
+            x += dx
+            y += dy
+            points.append((x * sx + tx, y * sy + ty))
+        arcs.append(points)
+    return arcs
+
+
+def ring_points(arc_indexes, arcs):
+    """Stitch a ring from arc indexes; ~i means arc i reversed."""
+    points = []
+    for i in arc_indexes:
+        arc = arcs[i] if i >= 0 else arcs[~i][::-1]
+        points.extend(arc if not points else arc[1:])
+    return points
+
+
+def geometry_polygons(geometry, arcs):
+    """Return a list of polygons (lists of rings) for a Polygon or MultiPolygon."""
+    if geometry["type"] == "Polygon":
+        polygons = [geometry["arcs"]]
+    elif geometry["type"] == "MultiPolygon":
+        polygons = geometry["arcs"]
+    else:
+        return []
+    return [[ring_points(ring, arcs) for ring in polygon] for polygon in polygons]
+
+
+# ---------------------------------------------------------------------------
+# Albers USA (mirrors d3.geoAlbersUsa)
+# ---------------------------------------------------------------------------
+
+class ConicEqualArea:
+    """d3.geoConicEqualArea at unit scale, offset to its place in the composite."""
+
+    def __init__(self, parallels, rotate, center, scale, offset, clip):
+        phi0, phi1 = (math.radians(p) for p in parallels)
+        sy0 = math.sin(phi0)
+        self.n = (sy0 + math.sin(phi1)) / 2
+        self.c = 1 + sy0 * (2 * self.n - sy0)
+        self.r0 = math.sqrt(self.c) / self.n
+        self.rotate = math.radians(rotate)
+        self.scale = scale
+        cx, cy = self._raw(math.radians(center[0]), math.radians(center[1]))
+        self.dx = offset[0] - scale * cx
+        self.dy = offset[1] + scale * cy
+        self.clip = clip
+
+    def _raw(self, lam, phi):
+        r = math.sqrt(self.c - 2 * self.n * math.sin(phi)) / self.n
+        lam *= self.n
+        return r * math.sin(lam), self.r0 - r * math.cos(lam)
+
+    def project(self, lon, lat):
+        lam = math.radians(lon) + self.rotate
+        if lam > math.pi:
+            lam -= 2 * math.pi
+        elif lam < -math.pi:
+            lam += 2 * math.pi
+        x, y = self._raw(lam, math.radians(lat))
+        return self.dx + self.scale * x, self.dy - self.scale * y
+
+    def contains(self, points):
+        """True unless the ring lies entirely outside this inset's clip box."""
+        (x0, y0), (x1, y1) = self.clip
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        return max(xs) >= x0 and min(xs) <= x1 and max(ys) >= y0 and min(ys) <= y1
+
+
+# Insets at scale 1, translate (0, 0); the constants are d3's
+LOWER_48 = ConicEqualArea((29.5, 45.5), 96, (-0.6, 38.7), 1, (0, 0),
+                          ((-0.455, -0.238), (0.455, 0.238)))
+ALASKA = ConicEqualArea((55, 65), 154, (-2, 58.5), 0.35, (-0.307, 0.201),
+                        ((-0.425, 0.120), (-0.214, 0.234)))
+HAWAII = ConicEqualArea((8, 18), 157, (-3, 19.9), 1, (-0.205, 0.212),
+                        ((-0.214, 0.166), (-0.115, 0.234)))
+
+INSETS = {'AK': ALASKA, 'HI': HAWAII}
+
+
+def project_states(topology):
+    """Project every state in the topology; returns {abbr: [rings of (x, y)]} at unit scale."""
+    arcs = decode_arcs(topology)
+    projected = {}
+    for geometry in topology["objects"]["states"]["geometries"]:
+        abbr = STATE_FIPS.get(str(geometry.get("id")).zfill(2))
+        if not abbr:
+            continue  # territories fall outside the Albers USA insets
+        projection = INSETS.get(abbr, LOWER_48)
+        rings = []
+        for polygon in geometry_polygons(geometry, arcs):
+            for ring in polygon:
+                points = [projection.project(lon, lat) for lon, lat in ring]
+                if len(points) > 2 and projection.contains(points):
+                    rings.append(points)
+        projected[abbr] = rings
+    return projected
+
+
+def fit(projected, width, height):
+    """Scale and translate unit coordinates to fill the viewBox, like projection.fitSize."""
+    xs = [x for rings in projected.values() for ring in rings for x, _ in ring]
+    ys = [y for rings in projected.values() for ring in rings for _, y in ring]
+    x0, x1, y0, y1 = min(xs), max(xs), min(ys), max(ys)
+    k = min(width / (x1 - x0), height / (y1 - y0))
+    tx = (width - k * (x1 + x0)) / 2
+    ty = (height - k * (y1 + y0)) / 2
+    return lambda x, y: (tx + k * x, ty + k * y)
+
+
+def svg_path(rings, transform):
+    """SVG path data for a set of rings, dropping points that round onto the previous one."""
+    parts = []
+    for ring in rings:
+        previous = None
+        commands = []
+        for x, y in ring:
+            x, y = transform(x, y)
+            point = f"{round(x, PATH_PRECISION):g},{round(y, PATH_PRECISION):g}"
+            if point != previous:
+                commands.append(point)
+                previous = point
+        if len(commands) > 2:
+            parts.append("M" + "L".join(commands) + "Z")
+    return "".join(parts)
+
+
+def load_topology(source):
+    if source.startswith(("http://", "https://")):
+        response = requests.get(source, timeout=60)
+        response.raise_for_status()
+        return response.json()
+    with open(source) as f:
+        return json.load(f)
+
+
+def build(source, output=OUTPUT_PATH, width=MAP_WIDTH, height=MAP_HEIGHT):
+    projected = project_states(load_topology(source))
+    transform = fit(projected, width, height)
+    asset = {
+        "width": width,
+        "height": height,
+        "states": {abbr: svg_path(rings, transform) for abbr, rings in sorted(projected.items())},
+    }
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(asset, f, separators=(",", ":"))
+        f.write("\n")
+    return asset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the pre-projected US map geometry.")
+    parser.add_argument("--topology", default=TOPOLOGY_URL,
+                        help=f"us-atlas states TopoJSON file or URL (default: {TOPOLOGY_URL})")
+    parser.add_argument("--output", default=OUTPUT_PATH, help=f"output file (default: {OUTPUT_PATH})")
+    args = parser.parse_args()
+
+    asset = build(args.topology, args.output)
+    print(f"Wrote {len(asset['states'])} states to {args.output} ({os.path.getsize(args.output):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
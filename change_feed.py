@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Live payer change notifications for the E0469 dashboard.
+
+Triggers in schema.sql call pg_notify on CHANNEL for every insert, update or
+delete on payers and payer_policies, with the table, operation and payer id.
+A listener collects those notifications for COALESCE_SECONDS, reads the
+current listing rows of each changed payer, and publishes one server-sent
+event to every subscriber:
+
+    id: <boot>-<n>
+    event: payers
+    data: {"changes": [{"payer_id": 7, "op": "update", "rows": [...]}, ...]}
+
+op is "insert" when the payer or one of its policies was added, "delete"
+when the payer no longer exists, and "update" otherwise. Clients replace
+rows in place for updates and re-read the visible page for the rest.
+
+Each process keeps the last HISTORY_SIZE events so a client that reconnects
+with Last-Event-ID catches up. When it cannot (another worker's id, an id
+too old, a subscriber too slow to keep up, or a lost listener connection) it
+gets a "resync" event instead and reloads.
+
+Usage:
+    feed = ChangeFeed(app.json.dumps)
+    listener = Listener(feed, connect_listen, load_rows, on_change=invalidate)
+    listener.ensure_started()
+
+    subscription = feed.subscribe(wake.set, request.headers.get("Last-Event-ID"))
+    ... wake.wait(HEARTBEAT_SECONDS); for event in subscription.drain(): send(event)
+    feed.unsubscribe(subscription)
+"""
+
+import json
+import logging
+import os
+import select
+import threading
+import time
+from collections import deque
+
+CHANNEL = "payer_changes"
+
+# Comment line sent when a stream has been idle this long
+HEARTBEAT_SECONDS = 15
+
+# Wait this long after a notification for the rest of its burst
+COALESCE_SECONDS = 0.05
+
+# Events kept for Last-Event-ID catch-up
+HISTORY_SIZE = 256
+
+# Undelivered events per subscriber before it is told to resync
+SUBSCRIBER_BACKLOG = 64
+
+# Client reconnect delay after a dropped stream (milliseconds)
+RETRY_MS = 3000
+
+# Delay before reopening a lost listener connection
+RECONNECT_SECONDS = 5
+
+log = logging.getLogger("dashboard.change_feed")
+
+# Notification operations that add or remove listing rows
+STRUCTURAL_OPS = ("INSERT", "DELETE")
+
+
+def format_event(event_id, name, data):
+    """Encode one server-sent event."""
+    return f"id: {event_id}\nevent: {name}\ndata: {data}\n\n"
+
+
+HEARTBEAT = ": keepalive\n\n"
+
+
+def stream_preamble():
+    """First bytes of a stream: the reconnect delay."""
+    return f"retry: {RETRY_MS}\n\n"
+
+
+def parse_notification(payload):
+    """Return (payer_id, op) from a trigger payload, or None if it is malformed."""
+    try:
+        message = json.loads(payload)
+        return int(message["payer_id"]), message["op"]
+    except (ValueError, KeyError, TypeError):
+        log.warning("ignoring malformed notification: %r", payload)
+        return None
+
+
+def collect_changes(notifications):
+    """Fold parsed notifications into {payer_id: structural?}."""
+    changed = {}
+    for parsed in notifications:
+        if parsed is None:
+            continue
+        payer_id, op = parsed
+        changed[payer_id] = changed.get(payer_id, False) or op in STRUCTURAL_OPS
+    return changed
+
+
+def build_changes(changed, rows):
+    """Pair each changed payer with its current listing rows (dicts with an 'id')."""
+    rows_by_payer = {}
+    for row in rows:
+        rows_by_payer.setdefault(row["id"], []).append(row)
+
+    changes = []
+    for payer_id, structural in sorted(changed.items()):
+        payer_rows = rows_by_payer.get(payer_id)
+        if not payer_rows:
+            changes.append({"payer_id": payer_id, "op": "delete", "rows": []})
+        else:
+            changes.append({"payer_id": payer_id, "op": "insert" if structural else "update",
+                            "rows": payer_rows})
+    return changes
+
+
+class Subscription:
+    """Events waiting for one connected client."""
+
+    def __init__(self, wake):
+        self._wake = wake
+        self._events = []
+        self._overflowed = False
+        self._lock = threading.Lock()
+
+    def push(self, event):
+        with self._lock:
+            if len(self._events) >= SUBSCRIBER_BACKLOG:
+                self._overflowed = True
+                self._events = []
+            elif not self._overflowed:
+                self._events.append(event)
+        self._wake()
+
+    def drain(self, resync_event):
+        """Take the pending events; a subscriber that fell behind gets resync_event instead."""
+        with self._lock:
+            if self._overflowed:
+                self._overflowed = False
+                self._events = []
+                return [resync_event]
+            events, self._events = self._events, []
+            return events
+
+
+class ChangeFeed:
+    """Fan-out of change events to subscribers, with a short replay history."""
+
+    def __init__(self, dumps):
+        self._dumps = dumps
+        # Event ids are only meaningful to the process that issued them
+        self._boot = f"{os.getpid():x}{int(time.time()):x}"
+        self._next_id = 1
+        self._history = deque(maxlen=HISTORY_SIZE)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def resync_event(self):
+        with self._lock:
+            return format_event(f"{self._boot}-{self._next_id - 1}", "resync", "{}")
+
+    def subscribe(self, wake, last_event_id=None):
+        """Register a client; wake() is called whenever events are waiting for it."""
+        subscription = Subscription(wake)
+        with self._lock:
+            self._subscribers.add(subscription)
+            missed = self._missed_since(last_event_id)
+        if missed is None:
+            subscription.push(self.resync_event())
+        for event in missed or ():
+            subscription.push(event)
+        return subscription
+
+    def _missed_since(self, last_event_id):
+        """Events after last_event_id, or None when they can no longer be replayed."""
+        if not last_event_id:
+            return []
+        boot, _, number = last_event_id.partition("-")
+        if boot != self._boot or not number.isdigit():
+            return None
+        number = int(number)
+        if number >= self._next_id:
+            return None
+        oldest = self._history[0][0] if self._history else self._next_id
+        if number < oldest - 1:
+            return None
+        return [event for event_number, event in self._history if event_number > number]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, name, payload):
+        """Send one event to every subscriber."""
+        data = self._dumps(payload, separators=(",", ":"))
+        with self._lock:
+            number = self._next_id
+            self._next_id += 1
+            event = format_event(f"{self._boot}-{number}", name, data)
+            self._history.append((number, event))
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+        return event
+
+    def publish_changes(self, changed, rows):
+        return self.publish("payers", {"changes": build_changes(changed, rows)})
+
+    def publish_resync(self):
+        return self.publish("resync", {})
+
+
+class Listener:
+    """Background thread that LISTENs on CHANNEL and publishes to a ChangeFeed.
+
+    connect() returns a new psycopg2 connection, load_rows(payer_ids) returns
+    the listing rows for those payers, and on_change() runs before every
+    publish (the dashboard resets its data version cache there). The thread
+    starts with the first subscriber and reconnects after connection loss.
+    """
+
+    def __init__(self, feed, connect, load_rows, on_change=None):
+        self.feed = feed
+        self._connect = connect
+        self._load_rows = load_rows
+        self._on_change = on_change
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        connected_before = False
+        while True:
+            try:
+                conn = self._connect()
+            except Exception:
+                log.exception("change feed: connect failed")
+                time.sleep(RECONNECT_SECONDS)
+                continue
+            try:
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {CHANNEL}")
+                if connected_before:
+                    # Notifications sent while disconnected are lost
+                    self._changed()
+                    self.feed.publish_resync()
+                connected_before = True
+                self._listen(conn)
+            except Exception:
+                log.exception("change feed: listener connection lost")
+            finally:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            time.sleep(RECONNECT_SECONDS)
+
+    def _listen(self, conn):
+        while True:
+            if not select.select([conn], [], [], HEARTBEAT_SECONDS)[0]:
+                conn.poll()  # surfaces a dead connection
+                continue
+            time.sleep(COALESCE_SECONDS)
+            conn.poll()
+            notifications = [parse_notification(n.payload) for n in conn.notifies]
+            conn.notifies.clear()
+
+            changed = collect_changes(notifications)
+            if changed:
+                self._changed()
+                self.feed.publish_changes(changed, self._load_rows(list(changed)))
+
+    def _changed(self):
+        if self._on_change is not None:
+            self._on_change()
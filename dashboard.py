@@ -4,19 +4,57 @@ E0469 Payer Coverage Dashboard
 Flask web application for viewing and managing payer coverage data.
 """
 
-from flask import Flask, request, jsonify, render_template, Response
+from flask import Flask, request, jsonify, render_template, Response, send_file, g, has_request_context
 import psycopg2
-from psycopg2.extras import RealDictCursor
 from io import BytesIO
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
-from datetime import datetime
+from datetime import date, datetime
+import json
 import os
 import requests
 import re
+import threading
+import base64
+
+import change_feed
+import db_pool
+import db_routing
+import export_jobs
+import http_cache
+import instrumentation
+import query_registry
+import sqlite_backend
+from instrumentation import InstrumentedCursor, TimedJSONProvider, span
+from name_index import PAYER_NAMES_SQL, NameIndex
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard library encoder
+    orjson = None
+
+
+class DashboardJSONProvider(TimedJSONProvider):
+    """JSON provider that encodes with orjson when it is installed."""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {"separators", "indent"}:
+            return super().dumps(obj, **kwargs)
+
+        # Dates go through Flask's default hook so the output matches jsonify
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
 
 app = Flask(__name__)
+app.json = DashboardJSONProvider(app)
+instrumentation.init_app(app)
 
 # Database configuration
 DB_CONFIG = {
@@ -26,170 +64,452 @@ DB_CONFIG = {
     "port": int(os.environ.get("DB_PORT", 5432))
 }
 
+# Primary (every write) as a libpq connection string; DB_CONFIG when unset
+DB_PRIMARY_DSN = os.environ.get("DB_PRIMARY_DSN", "")
+PRIMARY_CONFIG = db_routing.parse_dsn(DB_PRIMARY_DSN) if DB_PRIMARY_DSN else DB_CONFIG
+
+# Read replicas for GET requests, ';'-separated (see db_routing.py)
+replica_router = db_routing.ReplicaRouter(db_routing.parse_dsns(os.environ.get("DB_REPLICA_DSNS", "")))
+
+# Request connections are pooled per database, so the statements prepared on
+# them (see query_registry.py) outlive the request
+primary_pool = db_pool.ConnectionPool(PRIMARY_CONFIG, cursor_factory=InstrumentedCursor)
+replica_pools = {replica.name: db_pool.ConnectionPool(replica.config, cursor_factory=InstrumentedCursor)
+                 for replica in replica_router.replicas}
+
+# "postgres", or "sqlite" to serve a read-only snapshot written by
+# load_data.py --sqlite (see sqlite_backend.py); writes are then refused
+DB_BACKEND = os.environ.get("DB_BACKEND", "postgres")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "e0469_analysis.sqlite3")
+SQLITE = DB_BACKEND == "sqlite"
+
+
+# Reads that stay on the primary: the change feed's keyset cursor would move
+# past rows a lagging replica has not replayed yet, and they would never be sent
+PRIMARY_READ_ENDPOINTS = {'get_changes'}
+
+
+def read_replica():
+    """The replica this request reads from, or None for the primary; chosen once per request.
+
+    Only GET and HEAD requests read from replicas, and a session that wrote
+    recently only from those that have replayed its writes.
+    PRIMARY_READ_ENDPOINTS always read from the primary.
+    """
+    if (not replica_router.replicas or not has_request_context() or request.method not in ('GET', 'HEAD')
+            or request.endpoint in PRIMARY_READ_ENDPOINTS):
+        return None
+    if 'db_replica' not in g:
+        g.db_replica = replica_router.choose(db_routing.parse_lsn(request.cookies.get(db_routing.LSN_COOKIE)))
+    return g.db_replica
+
+
+def read_source():
+    replica = read_replica()
+    return replica.name if replica else None
+
 
 def get_db_connection():
-    """Get database connection with RealDictCursor."""
-    return psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
+    """Get database connection with an instrumented RealDictCursor (or its SQLite stand-in).
+
+    Connects to this request's read replica, if it has one, else the primary.
+    """
+    with instrumentation.connect_span():
+        if SQLITE:
+            return sqlite_backend.connect(SQLITE_PATH)
+        replica = read_replica()
+        if replica is not None:
+            try:
+                return replica_pools[replica.name].get()
+            except psycopg2.OperationalError:
+                replica.mark_down()
+                replica_pools[replica.name].clear()
+                g.db_replica = None
+        return primary_pool.get()
 
 
-# Simplified coverage status categories (3 options)
-COVERAGE_CATEGORIES = {
-    "Covered": "#C6EFCE",          # Green
-    "Not Covered": "#FFC7CE",       # Red
-    "Prior-Auth Required": "#BDD7EE"  # Blue
-}
+if SQLITE:
+    http_cache.init_app(app, get_db_connection, version_sql=sqlite_backend.SNAPSHOT_VERSION_SQL)
+else:
+    http_cache.init_app(app, get_db_connection, source=read_source)
+
+# Rows a server-side cursor fetches per round trip
+SERVER_CURSOR_ITERSIZE = int(os.environ.get("SERVER_CURSOR_ITERSIZE", 2000))
 
-# Map detailed statuses to simplified categories
-def normalize_coverage_status(status):
-    """Convert detailed coverage status to one of 3 simplified categories."""
-    if not status:
-        return "Prior-Auth Required"
-
-    status_lower = status.lower()
-
-    # Not Covered
-    if 'not covered' in status_lower or 'non-reimbursable' in status_lower:
-        return "Not Covered"
-
-    # Covered (explicit coverage)
-    if status_lower.startswith('covered'):
-        return "Covered"
-
-    # Everything else maps to Prior-Auth Required:
-    # - Investigational, Partial, Case-by-Case, Prior Auth, Varies, Reference
-    return "Prior-Auth Required"
-
-# Legacy color mapping (for raw status display)
-COVERAGE_COLORS = {
-    "NOT COVERED": "#FFC7CE",
-    "NOT COVERED - Experimental/Investigational": "#FFC7CE",
-    "NOT COVERED - EIU Non-Reimbursable": "#FFC7CE",
-    "Investigational": "#BDD7EE",
-    "Investigational - Experimental": "#BDD7EE",
-    "Partial - OLE Unproven": "#BDD7EE",
-    "Partial - Limited Conditions": "#BDD7EE",
-    "Partial - Some Investigational": "#BDD7EE",
-    "Case-by-Case (No LCD)": "#BDD7EE",
-    "Case Review - Prior Auth Needed": "#BDD7EE",
-    "Prior Auth Required": "#BDD7EE",
-    "Prior Auth Required (MA)": "#BDD7EE",
-    "Prior Auth Required - Clinical Review": "#BDD7EE",
-    "Covered with Criteria": "#C6EFCE",
-    "Covered with Prior Auth": "#C6EFCE",
-    "Covered with Limits": "#C6EFCE",
-    "Covered - Fee Schedule": "#C6EFCE",
-    "Covered - Per Fee Schedule": "#C6EFCE",
-    "Covered - Rental Only": "#C6EFCE",
-    "Varies - EIU or Clinical Review": "#BDD7EE",
-    "Reference Only": "#BDD7EE",
-    # Simplified categories
-    "Covered": "#C6EFCE",
-    "Not Covered": "#FFC7CE",
-    "Prior-Auth Required": "#BDD7EE",
+
+def stream_rows(conn, sql, params=None, name="stream"):
+    """Yield the rows of a large read through a server-side (named) cursor.
+
+    Only SERVER_CURSOR_ITERSIZE rows are held in memory at a time. The
+    connection must stay open, and outside autocommit, until the rows are
+    consumed; cursors streaming at the same time need different names.
+    """
+    cur = conn.cursor(name=name)
+    cur.itersize = SERVER_CURSOR_ITERSIZE
+    try:
+        cur.execute(sql, params)
+        yield from cur
+    finally:
+        cur.close()
+
+# Written by build_map_assets.py
+map_geometry = http_cache.FingerprintedFile(os.path.join(app.static_folder, 'map', 'us-states.json'))
+
+
+def splice_json(payload, **fragments):
+    """Serialize payload with pre-serialized fragments (e.g. from json_agg) spliced in."""
+    body = app.json.dumps(payload, separators=(",", ":"))
+    members = ",".join(f"{app.json.dumps(key)}:{fragment}" for key, fragment in fragments.items())
+    if body == "{}":
+        return "{" + members + "}"
+    return "{" + members + "," + body[1:]
+
+
+def raw_json_response(payload, **fragments):
+    """Return payload as JSON with pre-serialized fragments spliced in."""
+    with span("serialize"):
+        body = splice_json(payload, **fragments)
+    return app.response_class(body + "\n", mimetype=app.json.mimetype)
+
+
+# Characters of notes in the list's notes_preview; the full text comes from
+# /api/payers/<id>
+NOTES_PREVIEW_LENGTH = 80
+
+# Payer + policy fields the list and detail endpoints can return, by output
+# name: the detailed status, its simplified category and the category's badge
+# color are joined from coverage_categories by SMALLINT id
+PAYER_FIELDS = {
+    'id': "p.id",
+    'policy_id': "pp.id",
+    'name': "p.name",
+    'payer_type': "p.payer_type",
+    'coverage_status': "cs.name",
+    'coverage_category': "cg.name",
+    'color_code': "COALESCE(cg.color_code, '#E2E8F0')",
+    'prior_auth_required': "pp.prior_auth_required",
+    'investigational': "pp.investigational",
+    'not_med_necessary': "pp.not_med_necessary",
+    'policy_date': "pp.policy_date",
+    'policy_number': "pp.policy_number",
+    'notes_preview': f"SUBSTR(pp.notes, 1, {NOTES_PREVIEW_LENGTH})",
+    'notes': "pp.notes",
+    'source_url': "pp.source_url",
 }
 
+# Default /api/payers projection: what the dashboard table shows. Change feed
+# rows use it too, so they can replace list rows in place
+PAYER_LIST_FIELDS = ['id', 'policy_id', 'name', 'payer_type', 'coverage_status', 'coverage_category',
+                     'color_code', 'investigational', 'policy_date', 'notes_preview', 'source_url']
 
-@app.route('/')
-def dashboard():
-    """Render main dashboard."""
-    return render_template('dashboard.html')
+# Full record returned by /api/payers/<id>
+PAYER_DETAIL_FIELDS = [field for field in PAYER_FIELDS if field != 'notes_preview']
 
 
-@app.route('/map')
-def map_view():
-    """Render heatmap view."""
-    return render_template('map.html')
+def payer_columns_sql(fields):
+    """SELECT list for the given PAYER_FIELDS names."""
+    return ",\n".join(f"            {PAYER_FIELDS[field]} AS {field}" for field in fields)
 
 
-@app.route('/api/state-coverage')
-def get_state_coverage():
-    """Get coverage status by state for heatmap with breakdown by status."""
-    conn = get_db_connection()
-    cur = conn.cursor()
+def parse_payer_fields(value, default=PAYER_LIST_FIELDS):
+    """PAYER_FIELDS names from a comma-separated fields parameter; ValueError if unknown.
 
-    # Get all payers grouped by state and coverage status
-    cur.execute("""
-        SELECT
-            p.state,
-            pp.coverage_status,
-            COUNT(*) as payer_count,
-            STRING_AGG(p.name, ', ' ORDER BY p.name) as payers
+    Empty means default. id is always included.
+    """
+    if not value or not value.strip():
+        return default
+    requested = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = sorted(requested - set(PAYER_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return [field for field in PAYER_FIELDS if field == 'id' or field in requested]
+
+
+PAYER_COLUMNS_SQL = payer_columns_sql(PAYER_DETAIL_FIELDS)
+
+# Only the current version of each policy; older versions are history
+PAYER_FROM_SQL = """
         FROM payers p
-        JOIN payer_policies pp ON p.id = pp.payer_id
-        WHERE p.state IS NOT NULL
-        GROUP BY p.state, pp.coverage_status
-        ORDER BY p.state
-    """)
+        LEFT JOIN payer_policies pp ON p.id = pp.payer_id AND pp.is_current
+        LEFT JOIN coverage_categories cs ON cs.id = pp.coverage_status_id
+        LEFT JOIN coverage_categories cg ON cg.id = pp.coverage_category_id
+"""
 
-    rows = cur.fetchall()
-    conn.close()
+# Listing rows of the payers in one change event (see change_feed.py)
+CHANGED_PAYER_ROWS_SQL = f"""
+        SELECT {payer_columns_sql(PAYER_LIST_FIELDS)}
+        {PAYER_FROM_SQL}
+        WHERE p.id = ANY(%s)
+        ORDER BY p.id, pp.id
+"""
 
-    # Aggregate by state with breakdown by status
-    state_data = {}
-    for row in rows:
-        state = row['state']
-        status = row['coverage_status']
-        count = row['payer_count']
-        payers = row['payers']
-
-        if state not in state_data:
-            state_data[state] = {
-                'state': state,
-                'total_payers': 0,
-                'statuses': {},
-                'payers_by_status': {}
-            }
-
-        state_data[state]['total_payers'] += count
-        state_data[state]['statuses'][status] = count
-        state_data[state]['payers_by_status'][status] = payers
-
-    # Determine display color based on majority or mixed status
-    result = []
-    for state, data in state_data.items():
-        statuses = data['statuses']
-
-        # Determine primary status for color (most common, or mixed if tied)
-        if len(statuses) == 1:
-            primary_status = list(statuses.keys())[0]
-        else:
-            # If mixed, use priority: Not Covered > Prior-Auth > Covered (show worst case)
-            if 'Not Covered' in statuses:
-                primary_status = 'Not Covered'
-            elif 'Prior-Auth Required' in statuses:
-                primary_status = 'Prior-Auth Required'
-            else:
-                primary_status = 'Covered'
-
-        result.append({
-            'state': state,
-            'coverage_status': primary_status,
-            'color': COVERAGE_CATEGORIES.get(primary_status, '#E2E8F0'),
-            'total_payers': data['total_payers'],
-            'statuses': statuses,
-            'payers_by_status': data['payers_by_status']
-        })
+# Every version of one payer's policy, newest first, as a JSON array
+POLICY_HISTORY_SQL = """
+        SELECT p.id, p.name, (
+            SELECT COALESCE(json_agg(v ORDER BY v.valid_from DESC, v.policy_id DESC), '[]')::text
+            FROM (
+                SELECT
+                    pp.id AS policy_id,
+                    cs.name AS coverage_status,
+                    cg.name AS coverage_category,
+                    COALESCE(cg.color_code, '#E2E8F0') AS color_code,
+                    pp.prior_auth_required,
+                    pp.investigational,
+                    pp.not_med_necessary,
+                    pp.policy_date,
+                    pp.policy_number,
+                    pp.notes,
+                    pp.source_url,
+                    pp.valid_from,
+                    pp.valid_to,
+                    pp.is_current
+                FROM payer_policies pp
+                LEFT JOIN coverage_categories cs ON cs.id = pp.coverage_status_id
+                LEFT JOIN coverage_categories cg ON cg.id = pp.coverage_category_id
+                WHERE pp.payer_id = p.id
+            ) v
+        ) AS versions
+        FROM payers p
+        WHERE p.id = %s
+"""
 
-    return jsonify(result)
+ALLOWED_SORT_FIELDS = ['name', 'payer_type', 'coverage_status', 'coverage_category',
+                       'prior_auth_required', 'investigational', 'policy_date', 'policy_number']
+
+
+# Group by state and category, then fold each state into one JSON object
+# holding counts only; payer names come from /api/state-coverage/<state>.
+# The display status is the single category, or the worst case when mixed:
+# category ids rise with restrictiveness (Not Covered > Prior-Auth > Covered).
+STATE_COVERAGE_SQL = """
+        WITH by_status AS (
+            SELECT
+                p.state,
+                pp.coverage_category_id,
+                COUNT(*) as payer_count
+            FROM payers p
+            JOIN payer_policies pp ON p.id = pp.payer_id AND pp.is_current
+            WHERE p.state IS NOT NULL AND pp.coverage_category_id IS NOT NULL
+            GROUP BY p.state, pp.coverage_category_id
+        ),
+        by_state AS (
+            SELECT
+                b.state,
+                MAX(b.coverage_category_id) as coverage_category_id,
+                SUM(b.payer_count) as total_payers,
+                JSON_OBJECT_AGG(cc.name, b.payer_count) as statuses
+            FROM by_status b
+            JOIN coverage_categories cc ON cc.id = b.coverage_category_id
+            GROUP BY b.state
+        )
+        SELECT COALESCE(JSON_AGG(JSON_BUILD_OBJECT(
+            'state', s.state,
+            'coverage_status', cc.name,
+            'color', COALESCE(cc.color_code, '#E2E8F0'),
+            'total_payers', s.total_payers,
+            'statuses', s.statuses
+        ) ORDER BY s.state), '[]')::text as states
+        FROM by_state s
+        LEFT JOIN coverage_categories cc ON cc.id = s.coverage_category_id
+    """
+
+if SQLITE:
+    POLICY_HISTORY_SQL = sqlite_backend.POLICY_HISTORY_SQL
+    STATE_COVERAGE_SQL = sqlite_backend.STATE_COVERAGE_SQL
+
+
+PAYER_TYPES_SQL = """
+        SELECT DISTINCT payer_type
+        FROM payers
+        WHERE payer_type IS NOT NULL
+        ORDER BY payer_type
+    """
 
+# Scalar totals for /api/aggregates
+AGGREGATE_TOTALS_SQL = {
+    # Total payers
+    'total_payers': "SELECT COUNT(*) as count FROM payers",
+    # Total searched (no policy)
+    'total_searched': "SELECT COUNT(*) as count FROM searched_payers",
+}
 
-@app.route('/api/payers')
-def get_payers():
-    """Get payers with filtering, sorting, and pagination."""
+# Grouped counts for /api/aggregates
+AGGREGATE_GROUPS_SQL = {
+    # Detailed coverage status counts
+    'coverage_counts': """
+        SELECT cc.name as coverage_status, s.count
+        FROM (
+            SELECT coverage_status_id, COUNT(*) as count
+            FROM payer_policies
+            WHERE is_current
+            GROUP BY coverage_status_id
+        ) s
+        LEFT JOIN coverage_categories cc ON cc.id = s.coverage_status_id
+        ORDER BY s.count DESC
+    """,
+    # Payer type counts
+    'type_counts': """
+        SELECT payer_type, COUNT(*) as count
+        FROM payers
+        GROUP BY payer_type
+        ORDER BY count DESC
+    """,
+    # Investigational status
+    'investigational_counts': """
+        SELECT
+            CASE
+                WHEN investigational LIKE 'Yes%' OR investigational = 'Yes' THEN 'Investigational'
+                WHEN investigational = 'No' OR investigational = 'No Determination' THEN 'Not Investigational'
+                ELSE 'Not Specified'
+            END as status,
+            COUNT(*) as count
+        FROM payer_policies
+        WHERE is_current
+        GROUP BY status
+        ORDER BY count DESC
+    """,
+    # Coverage summary by simplified category, in category id order
+    'summary_counts': """
+        SELECT cc.name as category, s.count
+        FROM (
+            SELECT coverage_category_id, COUNT(*) as count
+            FROM payer_policies
+            WHERE is_current
+            GROUP BY coverage_category_id
+        ) s
+        LEFT JOIN coverage_categories cc ON cc.id = s.coverage_category_id
+        ORDER BY s.coverage_category_id
+    """,
+}
+
+# Output columns of each AGGREGATE_GROUPS_SQL query, for building its JSON
+# column by column where there is no json_agg(row) (SQLite)
+AGGREGATE_GROUP_COLUMNS = {
+    'coverage_counts': ['coverage_status', 'count'],
+    'type_counts': ['payer_type', 'count'],
+    'investigational_counts': ['status', 'count'],
+    'summary_counts': ['category', 'count'],
+}
+
+
+# Investigational facet values, matching the investigational filter's Yes/No
+INVESTIGATIONAL_FACET_SQL = """
+            CASE
+                WHEN pp.investigational LIKE 'Yes%%' THEN 'Yes'
+                WHEN pp.investigational IN ('No', 'No Determination') THEN 'No'
+            END"""
+
+# GROUPING() bitmask of each grouping set in build_payers_query's facet query
+# (a bit is set for every facet column the set does not group by)
+FACET_GROUPING_IDS = {
+    'payer_type': 0b0111,
+    'coverage_status': 0b1011,
+    'coverage_category': 0b1101,
+    'investigational': 0b1110,
+}
+FACET_TOTAL_GROUPING_ID = 0b1111
+
+
+def facet_json_sql(grouping_id, value_sql):
+    """JSON array of {value, count} for one grouping set of the facet query, largest first."""
+    return f"""(SELECT COALESCE(json_agg(json_build_object('value', {value_sql}, 'count', f.count)
+                                ORDER BY f.count DESC, {value_sql}), '[]')
+             FROM facet_counts f
+             LEFT JOIN coverage_categories cc ON cc.id = COALESCE(f.coverage_status_id, f.coverage_category_id)
+             WHERE f.grouping_id = {grouping_id})"""
+
+
+def total_pages(total, per_page):
+    """Number of pages for a paginated listing (at least 1)."""
+    return (total + per_page - 1) // per_page if total > 0 else 1
+
+
+# Listing totals above this many rows come from planner statistics, flagged
+# "estimated", instead of an exact COUNT over every matching row
+EXACT_COUNT_THRESHOLD = int(os.environ.get("EXACT_COUNT_THRESHOLD", 10000))
+
+
+def listing_count_sql(table, exact_sql, filtered):
+    """Statement returning a listing's total (count) and whether it is an estimate (estimated).
+
+    An unfiltered listing over table takes pg_class's row estimate, scaled to
+    the table's current size as the planner does, when that is above
+    EXACT_COUNT_THRESHOLD. Otherwise (and before the table's first ANALYZE)
+    the scalar exact_sql counts the rows; the database only runs it then.
+    """
+    if filtered or SQLITE:
+        return f"SELECT ({exact_sql}) AS count, false AS estimated"
+    return f"""
+        SELECT
+            CASE WHEN e.rows > {EXACT_COUNT_THRESHOLD} THEN e.rows ELSE ({exact_sql}) END AS count,
+            COALESCE(e.rows > {EXACT_COUNT_THRESHOLD}, false) AS estimated
+        FROM (
+            SELECT (
+                SELECT (c.reltuples / c.relpages
+                        * (pg_relation_size(c.oid) / current_setting('block_size')::int))::bigint
+                FROM pg_class c
+                WHERE c.oid = '{table}'::regclass AND c.relpages > 0 AND c.reltuples >= 0
+            ) AS rows
+        ) e
+    """
+
+
+def listing_estimate_sql(from_where_sql, filtered):
+    """EXPLAIN of a filtered listing's rows, for planned_rows(); None when unfiltered or on SQLite."""
+    if not filtered or SQLITE:
+        return None
+    return f"EXPLAIN (FORMAT JSON) SELECT 1 {from_where_sql}"
+
+
+def planned_rows(plan):
+    """The planner's row estimate from EXPLAIN (FORMAT JSON) output (decoded or text)."""
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_rows(cur, query):
+    """A listing's (total, estimated) from its count_sql and estimate_sql.
+
+    A filtered listing the planner expects to match more than
+    EXACT_COUNT_THRESHOLD rows reports that estimate; smaller ones are
+    counted exactly.
+    """
+    if query['estimate_sql']:
+        cur.execute(query['estimate_sql'], query['params'])
+        rows = planned_rows(cur.fetchone()['QUERY PLAN'])
+        if rows > EXACT_COUNT_THRESHOLD:
+            return rows, True
+    query_registry.execute(cur, query['count_sql'], query['params'])
+    row = cur.fetchone()
+    return row['count'], bool(row['estimated'])
+
+
+def build_payers_query(args):
+    """Build the count and page queries for /api/payers from request args.
+
+    Returns a dict with page, per_page, fields, count_sql, estimate_sql,
+    page_sql, facets_sql and params; the page query takes params +
+    [per_page, offset] and selects only the requested fields (ValueError if
+    one is unknown). count_sql and estimate_sql are used by count_rows().
+    facets_sql is
+    None unless facets were requested; otherwise it replaces count_sql,
+    returning the exact total and a facets JSON object from one GROUPING SETS pass.
+    """
     # Parse query parameters
-    name = request.args.get('name', '').strip()
-    payer_type = request.args.get('payer_type', '').strip()
-    coverage_status = request.args.get('coverage_status', '').strip()
-    investigational = request.args.get('investigational', '').strip()
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 50))
-    sort_by = request.args.get('sort_by', 'name').strip()
-    sort_dir = request.args.get('sort_dir', 'asc').strip().lower()
+    name = args.get('name', '').strip()
+    payer_type = args.get('payer_type', '').strip()
+    coverage_status = args.get('coverage_status', '').strip()
+    investigational = args.get('investigational', '').strip()
+    page = int(args.get('page', 1))
+    per_page = int(args.get('per_page', 50))
+    sort_by = args.get('sort_by', 'name').strip()
+    sort_dir = args.get('sort_dir', 'asc').strip().lower()
+    facets = args.get('facets', '').strip().lower() in ('1', 'true', 'yes')
+    fields = parse_payer_fields(args.get('fields', ''))
 
     # Validate sort parameters
-    allowed_sort_fields = ['name', 'payer_type', 'coverage_status', 'prior_auth_required',
-                           'investigational', 'policy_date', 'policy_number']
-    if sort_by not in allowed_sort_fields:
+    if sort_by not in ALLOWED_SORT_FIELDS:
         sort_by = 'name'
     if sort_dir not in ['asc', 'desc']:
         sort_dir = 'asc'
@@ -207,9 +527,9 @@ def get_payers():
         params.append(payer_type)
 
     if coverage_status:
-        # Filter by coverage status (already normalized to 3 categories in DB)
-        where_clauses.append("pp.coverage_status = %s")
-        params.append(coverage_status)
+        clause, param = coverage_filter(coverage_status)
+        where_clauses.append(clause)
+        params.append(param)
 
     if investigational:
         if investigational == 'Yes':
@@ -221,81 +541,922 @@ def get_payers():
 
     where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
 
-    # Calculate offset
-    offset = (page - 1) * per_page
+    # At most one current policy per payer, so rows and payers count the same
+    # (and an unfiltered total is the payers table's)
+    from_where_sql = f"""
+        FROM payers p
+        LEFT JOIN payer_policies pp ON p.id = pp.payer_id AND pp.is_current
+        WHERE {where_sql}
+    """
+    count_sql = listing_count_sql('payers', f"SELECT COUNT(*) {from_where_sql}", bool(where_clauses))
+    estimate_sql = listing_estimate_sql(from_where_sql, bool(where_clauses))
+
+    # Build the page as a JSON array in the database; no per-row Python dicts
+    page_select = f"""
+            SELECT {payer_columns_sql(fields)}
+            {PAYER_FROM_SQL}
+            WHERE {where_sql}
+            ORDER BY {PAYER_FIELDS[sort_by]} {sort_dir} NULLS LAST
+            LIMIT %s OFFSET %s
+    """
+    page_sql = f"""
+        SELECT COALESCE(json_agg(page), '[]')::text as payers
+        FROM ({page_select}) page
+    """
+
+    # Counts per payer_type, coverage status, category and investigational
+    # value under the current filters; the empty grouping set is the total
+    facets_sql = None
+    if facets:
+        facets_sql = f"""
+        WITH facet_counts AS (
+            SELECT
+                GROUPING(p.payer_type, pp.coverage_status_id, pp.coverage_category_id,
+                         {INVESTIGATIONAL_FACET_SQL}) AS grouping_id,
+                p.payer_type,
+                pp.coverage_status_id,
+                pp.coverage_category_id,
+                {INVESTIGATIONAL_FACET_SQL} AS investigational,
+                COUNT(*) AS count
+            FROM payers p
+            LEFT JOIN payer_policies pp ON p.id = pp.payer_id AND pp.is_current
+            WHERE {where_sql}
+            GROUP BY GROUPING SETS (
+                (), (p.payer_type), (pp.coverage_status_id), (pp.coverage_category_id),
+                ({INVESTIGATIONAL_FACET_SQL})
+            )
+        )
+        SELECT
+            (SELECT count FROM facet_counts WHERE grouping_id = {FACET_TOTAL_GROUPING_ID}) AS count,
+            json_build_object(
+                'payer_type', {facet_json_sql(FACET_GROUPING_IDS['payer_type'], 'f.payer_type')},
+                'coverage_status', {facet_json_sql(FACET_GROUPING_IDS['coverage_status'], 'cc.name')},
+                'coverage_category', {facet_json_sql(FACET_GROUPING_IDS['coverage_category'], 'cc.name')},
+                'investigational', {facet_json_sql(FACET_GROUPING_IDS['investigational'], 'f.investigational')}
+            )::text AS facets
+    """
+
+    if SQLITE:
+        page_sql = f"SELECT {sqlite_backend.json_array_sql(page_select, fields)} AS payers"
+        if facets:
+            facets_sql = sqlite_backend.payers_facets_sql(where_sql, INVESTIGATIONAL_FACET_SQL)
+
+    return {
+        'page': page,
+        'per_page': per_page,
+        'offset': (page - 1) * per_page,
+        'fields': fields,
+        'count_sql': count_sql,
+        'estimate_sql': estimate_sql,
+        'page_sql': page_sql,
+        'facets_sql': facets_sql,
+        'params': params,
+    }
+
 
-    conn = get_db_connection()
-    cur = conn.cursor()
+def build_searched_payers_query(args):
+    """Build the count and page queries for /api/searched-payers from request args.
 
-    # Get total count
-    cur.execute(f"""
-        SELECT COUNT(DISTINCT p.id)
-        FROM payers p
-        LEFT JOIN payer_policies pp ON p.id = pp.payer_id
+    Totals come from count_rows(), like build_payers_query's.
+    """
+    page = int(args.get('page', 1))
+    per_page = int(args.get('per_page', 50))
+    payer_type = args.get('payer_type', '').strip()
+
+    where_sql = "1=1"
+    params = []
+
+    if payer_type:
+        where_sql = "payer_type = %s"
+        params.append(payer_type)
+
+    from_where_sql = f"FROM searched_payers WHERE {where_sql}"
+    return {
+        'page': page,
+        'per_page': per_page,
+        'offset': (page - 1) * per_page,
+        'count_sql': listing_count_sql('searched_payers', f"SELECT COUNT(*) {from_where_sql}", bool(params)),
+        'estimate_sql': listing_estimate_sql(from_where_sql, bool(params)),
+        'page_sql': f"""
+        SELECT id, name, payer_type, notes, date_searched
+        FROM searched_payers
         WHERE {where_sql}
-    """, params)
-    total = cur.fetchone()['count']
+        ORDER BY name
+        LIMIT %s OFFSET %s
+    """,
+        'params': params,
+    }
+
+
+def build_state_payers_query(state, args):
+    """Build the count and page queries for /api/state-coverage/<state> from request args."""
+    status = args.get('status', '').strip()
+    page = int(args.get('page', 1))
+    per_page = int(args.get('per_page', 50))
+
+    # Same rows the map summary counts: one per current policy with a coverage status
+    where_clauses = ["p.state = %s", "pp.coverage_category_id IS NOT NULL"]
+    params = [state]
+
+    if status:
+        clause, param = coverage_filter(status)
+        where_clauses.append(clause)
+        params.append(param)
+
+    where_sql = " AND ".join(where_clauses)
+
+    page_select = f"""
+            SELECT p.id, p.name, p.payer_type, cs.name AS coverage_status, cg.name AS coverage_category
+            FROM payers p
+            JOIN payer_policies pp ON p.id = pp.payer_id AND pp.is_current
+            JOIN coverage_categories cs ON cs.id = pp.coverage_status_id
+            JOIN coverage_categories cg ON cg.id = pp.coverage_category_id
+            WHERE {where_sql}
+            ORDER BY p.name, p.id
+            LIMIT %s OFFSET %s
+    """
+    if SQLITE:
+        page_sql = f"""SELECT {sqlite_backend.json_array_sql(
+            page_select, ['id', 'name', 'payer_type', 'coverage_status', 'coverage_category'])} AS payers"""
+    else:
+        page_sql = f"""
+        SELECT COALESCE(json_agg(page), '[]')::text as payers
+        FROM ({page_select}) page
+    """
 
-    # Get payers with policies
-    cur.execute(f"""
-        SELECT
-            p.id,
-            p.name,
-            p.payer_type,
-            pp.coverage_status,
-            pp.prior_auth_required,
-            pp.investigational,
-            pp.not_med_necessary,
-            pp.policy_date,
-            pp.policy_number,
-            pp.notes,
-            pp.source_url
+    return {
+        'status': status or None,
+        'page': page,
+        'per_page': per_page,
+        'offset': (page - 1) * per_page,
+        'count_sql': f"""
+        SELECT COUNT(*) as count
         FROM payers p
-        LEFT JOIN payer_policies pp ON p.id = pp.payer_id
+        JOIN payer_policies pp ON p.id = pp.payer_id AND pp.is_current
         WHERE {where_sql}
-        ORDER BY {sort_by} {sort_dir} NULLS LAST
-        LIMIT %s OFFSET %s
-    """, params + [per_page, offset])
+    """,
+        'page_sql': page_sql,
+        'params': params,
+    }
+
+# Most payers one /api/payers/batch request reads or writes
+BATCH_MAX_ITEMS = 500
+
+# Policy text fields a batch PUT or POST item may set
+BATCH_POLICY_TEXT_FIELDS = ('prior_auth_required', 'investigational', 'notes')
+
+# Batch PUT: partial update of the current policies, one array per column.
+# set_* says whether the item carried that field at all
+PAYER_BATCH_UPDATE_SQL = """
+        UPDATE payer_policies pp SET
+            coverage_status_id = CASE WHEN v.set_status THEN v.coverage_status_id ELSE pp.coverage_status_id END,
+            prior_auth_required = CASE WHEN v.set_prior_auth THEN v.prior_auth_required ELSE pp.prior_auth_required END,
+            investigational = CASE WHEN v.set_investigational THEN v.investigational ELSE pp.investigational END,
+            notes = CASE WHEN v.set_notes THEN v.notes ELSE pp.notes END,
+            updated_at = CURRENT_TIMESTAMP
+        FROM unnest(%s::int[], %s::boolean[], %s::smallint[], %s::boolean[], %s::text[],
+                    %s::boolean[], %s::text[], %s::boolean[], %s::text[])
+            AS v(payer_id, set_status, coverage_status_id, set_prior_auth, prior_auth_required,
+                 set_investigational, investigational, set_notes, notes)
+        WHERE pp.payer_id = v.payer_id AND pp.is_current
+        RETURNING pp.payer_id
+"""
 
-    payers = [dict(row) for row in cur.fetchall()]
+# Batch POST, step 1: insert or update payers by name. A NULL payer_type keeps
+# the current one, and inserts '' like POST /api/payers. The CTE's inserts are
+# invisible to the outer query, so existing ids come from payers and new ones
+# from the RETURNING rows
+PAYER_BATCH_UPSERT_SQL = """
+        WITH input AS (
+            SELECT * FROM unnest(%s::text[], %s::text[]) AS i(name, payer_type)
+        ),
+        upserted AS (
+            INSERT INTO payers (name, payer_type)
+            SELECT name, COALESCE(payer_type, '') FROM input
+            ON CONFLICT (name) DO UPDATE SET payer_type = EXCLUDED.payer_type
+            WHERE EXISTS (SELECT 1 FROM input i WHERE i.name = EXCLUDED.name AND i.payer_type IS NOT NULL)
+              AND payers.payer_type IS DISTINCT FROM EXCLUDED.payer_type
+            RETURNING id, name, (xmax = 0) AS inserted
+        )
+        SELECT n.name, COALESCE(u.id, p.id) AS id,
+               COALESCE(u.inserted, FALSE) AS inserted, u.id IS NOT NULL AS changed
+        FROM input n
+        LEFT JOIN upserted u ON u.name = n.name
+        LEFT JOIN payers p ON p.name = n.name
+"""
 
-    # Add color codes (coverage_status is already normalized in DB)
-    for payer in payers:
-        payer['coverage_category'] = payer['coverage_status']
-        payer['color_code'] = COVERAGE_CATEGORIES.get(payer['coverage_status'], '#E2E8F0')
+# Batch POST, step 2: insert or update the current policies. NULL keeps the
+# current value; rows whose values would not change are left alone, so the
+# archive_policy_version trigger records no empty versions
+PAYER_BATCH_POLICY_UPSERT_SQL = """
+        INSERT INTO payer_policies (
+            payer_id, coverage_status_id, prior_auth_required, investigational, notes, source_url
+        )
+        SELECT * FROM unnest(%s::int[], %s::smallint[], %s::text[], %s::text[], %s::text[], %s::text[])
+        ON CONFLICT (payer_id) WHERE is_current DO UPDATE SET
+            coverage_status_id = COALESCE(EXCLUDED.coverage_status_id, payer_policies.coverage_status_id),
+            prior_auth_required = COALESCE(EXCLUDED.prior_auth_required, payer_policies.prior_auth_required),
+            investigational = COALESCE(EXCLUDED.investigational, payer_policies.investigational),
+            notes = COALESCE(EXCLUDED.notes, payer_policies.notes),
+            source_url = COALESCE(EXCLUDED.source_url, payer_policies.source_url)
+        WHERE (payer_policies.coverage_status_id, payer_policies.prior_auth_required,
+               payer_policies.investigational, payer_policies.notes, payer_policies.source_url)
+              IS DISTINCT FROM
+              (COALESCE(EXCLUDED.coverage_status_id, payer_policies.coverage_status_id),
+               COALESCE(EXCLUDED.prior_auth_required, payer_policies.prior_auth_required),
+               COALESCE(EXCLUDED.investigational, payer_policies.investigational),
+               COALESCE(EXCLUDED.notes, payer_policies.notes),
+               COALESCE(EXCLUDED.source_url, payer_policies.source_url))
+        RETURNING payer_id
+"""
+
+
+def build_payer_batch_query(args):
+    """Build the /api/payers/batch read from request args; ValueError for bad ids or fields.
+
+    ids is a comma-separated list; the statement returns the found payers as
+    a JSON array in request order and the ids that do not exist as another.
+    """
+    ids = []
+    for value in args.get('ids', '').split(','):
+        value = value.strip()
+        if not value:
+            continue
+        if not value.isdigit():
+            raise ValueError(f"Invalid payer id: {value}")
+        ids.append(int(value))
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValueError("ids is required")
+    if len(ids) > BATCH_MAX_ITEMS:
+        raise ValueError(f"At most {BATCH_MAX_ITEMS} ids per request")
+    fields = parse_payer_fields(args.get('fields', ''), PAYER_DETAIL_FIELDS)
+
+    if SQLITE:
+        return {
+            'ids': ids,
+            'fields': fields,
+            'sql': sqlite_backend.payer_batch_sql(f"""
+                SELECT {payer_columns_sql(fields)}
+                {PAYER_FROM_SQL}
+                JOIN requested r ON r.id = p.id
+                ORDER BY r.ord""", fields),
+            'params': [json.dumps(ids)],
+        }
+
+    return {
+        'ids': ids,
+        'fields': fields,
+        'sql': f"""
+        WITH requested AS (
+            SELECT id, ord FROM unnest(%s::int[]) WITH ORDINALITY AS r(id, ord)
+        )
+        SELECT
+            (SELECT COALESCE(json_agg(page), '[]')::text
+             FROM (
+                SELECT {payer_columns_sql(fields)}
+                {PAYER_FROM_SQL}
+                JOIN requested r ON r.id = p.id
+                ORDER BY r.ord
+             ) page) AS payers,
+            (SELECT COALESCE(json_agg(r.id ORDER BY r.ord), '[]')::text
+             FROM requested r
+             WHERE NOT EXISTS (SELECT 1 FROM payers p WHERE p.id = r.id)) AS missing
+    """,
+        'params': [ids],
+    }
+
+
+def batch_items(data):
+    """The item list of a batch write body ({"payers": [...]}); ValueError if malformed."""
+    items = data.get('payers') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError('Body must be {"payers": [...]} with at least one item')
+    if len(items) > BATCH_MAX_ITEMS:
+        raise ValueError(f"At most {BATCH_MAX_ITEMS} payers per request")
+    return items
+
+
+def batch_text(item, field):
+    """A text field of a batch item (None when absent); ValueError if it is not a string."""
+    value = item.get(field)
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    return value
+
+
+def batch_status_id(status_ids, item):
+    """coverage_categories id of a batch item's coverage_status (None when empty); ValueError if unknown."""
+    label = batch_text(item, 'coverage_status')
+    if not label:
+        return None
+    if label not in status_ids:
+        raise ValueError(f"Unknown coverage status: {label}")
+    return status_ids[label]
+
+
+def build_batch_update(items, status_ids):
+    """Validate batch PUT items; returns (params for PAYER_BATCH_UPDATE_SQL, results).
+
+    results has one dict per item, in order: invalid items already carry
+    status "error", the rest are completed from the rows the update returns.
+    Rows are ordered by payer id, so concurrent batches lock the payers they
+    share in the same order instead of deadlocking.
+    """
+    rows = []
+    results = []
+    seen = set()
+    for index, item in enumerate(items):
+        result = {'index': index, 'id': item.get('id') if isinstance(item, dict) else None}
+        results.append(result)
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Item must be an object")
+            payer_id = item.get('id')
+            if not isinstance(payer_id, int) or isinstance(payer_id, bool):
+                raise ValueError("id must be an integer")
+            if payer_id in seen:
+                raise ValueError(f"Payer {payer_id} appears more than once")
+            row = [payer_id, 'coverage_status' in item, batch_status_id(status_ids, item)]
+            for field in BATCH_POLICY_TEXT_FIELDS:
+                row += [field in item, batch_text(item, field)]
+        except ValueError as e:
+            result.update(status='error', error=str(e))
+            continue
+        seen.add(payer_id)
+        rows.append(row)
+    columns = [list(column) for column in zip(*sorted(rows))] or [[] for _ in range(9)]
+    return columns, results
+
+
+def build_batch_upsert(items, status_ids):
+    """Validate batch POST items; returns (payer rows, policy rows by name, results).
+
+    Payer rows are (name, payer_type); policy rows are (coverage_status_id,
+    prior_auth_required, investigational, notes, source_url) for the items
+    that carry any policy field. results is as in build_batch_update. Payer
+    rows are ordered by name, for the same reason build_batch_update orders
+    by id.
+    """
+    payers = []
+    policies = {}
+    results = []
+    seen = set()
+    for index, item in enumerate(items):
+        result = {'index': index, 'name': item.get('name') if isinstance(item, dict) else None}
+        results.append(result)
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Item must be an object")
+            name = (batch_text(item, 'name') or '').strip()
+            if not name:
+                raise ValueError("Payer name is required")
+            if name in seen:
+                raise ValueError(f'Payer "{name}" appears more than once')
+            payer_type = batch_text(item, 'payer_type')
+            policy = (batch_status_id(status_ids, item),
+                      *(batch_text(item, field) for field in BATCH_POLICY_TEXT_FIELDS),
+                      batch_text(item, 'source_url'))
+        except ValueError as e:
+            result.update(status='error', error=str(e))
+            continue
+        result['name'] = name
+        seen.add(name)
+        payers.append((name, payer_type))
+        if any(field in item for field in ('coverage_status', 'source_url', *BATCH_POLICY_TEXT_FIELDS)):
+            policies[name] = policy
+    return sorted(payers), policies, results
+
+
+# Flask serializes dates as RFC 822 strings; SQL-built JSON formats them the same way
+HTTP_DATE_FORMAT = 'Dy, DD Mon YYYY "00:00:00 GMT"'
+
+
+def build_bootstrap_query():
+    """Build one statement returning everything the dashboard needs for first paint.
+
+    Returns (sql, params, payers_query, searched_query). Every column is a
+    count or a JSON text fragment, so the whole payload is one round trip.
+    """
+    payers = build_payers_query({})
+    searched = build_searched_payers_query({})
+
+    # The fixed queries run without parameters elsewhere, so their literal %
+    # signs (LIKE 'Yes%') must be escaped before joining a parameterized statement
+    def literal(sql):
+        return sql.replace('%', '%%')
+
+    def json_rows(sql, key):
+        if SQLITE:
+            return sqlite_backend.json_array_sql(literal(sql), AGGREGATE_GROUP_COLUMNS[key])
+        return f"(SELECT COALESCE(json_agg(t), '[]')::text FROM ({literal(sql)}) t)"
+
+    if SQLITE:
+        payer_types = f"(SELECT json_group_array(t.payer_type) FROM ({literal(PAYER_TYPES_SQL)}) t)"
+        searched_payers = sqlite_backend.json_array_sql(
+            searched['page_sql'], ['id', 'name', 'payer_type', 'notes', 'date_searched'],
+            {'date_searched': sqlite_backend.http_date_sql('t.date_searched')})
+    else:
+        payer_types = (f"(SELECT COALESCE(json_agg(t.payer_type), '[]')::text "
+                       f"FROM ({literal(PAYER_TYPES_SQL)}) t)")
+        searched_payers = f"""(SELECT COALESCE(json_agg(json_build_object(
+                'id', t.id,
+                'name', t.name,
+                'payer_type', t.payer_type,
+                'notes', t.notes,
+                'date_searched', to_char(t.date_searched, '{HTTP_DATE_FORMAT}')
+            )), '[]')::text FROM ({searched['page_sql']}) t)"""
+
+    columns = [f"{payer_types} AS payer_types"]
+    columns += [f"({literal(sql)}) AS {key}" for key, sql in AGGREGATE_TOTALS_SQL.items()]
+    columns += [f"{json_rows(sql, key)} AS {key}" for key, sql in AGGREGATE_GROUPS_SQL.items()]
+    columns += [
+        "payers_count.count AS payers_total",
+        "payers_count.estimated AS payers_estimated",
+        f"({payers['page_sql']}) AS payers",
+        "searched_count.count AS searched_total",
+        "searched_count.estimated AS searched_estimated",
+        f"{searched_payers} AS searched_payers",
+    ]
+    counts = f"FROM ({payers['count_sql']}) payers_count, ({searched['count_sql']}) searched_count"
+
+    params = (payers['params'] + [payers['per_page'], payers['offset']]
+              + searched['params'] + [searched['per_page'], searched['offset']]
+              + payers['params'] + searched['params'])
+
+    return "SELECT " + ",\n".join(columns) + "\n" + counts, params, payers, searched
+
+
+def bootstrap_json(row, payers, searched):
+    """Assemble the /api/bootstrap body from a build_bootstrap_query() row."""
+    aggregates = splice_json(
+        {key: row[key] for key in AGGREGATE_TOTALS_SQL},
+        **{key: row[key] for key in AGGREGATE_GROUPS_SQL}
+    )
+    payers_page = splice_json({
+        'total': row['payers_total'],
+        'estimated': bool(row['payers_estimated']),
+        'page': payers['page'],
+        'per_page': payers['per_page'],
+        'total_pages': total_pages(row['payers_total'], payers['per_page'])
+    }, payers=row['payers'])
+    searched_page = splice_json({
+        'total': row['searched_total'],
+        'estimated': bool(row['searched_estimated']),
+        'page': searched['page'],
+        'per_page': searched['per_page'],
+        'total_pages': total_pages(row['searched_total'], searched['per_page'])
+    }, payers=row['searched_payers'])
+
+    return splice_json(
+        {'coverage_statuses': COVERAGE_STATUSES},
+        payer_types=row['payer_types'],
+        aggregates=aggregates,
+        payers=payers_page,
+        searched_payers=searched_page
+    )
+
+
+# Typeahead index over payer names, rebuilt when the data version changes
+payer_name_index = NameIndex()
+
+# Most suggestions /api/payers/suggest returns
+SUGGEST_MAX_LIMIT = 50
+
+
+def suggest_limit(args):
+    """Number of suggestions requested, clamped to 1..SUGGEST_MAX_LIMIT."""
+    return max(1, min(int(args.get('limit', 10)), SUGGEST_MAX_LIMIT))
+
+
+# Incremental sync (/api/changes). Rows from every table are merged into one
+# stream ordered by (changed_at, rank, id); the cursor is the last item's key.
+CHANGE_FEED_LIMIT = 500
+CHANGE_FEED_MAX_LIMIT = 5000
+
+# Rows changed in the last few seconds are held back: a transaction still in
+# flight stamps its rows with its start time and could land behind a cursor
+CHANGE_FEED_SETTLE_SECONDS = float(os.environ.get("CHANGE_FEED_SETTLE_SECONDS", 2))
+
+# (rank, table, change timestamp column, item JSON)
+CHANGE_SOURCES = [
+    (1, "payers", "updated_at",
+     "json_build_object('table', 'payers', 'op', 'upsert', 'id', t.id, "
+     "'changed_at', t.updated_at, 'row', to_json(t))"),
+    (2, "payer_policies", "updated_at",
+     "json_build_object('table', 'payer_policies', 'op', 'upsert', 'id', t.id, "
+     "'changed_at', t.updated_at, 'row', to_json(t))"),
+    (3, "searched_payers", "updated_at",
+     "json_build_object('table', 'searched_payers', 'op', 'upsert', 'id', t.id, "
+     "'changed_at', t.updated_at, 'row', to_json(t))"),
+    (4, "deleted_rows", "deleted_at",
+     "json_build_object('table', t.table_name, 'op', 'delete', 'id', t.row_id, "
+     "'changed_at', t.deleted_at)"),
+]
+
+
+def encode_change_cursor(changed_at, rank, seq):
+    raw = f"{changed_at.isoformat()}|{rank}|{seq}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_change_cursor(cursor):
+    """Return (changed_at, rank, seq) from a cursor; ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        changed_at, rank, seq = raw.split("|")
+        return datetime.fromisoformat(changed_at), int(rank), int(seq)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def build_changes_query(args):
+    """Build the /api/changes page query from request args; ValueError for a bad cursor."""
+    limit = max(1, min(int(args.get('limit', CHANGE_FEED_LIMIT)), CHANGE_FEED_MAX_LIMIT))
+    since = args.get('since', '').strip()
+    cursor = decode_change_cursor(since) if since else None
+
+    branches = []
+    params = []
+    for rank, table, column, item_sql in CHANGE_SOURCES:
+        conditions = [f"t.{column} < LOCALTIMESTAMP - make_interval(secs => %s)"]
+        params.append(CHANGE_FEED_SETTLE_SECONDS)
+        if cursor:
+            changed_at, cursor_rank, seq = cursor
+            # Each branch resumes after the cursor's position in the merged order
+            if rank < cursor_rank:
+                conditions.append(f"t.{column} > %s")
+                params.append(changed_at)
+            elif rank == cursor_rank:
+                conditions.append(f"(t.{column}, t.id) > (%s, %s)")
+                params.extend([changed_at, seq])
+            else:
+                conditions.append(f"t.{column} >= %s")
+                params.append(changed_at)
+        branches.append(f"""
+            (SELECT t.{column} AS changed_at, {rank} AS rank, t.id AS seq, ({item_sql})::text AS item
+             FROM {table} t
+             WHERE {' AND '.join(conditions)}
+             ORDER BY t.{column}, t.id
+             LIMIT %s)""")
+        params.append(limit)
+
+    sql = f"""
+        SELECT changed_at, rank, seq, item
+        FROM ({' UNION ALL '.join(branches)}) c
+        ORDER BY changed_at, rank, seq
+        LIMIT %s
+    """
+    params.append(limit)
+
+    return {'since': since or None, 'limit': limit, 'sql': sql, 'params': params}
+
+
+def changes_json(query, rows):
+    """Serialize a /api/changes page: the items, the next cursor and has_more."""
+    if rows:
+        last = rows[-1]
+        next_cursor = encode_change_cursor(last['changed_at'], last['rank'], last['seq'])
+    else:
+        next_cursor = query['since']
+    return splice_json({
+        'next_cursor': next_cursor,
+        'has_more': len(rows) == query['limit'],
+    }, changes="[" + ",".join(row['item'] for row in rows) + "]")
+
+
+# E0469 took effect 10/1/2024; trends start there unless asked otherwise
+COVERAGE_TREND_START = date(2024, 10, 1)
+COVERAGE_TREND_MAX_MONTHS = 240
+
+
+def parse_trend_month(value, name):
+    """First day of the month in a YYYY-MM or YYYY-MM-DD parameter; ValueError if malformed."""
+    for fmt in ('%Y-%m', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).date().replace(day=1)
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid {name}: {value} (expected YYYY-MM)")
+
+
+def build_coverage_trend_query(args):
+    """Build the /api/coverage-trend query from request args; ValueError for a bad range.
+
+    Deltas before the window fold into its first month, so the running sum
+    starts from the counts already in effect at since.
+    """
+    since = args.get('since', '').strip()
+    since = parse_trend_month(since, 'since') if since else COVERAGE_TREND_START
+    until = args.get('until', '').strip()
+    until = parse_trend_month(until, 'until') if until else date.today().replace(day=1)
+    months = (until.year - since.year) * 12 + until.month - since.month + 1
+    if months < 1:
+        raise ValueError("since must not be after until")
+    if months > COVERAGE_TREND_MAX_MONTHS:
+        raise ValueError(f"At most {COVERAGE_TREND_MAX_MONTHS} months per request")
+
+    params = [since, until]
+    payer_type = args.get('payer_type', '').strip()
+    type_filter = ""
+    if payer_type:
+        type_filter = "AND payer_type = %s"
+        params.append(payer_type)
+    params.extend([since, until])
+
+    if SQLITE:
+        return {'since': since, 'until': until, 'months': months, 'payer_type': payer_type or None,
+                'sql': sqlite_backend.coverage_trend_sql(type_filter), 'params': params}
+
+    sql = f"""
+        WITH deltas AS (
+            SELECT GREATEST(month, %s::date) AS month, payer_type, coverage_category_id, SUM(delta) AS delta
+            FROM coverage_trend_deltas
+            WHERE month <= %s::date {type_filter}
+            GROUP BY 1, 2, 3
+        ),
+        series AS (
+            SELECT DISTINCT payer_type, coverage_category_id FROM deltas
+        ),
+        months AS (
+            SELECT generate_series(%s::date, %s::date, interval '1 month')::date AS month
+        )
+        SELECT
+            s.payer_type,
+            COALESCE(cc.name, 'Unspecified') AS coverage_status,
+            SUM(COALESCE(d.delta, 0)) OVER (
+                PARTITION BY s.payer_type, s.coverage_category_id ORDER BY m.month
+            )::int AS count
+        FROM series s
+        CROSS JOIN months m
+        LEFT JOIN deltas d
+            ON d.month = m.month AND d.payer_type = s.payer_type
+            AND d.coverage_category_id IS NOT DISTINCT FROM s.coverage_category_id
+        LEFT JOIN coverage_categories cc ON cc.id = s.coverage_category_id
+        ORDER BY s.payer_type, s.coverage_category_id NULLS LAST, m.month
+    """
+    return {'since': since, 'until': until, 'months': months, 'payer_type': payer_type or None,
+            'sql': sql, 'params': params}
+
+
+def coverage_trend_json(query, rows):
+    """Shape trend rows into per-month count arrays by status, overall and per payer type."""
+    months = query['months']
+    totals = {}
+    by_type = {}
+    for i in range(0, len(rows), months):
+        series = rows[i:i + months]
+        status = series[0]['coverage_status']
+        counts = [row['count'] for row in series]
+        by_type.setdefault(series[0]['payer_type'], {})[status] = counts
+        total = totals.setdefault(status, [0] * months)
+        for month, count in enumerate(counts):
+            total[month] += count
+
+    def status_order(status):
+        return (COVERAGE_STATUSES.index(status) if status in COVERAGE_STATUSES else len(COVERAGE_STATUSES), status)
+
+    statuses = sorted(totals, key=status_order)
+    month_labels = []
+    year, month = query['since'].year, query['since'].month
+    for _ in range(months):
+        month_labels.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    return {
+        'since': month_labels[0],
+        'until': month_labels[-1],
+        'payer_type': query['payer_type'],
+        'months': month_labels,
+        'statuses': statuses,
+        'totals': {status: totals[status] for status in statuses},
+        'payer_types': {payer_type: {status: counts[status] for status in statuses if status in counts}
+                        for payer_type, counts in by_type.items()},
+    }
+
+
+# Simplified coverage status categories (3 options)
+COVERAGE_STATUSES = ["Covered", "Prior-Auth Required", "Not Covered"]
+
+# coverage_categories ids of the simplified categories (fixed in schema.sql)
+COVERAGE_CATEGORY_IDS = {"Covered": 100, "Prior-Auth Required": 200, "Not Covered": 300}
+
+
+def coverage_filter(label):
+    """WHERE clause and param for a coverage label at either level.
+
+    A simplified category matches every detailed status in it through the
+    generated coverage_category_id; any other label is a detailed status,
+    resolved to its id in SQL. An unknown label matches nothing.
+    """
+    if label in COVERAGE_CATEGORY_IDS:
+        return "pp.coverage_category_id = %s", COVERAGE_CATEGORY_IDS[label]
+    return "pp.coverage_status_id = (SELECT id FROM coverage_categories WHERE name = %s)", label
+
+
+def coverage_status_ids(cur):
+    """All coverage_categories ids by name, for validating many labels at once."""
+    cur.execute("SELECT name, id FROM coverage_categories")
+    return {row['name']: row['id'] for row in cur.fetchall()}
+
+
+def coverage_status_id(cur, label):
+    """coverage_categories id for a status label (None when empty); ValueError if unknown."""
+    if not label:
+        return None
+    cur.execute("SELECT id FROM coverage_categories WHERE name = %s", [label])
+    row = cur.fetchone()
+    if row is None:
+        raise ValueError(f"Unknown coverage status: {label}")
+    return row['id']
 
+
+# Endpoints that write to the primary
+WRITE_ENDPOINTS = {'update_payer', 'add_payer', 'update_payers_batch', 'upsert_payers_batch'}
+
+# Endpoints that write, or read Postgres' change log; a SQLite snapshot has neither
+READ_WRITE_ENDPOINTS = WRITE_ENDPOINTS | {'get_changes', 'stream_changes'}
+
+
+@app.before_request
+def refuse_writes_on_snapshot():
+    if not SQLITE or request.endpoint not in READ_WRITE_ENDPOINTS:
+        return None
+    if request.endpoint == 'stream_changes':
+        # No live changes; 204 tells EventSource not to reconnect
+        return Response(status=204)
+    return jsonify({'error': 'Read-only SQLite backend: not available'}), 501
+
+
+@app.after_request
+def remember_write_position(response):
+    """After a write, pin this session's reads to replicas that have replayed it."""
+    if (replica_router.replicas and request.endpoint in WRITE_ENDPOINTS
+            and response.status_code < 400):
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(db_routing.PRIMARY_LSN_SQL)
+            lsn = cur.fetchone()['lsn']
+        finally:
+            conn.close()
+        response.set_cookie(db_routing.LSN_COOKIE, lsn, max_age=db_routing.READ_YOUR_WRITES_SECONDS,
+                            httponly=True, samesite='Lax')
+    return response
+
+
+@app.route('/')
+def dashboard():
+    """Render main dashboard."""
+    return render_template('dashboard.html')
+
+
+@app.route('/map')
+def map_view():
+    """Render heatmap view."""
+    fingerprint = map_geometry.fingerprint()
+    geometry_url = f"/assets/us-states.{fingerprint}.json" if fingerprint else None
+    return render_template('map.html', map_geometry_url=geometry_url)
+
+
+@app.route('/assets/us-states.<fingerprint>.json')
+def map_geometry_asset(fingerprint):
+    """Pre-projected state paths built by build_map_assets.py."""
+    return http_cache.immutable_file(map_geometry, fingerprint, 'application/json')
+
+
+@app.route('/api/bootstrap')
+@http_cache.versioned
+def get_bootstrap():
+    """Get dropdowns, aggregates and first pages of both tables in one round trip."""
+    sql, params, payers, searched = build_bootstrap_query()
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    row = cur.fetchone()
     conn.close()
 
-    return jsonify({
-        'payers': payers,
+    with span("serialize"):
+        body = bootstrap_json(row, payers, searched)
+    return app.response_class(body + "\n", mimetype=app.json.mimetype)
+
+
+@app.route('/api/state-coverage')
+@http_cache.versioned
+def get_state_coverage():
+    """Get coverage status by state for heatmap with breakdown by status."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    cur.execute(STATE_COVERAGE_SQL)
+
+    states = cur.fetchone()['states']
+    conn.close()
+
+    with span("serialize"):
+        return app.response_class(states + "\n", mimetype=app.json.mimetype)
+
+
+@app.route('/api/state-coverage/<state>')
+@http_cache.versioned
+def get_state_payers(state):
+    """Get the payers behind one state's coverage counts, optionally for one status."""
+    state = state.upper()
+    if not re.fullmatch(r'[A-Z]{2}', state):
+        return jsonify({'error': 'State must be a two-letter code'}), 400
+
+    query = build_state_payers_query(state, request.args)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    cur.execute(query['count_sql'], query['params'])
+    total = cur.fetchone()['count']
+
+    cur.execute(query['page_sql'], query['params'] + [query['per_page'], query['offset']])
+    payers = cur.fetchone()['payers']
+    conn.close()
+
+    return raw_json_response({
+        'state': state,
+        'status': query['status'],
         'total': total,
-        'page': page,
-        'per_page': per_page,
-        'total_pages': (total + per_page - 1) // per_page if total > 0 else 1
-    })
+        'page': query['page'],
+        'per_page': query['per_page'],
+        'total_pages': total_pages(total, query['per_page'])
+    }, payers=payers)
+
+
+@app.route('/api/payers')
+@http_cache.versioned
+def get_payers():
+    """Get payers with filtering, sorting, pagination and a choice of fields."""
+    try:
+        query = build_payers_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    # Get total count (exact with the facet counts, when asked, in the same
+    # statement; else estimated for large listings). Each query shape runs as
+    # a statement prepared once per connection.
+    fragments = {}
+    if query['facets_sql']:
+        query_registry.execute(cur, query['facets_sql'], query['params'])
+        row = cur.fetchone()
+        fragments['facets'] = row['facets']
+        total, estimated = row['count'], False
+    else:
+        total, estimated = count_rows(cur, query)
+
+    query_registry.execute(cur, query['page_sql'], query['params'] + [query['per_page'], query['offset']])
+    fragments['payers'] = cur.fetchone()['payers']
+    conn.close()
+
+    return raw_json_response({
+        'total': total,
+        'estimated': estimated,
+        'page': query['page'],
+        'per_page': query['per_page'],
+        'total_pages': total_pages(total, query['per_page'])
+    }, **fragments)
+
+
+@app.route('/api/payers/suggest')
+@http_cache.versioned
+def suggest_payers():
+    """Suggest payer names starting with (or containing a word starting with) q."""
+    query = request.args.get('q', '')
+    limit = suggest_limit(request.args)
+
+    version = http_cache.current_version()
+    if not payer_name_index.is_current(version):
+        conn = get_db_connection()
+        try:
+            rows = stream_rows(conn, PAYER_NAMES_SQL, name="payer_names")
+            payer_name_index.rebuild(((row['id'], row['name']) for row in rows), version)
+        finally:
+            conn.close()
+
+    with span("suggest"):
+        suggestions = payer_name_index.suggest(query, limit)
+
+    return jsonify({'query': query, 'suggestions': suggestions})
 
 
 @app.route('/api/payers/<int:payer_id>')
+@http_cache.versioned
 def get_payer(payer_id):
     """Get single payer details."""
     conn = get_db_connection()
     cur = conn.cursor()
 
-    cur.execute("""
-        SELECT
-            p.id,
-            p.name,
-            p.payer_type,
-            pp.coverage_status,
-            pp.prior_auth_required,
-            pp.investigational,
-            pp.not_med_necessary,
-            pp.policy_date,
-            pp.policy_number,
-            pp.notes,
-            pp.source_url
-        FROM payers p
-        LEFT JOIN payer_policies pp ON p.id = pp.payer_id
+    cur.execute(f"""
+        SELECT {PAYER_COLUMNS_SQL}
+        {PAYER_FROM_SQL}
         WHERE p.id = %s
     """, [payer_id])
 
@@ -303,14 +1464,44 @@ def get_payer(payer_id):
     conn.close()
 
     if payer:
-        payer = dict(payer)
-        payer['coverage_category'] = payer['coverage_status']
-        payer['color_code'] = COVERAGE_CATEGORIES.get(payer['coverage_status'], '#E2E8F0')
-        return jsonify(payer)
+        return jsonify(dict(payer))
     else:
         return jsonify({'error': 'Payer not found'}), 404
 
 
+@app.route('/api/payers/batch')
+@http_cache.versioned
+def get_payers_batch():
+    """Get several payers by id (ids=1,2,3), in request order, plus the ids not found."""
+    try:
+        query = build_payer_batch_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(query['sql'], query['params'])
+    row = cur.fetchone()
+    conn.close()
+
+    return raw_json_response({}, payers=row['payers'], missing=row['missing'])
+
+
+@app.route('/api/payers/<int:payer_id>/history')
+@http_cache.versioned
+def get_payer_history(payer_id):
+    """Get every version of a payer's policy with its validity period, newest first."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(POLICY_HISTORY_SQL, [payer_id])
+    row = cur.fetchone()
+    conn.close()
+
+    if not row:
+        return jsonify({'error': 'Payer not found'}), 404
+    return raw_json_response({'payer_id': row['id'], 'name': row['name']}, versions=row['versions'])
+
+
 @app.route('/api/payers/<int:payer_id>', methods=['PUT'])
 def update_payer(payer_id):
     """Update payer policy information."""
@@ -324,8 +1515,13 @@ def update_payer(payer_id):
     params = []
 
     if 'coverage_status' in data:
-        update_fields.append("coverage_status = %s")
-        params.append(data['coverage_status'])
+        try:
+            status_id = coverage_status_id(cur, data['coverage_status'])
+        except ValueError as e:
+            conn.close()
+            return jsonify({'error': str(e)}), 400
+        update_fields.append("coverage_status_id = %s")
+        params.append(status_id)
 
     if 'prior_auth_required' in data:
         update_fields.append("prior_auth_required = %s")
@@ -344,7 +1540,7 @@ def update_payer(payer_id):
         cur.execute(f"""
             UPDATE payer_policies
             SET {', '.join(update_fields)}, updated_at = CURRENT_TIMESTAMP
-            WHERE payer_id = %s
+            WHERE payer_id = %s AND is_current
         """, params)
         conn.commit()
 
@@ -353,25 +1549,68 @@ def update_payer(payer_id):
     return jsonify({'success': True})
 
 
+def load_changed_payer_rows(payer_ids):
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(CHANGED_PAYER_ROWS_SQL, [payer_ids])
+        return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def connect_change_listener():
+    return psycopg2.connect(**PRIMARY_CONFIG)
+
+
+payer_changes = change_feed.ChangeFeed(app.json.dumps)
+payer_change_listener = change_feed.Listener(
+    payer_changes, connect_change_listener, load_changed_payer_rows,
+    on_change=http_cache.data_version.invalidate)
+
+
+@app.route('/api/changes/stream')
+def stream_changes():
+    """Server-sent events with row-level deltas for payers changed by anyone."""
+    payer_change_listener.ensure_started()
+
+    wake = threading.Event()
+    subscription = payer_changes.subscribe(wake.set, request.headers.get('Last-Event-ID'))
+
+    def events():
+        try:
+            yield change_feed.stream_preamble()
+            while True:
+                if not wake.wait(change_feed.HEARTBEAT_SECONDS):
+                    yield change_feed.HEARTBEAT
+                    continue
+                wake.clear()
+                yield from subscription.drain(payer_changes.resync_event())
+        finally:
+            payer_changes.unsubscribe(subscription)
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
 @app.route('/api/coverage-statuses')
+@http_cache.static_list()
 def get_coverage_statuses():
     """Get the 3 simplified coverage categories."""
     # Return only the 3 simplified categories
-    return jsonify(["Covered", "Prior-Auth Required", "Not Covered"])
+    return jsonify(COVERAGE_STATUSES)
 
 
 @app.route('/api/payer-types')
+@http_cache.versioned
 def get_payer_types():
     """Get distinct payer types."""
     conn = get_db_connection()
     cur = conn.cursor()
 
-    cur.execute("""
-        SELECT DISTINCT payer_type
-        FROM payers
-        WHERE payer_type IS NOT NULL
-        ORDER BY payer_type
-    """)
+    cur.execute(PAYER_TYPES_SQL)
 
     types = [row['payer_type'] for row in cur.fetchall()]
     conn.close()
@@ -380,132 +1619,124 @@ def get_payer_types():
 
 
 @app.route('/api/aggregates')
+@http_cache.versioned
 def get_aggregates():
     """Get summary statistics."""
     conn = get_db_connection()
     cur = conn.cursor()
 
-    # Total payers
-    cur.execute("SELECT COUNT(*) as count FROM payers")
-    total_payers = cur.fetchone()['count']
+    result = {}
 
-    # Total searched (no policy)
-    cur.execute("SELECT COUNT(*) as count FROM searched_payers")
-    total_searched = cur.fetchone()['count']
+    for key, sql in AGGREGATE_TOTALS_SQL.items():
+        cur.execute(sql)
+        result[key] = cur.fetchone()['count']
 
-    # Coverage status counts
-    cur.execute("""
-        SELECT coverage_status, COUNT(*) as count
-        FROM payer_policies
-        GROUP BY coverage_status
-        ORDER BY count DESC
-    """)
-    coverage_counts = [dict(row) for row in cur.fetchall()]
+    for key, sql in AGGREGATE_GROUPS_SQL.items():
+        cur.execute(sql)
+        result[key] = [dict(row) for row in cur.fetchall()]
 
-    # Payer type counts
-    cur.execute("""
-        SELECT payer_type, COUNT(*) as count
-        FROM payers
-        GROUP BY payer_type
-        ORDER BY count DESC
-    """)
-    type_counts = [dict(row) for row in cur.fetchall()]
+    conn.close()
 
-    # Investigational status
-    cur.execute("""
-        SELECT
-            CASE
-                WHEN investigational LIKE 'Yes%' OR investigational = 'Yes' THEN 'Investigational'
-                WHEN investigational = 'No' OR investigational = 'No Determination' THEN 'Not Investigational'
-                ELSE 'Not Specified'
-            END as status,
-            COUNT(*) as count
-        FROM payer_policies
-        GROUP BY status
-        ORDER BY count DESC
-    """)
-    investigational_counts = [dict(row) for row in cur.fetchall()]
+    return jsonify(result)
 
-    # Coverage summary (coverage_status is already normalized to 3 categories)
-    cur.execute("""
-        SELECT coverage_status as category, COUNT(*) as count
-        FROM payer_policies
-        GROUP BY coverage_status
-        ORDER BY
-            CASE coverage_status
-                WHEN 'Covered' THEN 1
-                WHEN 'Prior-Auth Required' THEN 2
-                WHEN 'Not Covered' THEN 3
-            END
-    """)
-    summary_counts = [dict(row) for row in cur.fetchall()]
 
+@app.route('/api/coverage-trend')
+@http_cache.versioned
+def get_coverage_trend():
+    """Payers per coverage status at each month end, overall and per payer type."""
+    try:
+        query = build_coverage_trend_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(query['sql'], query['params'])
+    rows = cur.fetchall()
     conn.close()
 
-    return jsonify({
-        'total_payers': total_payers,
-        'total_searched': total_searched,
-        'coverage_counts': coverage_counts,
-        'type_counts': type_counts,
-        'investigational_counts': investigational_counts,
-        'summary_counts': summary_counts
-    })
+    return jsonify(coverage_trend_json(query, rows))
 
 
-@app.route('/api/searched-payers')
-def get_searched_payers():
-    """Get payers that were searched but no E0469 policy found."""
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 50))
-    payer_type = request.args.get('payer_type', '').strip()
+@app.route('/api/changes')
+def get_changes():
+    """Payers, policies and searched payers changed or deleted after a cursor.
 
-    offset = (page - 1) * per_page
+    Not versioned: held-back rows become visible as time passes without a
+    new data version.
+    """
+    try:
+        query = build_changes_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     conn = get_db_connection()
     cur = conn.cursor()
+    cur.execute(query['sql'], query['params'])
+    rows = cur.fetchall()
+    conn.close()
 
-    where_sql = "1=1"
-    params = []
+    with span("serialize"):
+        body = changes_json(query, rows)
+    return app.response_class(body + "\n", mimetype=app.json.mimetype)
 
-    if payer_type:
-        where_sql = "payer_type = %s"
-        params.append(payer_type)
 
-    # Get total
-    cur.execute(f"SELECT COUNT(*) as count FROM searched_payers WHERE {where_sql}", params)
-    total = cur.fetchone()['count']
+@app.route('/api/searched-payers')
+@http_cache.versioned
+def get_searched_payers():
+    """Get payers that were searched but no E0469 policy found."""
+    query = build_searched_payers_query(request.args)
 
-    # Get payers
-    cur.execute(f"""
-        SELECT id, name, payer_type, notes, date_searched
-        FROM searched_payers
-        WHERE {where_sql}
-        ORDER BY name
-        LIMIT %s OFFSET %s
-    """, params + [per_page, offset])
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    # Get total (estimated for large listings)
+    total, estimated = count_rows(cur, query)
 
+    # Get payers
+    cur.execute(query['page_sql'], query['params'] + [query['per_page'], query['offset']])
     payers = [dict(row) for row in cur.fetchall()]
     conn.close()
 
     return jsonify({
         'payers': payers,
         'total': total,
-        'page': page,
-        'per_page': per_page,
-        'total_pages': (total + per_page - 1) // per_page if total > 0 else 1
+        'estimated': estimated,
+        'page': query['page'],
+        'per_page': query['per_page'],
+        'total_pages': total_pages(total, query['per_page'])
     })
 
 
-@app.route('/api/export')
-def export_excel():
-    """Export payer data to Excel."""
-    # Get filter parameters
-    name = request.args.get('name', '').strip()
-    payer_type = request.args.get('payer_type', '').strip()
-    coverage_status = request.args.get('coverage_status', '').strip()
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
-    conn = get_db_connection()
-    cur = conn.cursor()
+# Filters the export accepts
+EXPORT_FILTERS = ('name', 'payer_type', 'coverage_status')
+
+# Report export job progress every this many payer rows
+EXPORT_PROGRESS_ROWS = 500
+
+EXPORT_SEARCHED_SQL = """
+        SELECT name, payer_type, notes, date_searched
+        FROM searched_payers
+        ORDER BY name
+"""
+
+
+def export_filters(args):
+    """The export filters from request args or a JSON body, stripped ('' when absent)."""
+    return {key: str(args.get(key) or '').strip() for key in EXPORT_FILTERS}
+
+
+def export_filename(when):
+    return f"E0469_Payer_Coverage_{when.strftime('%Y%m%d_%H%M%S')}.xlsx"
+
+
+def build_export_query(filters):
+    """Build the export's payer query and its count for the given filters."""
+    name = filters['name']
+    payer_type = filters['payer_type']
+    coverage_status = filters['coverage_status']
 
     # Build WHERE clause
     where_clauses = []
@@ -520,17 +1751,26 @@ def export_excel():
         params.append(payer_type)
 
     if coverage_status:
-        where_clauses.append("pp.coverage_status = %s")
-        params.append(coverage_status)
+        clause, param = coverage_filter(coverage_status)
+        where_clauses.append(clause)
+        params.append(param)
 
     where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
 
-    # Get payers with policies
-    cur.execute(f"""
+    # Payers with policies
+    return {
+        'count_sql': f"""
+        SELECT COUNT(*) AS count
+        FROM payers p
+        LEFT JOIN payer_policies pp ON p.id = pp.payer_id AND pp.is_current
+        WHERE {where_sql}
+    """,
+        'sql': f"""
         SELECT
             p.name,
             p.payer_type,
-            pp.coverage_status,
+            cs.name AS coverage_status,
+            COALESCE(cs.color_code, '#E2E8F0') AS color_code,
             pp.prior_auth_required,
             pp.investigational,
             pp.not_med_necessary,
@@ -539,68 +1779,148 @@ def export_excel():
             pp.notes,
             pp.source_url
         FROM payers p
-        LEFT JOIN payer_policies pp ON p.id = pp.payer_id
+        LEFT JOIN payer_policies pp ON p.id = pp.payer_id AND pp.is_current
+        LEFT JOIN coverage_categories cs ON cs.id = pp.coverage_status_id
         WHERE {where_sql}
         ORDER BY p.name
-    """, params)
+    """,
+        'params': params,
+    }
 
-    payers = cur.fetchall()
 
-    # Get searched payers
-    cur.execute("""
-        SELECT name, payer_type, notes, date_searched
-        FROM searched_payers
-        ORDER BY name
-    """)
-    searched = cur.fetchall()
+def stream_export_rows(conn, filters):
+    """Return (payers, searched) row iterators for an export, read through server-side cursors."""
+    query = build_export_query(filters)
+    return (stream_rows(conn, query['sql'], query['params'], name="export_payers"),
+            stream_rows(conn, EXPORT_SEARCHED_SQL, name="export_searched"))
 
-    conn.close()
 
+@app.route('/api/export')
+@http_cache.versioned
+def export_excel():
+    """Export payer data to Excel within the request (see /api/exports for large exports)."""
+    conn = get_db_connection()
+    try:
+        payers, searched = stream_export_rows(conn, export_filters(request.args))
+        with span("export"):
+            output = BytesIO()
+            build_export_workbook(payers, searched, output)
+    finally:
+        conn.close()
+
+    return Response(
+        output.getvalue(),
+        mimetype=XLSX_MIMETYPE,
+        headers={'Content-Disposition': f'attachment; filename={export_filename(datetime.now())}'}
+    )
+
+
+def generate_export(filters, path, progress):
+    """Write the export workbook for filters to path; runs on an export job worker."""
+    conn = get_db_connection()
+    try:
+        query = build_export_query(filters)
+        cur = conn.cursor()
+        cur.execute(query['count_sql'], query['params'])
+        total = cur.fetchone()['count']
+        progress(10)
+
+        payers, searched = stream_export_rows(conn, filters)
+        build_export_workbook(payers, searched, path, progress, total)
+    finally:
+        conn.close()
+
+
+export_queue = export_jobs.ExportQueue(generate_export)
+
+
+def export_job_json(job):
+    result = job.to_dict()
+    result['download_url'] = f"/api/exports/{job.id}/download" if job.status == export_jobs.DONE else None
+    return result
+
+
+@app.route('/api/exports', methods=['POST'])
+def create_export():
+    """Queue an Excel export for the filters in the JSON body (or query string).
+
+    An identical request against the same data version gets the existing job.
+    Answers 202 with the job while it is pending, 200 once it is done.
+    """
+    data = request.get_json(silent=True)
+    if data is not None and not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a JSON object of export filters'}), 400
+    filters = export_filters(data or request.args)
+    key = f"{sorted(filters.items())}@{http_cache.current_version()}"
+    job = export_queue.submit(key, filters)
+
+    status = 200 if job.status == export_jobs.DONE else 202
+    return jsonify(export_job_json(job)), status, {'Location': f"/api/exports/{job.id}"}
+
+
+@app.route('/api/exports/<job_id>')
+def get_export(job_id):
+    """Status and progress of an export job."""
+    job = export_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Export not found'}), 404
+    return jsonify(export_job_json(job))
+
+
+@app.route('/api/exports/<job_id>/download')
+def download_export(job_id):
+    """The finished workbook of an export job."""
+    job = export_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Export not found'}), 404
+    if job.status != export_jobs.DONE:
+        return jsonify({'error': f'Export is {job.status}'}), 409
+
+    return send_file(job.path, mimetype=XLSX_MIMETYPE, as_attachment=True,
+                     download_name=export_filename(datetime.fromtimestamp(job.finished_at)))
+
+
+def build_export_workbook(payers, searched, output, progress=None, payer_total=None):
+    """Write the three-sheet export workbook to output (a path or file object).
+
+    payers and searched may be any row iterables; the workbook is written in
+    openpyxl's write-only mode, so rows stream through without being kept.
+    progress(percent), if given, is called as the payer rows are written
+    (10 to 90, when payer_total is known) and before saving (95).
+    """
     # Create workbook
-    wb = Workbook()
+    wb = Workbook(write_only=True)
 
     # Styles
     header_font = Font(bold=True, color="FFFFFF")
     header_fill = PatternFill(start_color="2F5496", end_color="2F5496", fill_type="solid")
+    header_alignment = Alignment(horizontal='center', wrap_text=True)
+    body_alignment = Alignment(vertical='top', wrap_text=True)
     thin_border = Border(
         left=Side(style='thin'), right=Side(style='thin'),
         top=Side(style='thin'), bottom=Side(style='thin')
     )
-
-    # Sheet 1: Payers with E0469 Policies
-    ws1 = wb.active
-    ws1.title = "E0469 Payer Policies"
-
-    headers1 = ["Payer Name", "Payer Type", "Coverage Status", "Prior Auth Required",
-                "Investigational", "Not Med Necessary", "Policy Date", "Policy Number",
-                "Notes", "Source URL"]
-
-    for col, header in enumerate(headers1, 1):
-        cell = ws1.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal='center', wrap_text=True)
+    coverage_fills = {}
+
+    def header_row(ws, headers):
+        cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = header_alignment
+            cell.border = thin_border
+            cells.append(cell)
+        return cells
+
+    def body_cell(ws, value):
+        cell = WriteOnlyCell(ws, value=value)
         cell.border = thin_border
+        cell.alignment = body_alignment
+        return cell
 
-    for row_num, payer in enumerate(payers, 2):
-        ws1.cell(row=row_num, column=1, value=payer['name'])
-        ws1.cell(row=row_num, column=2, value=payer['payer_type'])
-
-        coverage_cell = ws1.cell(row=row_num, column=3, value=payer['coverage_status'])
-        color = COVERAGE_COLORS.get(payer['coverage_status'], '#E2E8F0').replace('#', '')
-        coverage_cell.fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
-
-        ws1.cell(row=row_num, column=4, value=payer['prior_auth_required'])
-        ws1.cell(row=row_num, column=5, value=payer['investigational'])
-        ws1.cell(row=row_num, column=6, value=payer['not_med_necessary'])
-        ws1.cell(row=row_num, column=7, value=payer['policy_date'])
-        ws1.cell(row=row_num, column=8, value=payer['policy_number'])
-        ws1.cell(row=row_num, column=9, value=payer['notes'])
-        ws1.cell(row=row_num, column=10, value=payer['source_url'])
-
-        for col in range(1, 11):
-            ws1.cell(row=row_num, column=col).border = thin_border
-            ws1.cell(row=row_num, column=col).alignment = Alignment(vertical='top', wrap_text=True)
+    # Sheet 1: Payers with E0469 Policies
+    ws1 = wb.create_sheet("E0469 Payer Policies")
 
     # Set column widths
     widths1 = [35, 18, 30, 20, 20, 20, 15, 25, 60, 50]
@@ -609,27 +1929,37 @@ def export_excel():
 
     ws1.freeze_panes = "A2"
 
-    # Sheet 2: Searched Payers (No E0469)
-    ws2 = wb.create_sheet("Searched - No E0469")
-
-    headers2 = ["Payer Name", "Payer Type", "Notes", "Date Searched"]
+    ws1.append(header_row(ws1, ["Payer Name", "Payer Type", "Coverage Status", "Prior Auth Required",
+                                "Investigational", "Not Med Necessary", "Policy Date", "Policy Number",
+                                "Notes", "Source URL"]))
 
-    for col, header in enumerate(headers2, 1):
-        cell = ws2.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal='center', wrap_text=True)
-        cell.border = thin_border
-
-    for row_num, payer in enumerate(searched, 2):
-        ws2.cell(row=row_num, column=1, value=payer['name'])
-        ws2.cell(row=row_num, column=2, value=payer['payer_type'])
-        ws2.cell(row=row_num, column=3, value=payer['notes'])
-        ws2.cell(row=row_num, column=4, value=str(payer['date_searched']) if payer['date_searched'] else '')
+    payer_count = 0
+    for payer in payers:
+        coverage_cell = body_cell(ws1, payer['coverage_status'])
+        color = payer['color_code'].replace('#', '')
+        if color not in coverage_fills:
+            coverage_fills[color] = PatternFill(start_color=color, end_color=color, fill_type="solid")
+        coverage_cell.fill = coverage_fills[color]
+
+        ws1.append([
+            body_cell(ws1, payer['name']),
+            body_cell(ws1, payer['payer_type']),
+            coverage_cell,
+            body_cell(ws1, payer['prior_auth_required']),
+            body_cell(ws1, payer['investigational']),
+            body_cell(ws1, payer['not_med_necessary']),
+            body_cell(ws1, payer['policy_date']),
+            body_cell(ws1, payer['policy_number']),
+            body_cell(ws1, payer['notes']),
+            body_cell(ws1, payer['source_url']),
+        ])
+
+        payer_count += 1
+        if progress and payer_total and payer_count % EXPORT_PROGRESS_ROWS == 0:
+            progress(10 + 80 * payer_count / payer_total)
 
-        for col in range(1, 5):
-            ws2.cell(row=row_num, column=col).border = thin_border
-            ws2.cell(row=row_num, column=col).alignment = Alignment(vertical='top', wrap_text=True)
+    # Sheet 2: Searched Payers (No E0469)
+    ws2 = wb.create_sheet("Searched - No E0469")
 
     widths2 = [40, 25, 60, 15]
     for col, width in enumerate(widths2, 1):
@@ -637,10 +1967,27 @@ def export_excel():
 
     ws2.freeze_panes = "A2"
 
+    ws2.append(header_row(ws2, ["Payer Name", "Payer Type", "Notes", "Date Searched"]))
+
+    searched_count = 0
+    for payer in searched:
+        ws2.append([
+            body_cell(ws2, payer['name']),
+            body_cell(ws2, payer['payer_type']),
+            body_cell(ws2, payer['notes']),
+            body_cell(ws2, str(payer['date_searched']) if payer['date_searched'] else ''),
+        ])
+        searched_count += 1
+
     # Sheet 3: Summary
     ws3 = wb.create_sheet("Summary")
-    ws3.cell(row=1, column=1, value="E0469 Payer Coverage Analysis Summary")
-    ws3.cell(row=1, column=1).font = Font(bold=True, size=14)
+    ws3.column_dimensions['A'].width = 45
+    ws3.column_dimensions['B'].width = 80
+
+    title = WriteOnlyCell(ws3, value="E0469 Payer Coverage Analysis Summary")
+    title.font = Font(bold=True, size=14)
+    ws3.append([title])
+    ws3.append([])
 
     summary_data = [
         ("", ""),
@@ -648,33 +1995,23 @@ def export_excel():
         ("Description:", "Lung expansion airway clearance, continuous high frequency oscillation, and nebulization device"),
         ("Effective Date:", "October 1, 2024"),
         ("", ""),
-        ("Total Payers with Explicit E0469 Policies:", str(len(payers))),
-        ("Searched Payers (No E0469 Found):", str(len(searched))),
+        ("Total Payers with Explicit E0469 Policies:", str(payer_count)),
+        ("Searched Payers (No E0469 Found):", str(searched_count)),
         ("", ""),
         ("Report Generated:", datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
     ]
 
-    for row_num, (label, value) in enumerate(summary_data, 3):
-        ws3.cell(row=row_num, column=1, value=label)
+    label_font = Font(bold=True)
+    for label, value in summary_data:
+        label_cell = WriteOnlyCell(ws3, value=label)
         if label.endswith(":"):
-            ws3.cell(row=row_num, column=1).font = Font(bold=True)
-        ws3.cell(row=row_num, column=2, value=value)
+            label_cell.font = label_font
+        ws3.append([label_cell, value])
 
-    ws3.column_dimensions['A'].width = 45
-    ws3.column_dimensions['B'].width = 80
+    if progress:
+        progress(95)
 
-    # Save to BytesIO
-    output = BytesIO()
     wb.save(output)
-    output.seek(0)
-
-    filename = f"E0469_Payer_Coverage_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-
-    return Response(
-        output.getvalue(),
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        headers={'Content-Disposition': f'attachment; filename={filename}'}
-    )
 
 
 @app.route('/api/payers', methods=['POST'])
@@ -708,12 +2045,12 @@ def add_payer():
         if data.get('coverage_status') or data.get('source_url') or data.get('notes'):
             cur.execute("""
                 INSERT INTO payer_policies (
-                    payer_id, coverage_status, prior_auth_required,
+                    payer_id, coverage_status_id, prior_auth_required,
                     investigational, notes, source_url
                 ) VALUES (%s, %s, %s, %s, %s, %s)
             """, (
                 payer_id,
-                data.get('coverage_status', ''),
+                coverage_status_id(cur, data.get('coverage_status')),
                 data.get('prior_auth_required', ''),
                 data.get('investigational', ''),
                 data.get('notes', ''),
@@ -723,12 +2060,163 @@ def add_payer():
         conn.commit()
         return jsonify({'success': True, 'id': payer_id})
 
+    except ValueError as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+
+@app.route('/api/payers/batch', methods=['PUT'])
+def update_payers_batch():
+    """Update the policies of many payers in one transaction.
+
+    Body: {"payers": [{"id": 7, "coverage_status": ..., "notes": ...}, ...]};
+    each item changes only the fields it carries, like PUT /api/payers/<id>.
+    Every item gets a result (updated or error); invalid items are skipped
+    and the rest are applied.
+    """
+    try:
+        items = batch_items(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        columns, results = build_batch_update(items, coverage_status_ids(cur))
+        updated = set()
+        if columns[0]:
+            cur.execute(PAYER_BATCH_UPDATE_SQL, columns)
+            updated = {row['payer_id'] for row in cur.fetchall()}
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+    for result in results:
+        if 'status' in result:
+            continue
+        if result['id'] in updated:
+            result['status'] = 'updated'
+        else:
+            result.update(status='error', error='Payer not found or has no policy')
+    return jsonify({'success': all(r['status'] != 'error' for r in results), 'results': results})
+
+
+@app.route('/api/payers/batch', methods=['POST'])
+def upsert_payers_batch():
+    """Insert or update many payers and their policies by name in one transaction.
+
+    Body: {"payers": [{"name": ..., "payer_type": ..., "coverage_status": ...,
+    "prior_auth_required": ..., "investigational": ..., "notes": ...,
+    "source_url": ...}, ...]}. Fields an item leaves out keep their current
+    values. Every item gets a result (inserted, updated, unchanged or error)
+    and its payer id; invalid items are skipped and the rest are applied.
+    """
+    try:
+        items = batch_items(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        payers, policies, results = build_batch_upsert(items, coverage_status_ids(cur))
+        upserted = {}
+        changed_policies = set()
+        if payers:
+            names = [name for name, _ in payers]
+            cur.execute(PAYER_BATCH_UPSERT_SQL, [names, [payer_type for _, payer_type in payers]])
+            upserted = {row['name']: row for row in cur.fetchall()}
+        if policies:
+            # Current policies are locked by payer id, so write them in id order
+            rows = sorted((upserted[name]['id'], *policy) for name, policy in policies.items())
+            cur.execute(PAYER_BATCH_POLICY_UPSERT_SQL, [list(column) for column in zip(*rows)])
+            changed_policies = {row['payer_id'] for row in cur.fetchall()}
+        conn.commit()
     except Exception as e:
         conn.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
         conn.close()
 
+    for result in results:
+        if 'status' in result:
+            continue
+        row = upserted[result['name']]
+        result['id'] = row['id']
+        if row['inserted']:
+            result['status'] = 'inserted'
+        elif row['changed'] or row['id'] in changed_policies:
+            result['status'] = 'updated'
+        else:
+            result['status'] = 'unchanged'
+    return jsonify({'success': all(r['status'] != 'error' for r in results), 'results': results})
+
+
+# Use DuckDuckGo HTML search (no API key required), Google as a backup
+WEB_SEARCH_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+}
+WEB_SEARCH_TIMEOUT = 10
+
+
+def build_web_search_urls(query):
+    """Build the DuckDuckGo and Google URLs for an E0469 policy search."""
+    # Build search query for E0469 policies
+    search_query = f'"{query}" "E0469" policy site:.gov OR site:.com OR site:.org filetype:pdf OR medical policy'
+    quoted = requests.utils.quote(search_query)
+    return (f"https://html.duckduckgo.com/html/?q={quoted}",
+            f"https://www.google.com/search?q={quoted}")
+
+
+def parse_duckduckgo_results(html):
+    """Extract likely policy documents from a DuckDuckGo HTML results page."""
+    results = []
+
+    # Find result links - DuckDuckGo uses class="result__a"
+    pattern = r'<a[^>]*class="result__a"[^>]*href="([^"]*)"[^>]*>([^<]*)</a>'
+    matches = re.findall(pattern, html, re.IGNORECASE)
+
+    for url, title in matches[:10]:  # Limit to 10 results
+        # Clean up URL (DuckDuckGo wraps URLs)
+        if 'uddg=' in url:
+            url_match = re.search(r'uddg=([^&]+)', url)
+            if url_match:
+                url = requests.utils.unquote(url_match.group(1))
+
+        # Filter for likely policy documents
+        if any(x in url.lower() for x in ['policy', 'medical', 'coverage', '.pdf', 'provider']):
+            results.append({
+                'title': title.strip(),
+                'url': url
+            })
+
+    return results
+
+
+def merge_google_results(html, results):
+    """Append Google result URLs not already in results."""
+    g_pattern = r'<a[^>]*href="/url\?q=([^"&]+)[^"]*"'
+    g_matches = re.findall(g_pattern, html)
+    for url in g_matches[:5]:
+        url = requests.utils.unquote(url)
+        if not any(x in url for x in ['google.com', 'youtube.com', 'facebook.com']):
+            if url not in [r['url'] for r in results]:
+                results.append({
+                    'title': url.split('/')[-1][:50] or 'Policy Document',
+                    'url': url
+                })
+    return results
+
 
 @app.route('/api/web-search', methods=['POST'])
 def web_search():
@@ -739,61 +2227,22 @@ def web_search():
     if not query:
         return jsonify({'error': 'Search query is required'}), 400
 
-    # Build search query for E0469 policies
-    search_query = f'"{query}" "E0469" policy site:.gov OR site:.com OR site:.org filetype:pdf OR medical policy'
+    search_url, google_url = build_web_search_urls(query)
 
     try:
-        # Use DuckDuckGo HTML search (no API key required)
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        }
-
-        # Search DuckDuckGo
-        search_url = f"https://html.duckduckgo.com/html/?q={requests.utils.quote(search_query)}"
-        response = requests.get(search_url, headers=headers, timeout=10)
+        response = requests.get(search_url, headers=WEB_SEARCH_HEADERS, timeout=WEB_SEARCH_TIMEOUT)
 
         results = []
 
         if response.status_code == 200:
-            # Parse results from HTML
-            # Extract URLs and titles from DuckDuckGo results
-            html = response.text
-
-            # Find result links - DuckDuckGo uses class="result__a"
-            pattern = r'<a[^>]*class="result__a"[^>]*href="([^"]*)"[^>]*>([^<]*)</a>'
-            matches = re.findall(pattern, html, re.IGNORECASE)
-
-            for url, title in matches[:10]:  # Limit to 10 results
-                # Clean up URL (DuckDuckGo wraps URLs)
-                if 'uddg=' in url:
-                    url_match = re.search(r'uddg=([^&]+)', url)
-                    if url_match:
-                        url = requests.utils.unquote(url_match.group(1))
-
-                # Filter for likely policy documents
-                if any(x in url.lower() for x in ['policy', 'medical', 'coverage', '.pdf', 'provider']):
-                    results.append({
-                        'title': title.strip(),
-                        'url': url
-                    })
+            results = parse_duckduckgo_results(response.text)
 
         # Also search Google (backup)
         if len(results) < 5:
-            google_url = f"https://www.google.com/search?q={requests.utils.quote(search_query)}"
             try:
-                g_response = requests.get(google_url, headers=headers, timeout=10)
+                g_response = requests.get(google_url, headers=WEB_SEARCH_HEADERS, timeout=WEB_SEARCH_TIMEOUT)
                 if g_response.status_code == 200:
-                    # Extract URLs from Google results
-                    g_pattern = r'<a[^>]*href="/url\?q=([^"&]+)[^"]*"'
-                    g_matches = re.findall(g_pattern, g_response.text)
-                    for url in g_matches[:5]:
-                        url = requests.utils.unquote(url)
-                        if not any(x in url for x in ['google.com', 'youtube.com', 'facebook.com']):
-                            if url not in [r['url'] for r in results]:
-                                results.append({
-                                    'title': url.split('/')[-1][:50] or 'Policy Document',
-                                    'url': url
-                                })
+                    merge_google_results(g_response.text, results)
             except:
                 pass  # Google search is optional fallback
 
@@ -810,6 +2259,8 @@ def web_search():
 
 if __name__ == '__main__':
     print("Starting E0469 Payer Coverage Dashboard...")
-    print(f"Database: {DB_CONFIG['dbname']} on {DB_CONFIG['host']}:{DB_CONFIG['port']}")
+    print(f"Database: {PRIMARY_CONFIG.get('dbname')} on {PRIMARY_CONFIG.get('host')}:{PRIMARY_CONFIG.get('port')}")
+    for replica in replica_router.replicas:
+        print(f"Read replica: {replica.name}")
     print("Dashboard URL: http://localhost:5002")
     app.run(host='0.0.0.0', port=5002, debug=True)
@@ -0,0 +1,753 @@
+#!/usr/bin/env python3
+"""
+E0469 Payer Coverage Dashboard - ASGI serving mode.
+
+Serves the same routes and JSON as dashboard.py. The read endpoints and web
+search run as native async handlers on an asyncpg connection pool and a
+shared httpx client; every other route (pages, export, writes, /metrics) is
+passed through to the Flask app, which runs in a thread pool. The live
+change stream is native too, fed by one LISTEN connection per worker.
+Conditional GET, Cache-Control and compression follow http_cache, and share
+its data version cache with the Flask routes in the same process.
+
+Install and run with several worker processes:
+    pip3 install starlette uvicorn asyncpg httpx a2wsgi
+    uvicorn dashboard_asgi:app --host 0.0.0.0 --port 5002 --workers 4
+
+    # or, with WEB_CONCURRENCY workers (default: one per CPU)
+    python3 dashboard_asgi.py
+
+Compare throughput against the WSGI path (run each server in turn on :5002):
+    python3 benchmark/run_benchmark.py run --label wsgi --output wsgi.json
+    python3 benchmark/run_benchmark.py run --label asgi --output asgi.json
+    python3 benchmark/run_benchmark.py compare wsgi.json asgi.json
+
+Each worker opens its own pool of DB_POOL_MIN..DB_POOL_MAX connections
+(default 2..10), so keep workers x DB_POOL_MAX below max_connections.
+With DB_REPLICA_DSNS set, native reads go to replicas as in dashboard.py
+(see db_routing.py), through a pool of up to DB_POOL_MAX per replica.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import wraps
+
+try:
+    import asyncpg
+    import httpx
+    import uvicorn
+    from a2wsgi import WSGIMiddleware
+    from starlette.applications import Starlette
+    from starlette.responses import Response, StreamingResponse
+    from starlette.routing import Mount, Route
+except ImportError as e:
+    print(f"Missing dependency: {e.name}")
+    print("Run: pip3 install starlette uvicorn asyncpg httpx a2wsgi")
+    sys.exit(1)
+
+import change_feed
+import db_routing
+import http_cache
+import instrumentation
+import query_registry
+from name_index import PAYER_NAMES_SQL
+from dashboard import (
+    AGGREGATE_GROUPS_SQL,
+    AGGREGATE_TOTALS_SQL,
+    CHANGED_PAYER_ROWS_SQL,
+    COVERAGE_STATUSES,
+    EXACT_COUNT_THRESHOLD,
+    PAYER_COLUMNS_SQL,
+    PAYER_FROM_SQL,
+    PAYER_TYPES_SQL,
+    POLICY_HISTORY_SQL,
+    PRIMARY_CONFIG,
+    SQLITE,
+    STATE_COVERAGE_SQL,
+    WEB_SEARCH_HEADERS,
+    WEB_SEARCH_TIMEOUT,
+    app as flask_app,
+    bootstrap_json,
+    changes_json,
+    coverage_trend_json,
+    build_bootstrap_query,
+    build_changes_query,
+    build_coverage_trend_query,
+    build_payer_batch_query,
+    build_payers_query,
+    build_searched_payers_query,
+    build_state_payers_query,
+    build_web_search_urls,
+    merge_google_results,
+    parse_duckduckgo_results,
+    payer_changes,
+    payer_name_index,
+    planned_rows,
+    replica_router,
+    splice_json,
+    suggest_limit,
+    total_pages,
+)
+
+if SQLITE:
+    print("dashboard_asgi.py needs PostgreSQL; serve DB_BACKEND=sqlite with dashboard.py")
+    sys.exit(1)
+
+POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN", 2))
+POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX", 10))
+
+log = logging.getLogger("dashboard.asgi")
+
+# Failures that mean a replica cannot be reached; the read is retried on the primary
+REPLICA_UNREACHABLE = (OSError, asyncio.TimeoutError, asyncpg.PostgresConnectionError,
+                       asyncpg.OperatorInterventionError)
+
+
+class RegistryConnection(asyncpg.Connection):
+    """asyncpg connection that tracks its prepared statements for query_registry."""
+
+    __slots__ = ("prepared",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = OrderedDict()
+
+
+async def on_connection(pool, call):
+    """Await call(conn) on a connection from pool (or a request's ReplicaReadPool)."""
+    if isinstance(pool, ReplicaReadPool):
+        return await pool.run(call)
+    with instrumentation.connect_span():
+        conn = await pool.acquire()
+    try:
+        return await call(conn)
+    finally:
+        await pool.release(conn)
+
+
+class ReplicaReadPool:
+    """One request's reads from a replica's pool.
+
+    When the replica cannot be reached it is marked down, and the failed
+    read and the rest of the request's reads go to the primary, as
+    dashboard.get_db_connection does.
+    """
+
+    def __init__(self, request, replica):
+        self.request = request
+        self.replica = replica
+
+    async def run(self, call):
+        state = self.request.state
+        if state.db_source == self.replica.name:
+            try:
+                return await on_connection(self.request.app.state.replica_pools[self.replica.name], call)
+            except REPLICA_UNREACHABLE as e:
+                log.warning("replica %s unreachable (%s); reading from the primary instead",
+                            self.replica.name, str(e).strip() or type(e).__name__)
+                self.replica.mark_down()
+                state.db_source = None
+        return await on_connection(self.request.app.state.pool, call)
+
+
+async def run_query(pool, method, sql, params=()):
+    """Run one statement on its own pooled connection.
+
+    method is the asyncpg Connection method to call (fetch, fetchrow or
+    fetchval). Independent statements can be awaited together with gather.
+    """
+    async def call(conn):
+        with instrumentation.query_timer(sql):
+            return await getattr(conn, method)(query_registry.numbered(sql), *params)
+
+    return await on_connection(pool, call)
+
+
+async def run_prepared(pool, method, sql, params=()):
+    """run_query for a hot query shape: prepared once per connection, then run by name."""
+    return await on_connection(pool, lambda conn: query_registry.run(conn, method, sql, params))
+
+
+async def count_rows(pool, query):
+    """dashboard.count_rows on the connection pool: a listing's (total, estimated)."""
+    if query['estimate_sql']:
+        rows = planned_rows(await run_query(pool, "fetchval", query['estimate_sql'], query['params']))
+        if rows > EXACT_COUNT_THRESHOLD:
+            return rows, True
+    row = await run_prepared(pool, "fetchrow", query['count_sql'], query['params'])
+    return row['count'], row['estimated']
+
+
+def json_response(payload, status=200):
+    """Encode like jsonify() so both serving modes return identical bodies."""
+    with instrumentation.span("serialize"):
+        body = flask_app.json.dumps(payload, separators=(",", ":"))
+    return Response(body + "\n", status_code=status, media_type=flask_app.json.mimetype)
+
+
+def raw_json_response(payload, **fragments):
+    """Return payload as JSON with pre-serialized fragments spliced in."""
+    with instrumentation.span("serialize"):
+        body = splice_json(payload, **fragments)
+    return Response(body + "\n", media_type=flask_app.json.mimetype)
+
+
+def timed(endpoint):
+    """Record request metrics and Server-Timing for a native handler, as the Flask hooks do."""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request):
+            started = time.perf_counter()
+            spans = instrumentation.begin_spans()
+            try:
+                response = await handler(request)
+            except Exception:
+                # Starlette turns it into a 500 later; count it like Flask does
+                instrumentation.observe_request(request.method, endpoint, 500,
+                                                time.perf_counter() - started)
+                raise
+            elapsed = time.perf_counter() - started
+            instrumentation.observe_request(request.method, endpoint, response.status_code, elapsed)
+            response.headers["Server-Timing"] = instrumentation.server_timing_header(spans, elapsed)
+            return response
+        return wrapper
+    return decorator
+
+
+def asyncpg_params(config):
+    """asyncpg connect arguments for psycopg2-style connection parameters."""
+    params = {
+        'database': config.get('dbname'),
+        'user': config.get('user'),
+        'password': config.get('password'),
+        'host': config.get('host'),
+        'port': int(config['port']) if config.get('port') else None,
+    }
+    return {key: value for key, value in params.items() if value is not None}
+
+
+def read_pool(request):
+    """The pool for this request's reads: a replica's (see db_routing.py) or the primary's.
+
+    Chosen once per request, so the data version and the data come from the
+    same database.
+    """
+    if not hasattr(request.state, 'db_pool'):
+        replica = replica_router.choose(db_routing.parse_lsn(request.cookies.get(db_routing.LSN_COOKIE)))
+        request.state.db_source = replica.name if replica else None
+        request.state.db_pool = ReplicaReadPool(request, replica) if replica else request.app.state.pool
+    return request.state.db_pool
+
+
+async def current_version(request):
+    """Return the data version, querying it when the cached value has expired."""
+    pool = read_pool(request)
+    version = http_cache.data_version.cached(request.state.db_source)
+    if version is None:
+        version = http_cache.data_version.store(
+            await run_query(pool, "fetchval", http_cache.DATA_VERSION_SQL), request.state.db_source)
+    return version
+
+
+def versioned(handler):
+    """Answer conditional GETs from the data version and tag fresh responses with it."""
+    @wraps(handler)
+    async def wrapper(request):
+        version = await current_version(request)
+        headers = http_cache.validator_headers(version)
+
+        if http_cache.is_not_modified(version, request.headers.get("if-none-match"),
+                                      request.headers.get("if-modified-since")):
+            return Response(status_code=304, headers=headers)
+
+        response = await handler(request)
+        if response.status_code == 200:
+            response.headers.update(headers)
+        return response
+    return wrapper
+
+
+def static_list(max_age=http_cache.STATIC_MAX_AGE):
+    """Let clients cache a response that only changes on deploy."""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request):
+            response = await handler(request)
+            headers = {
+                "ETag": http_cache.body_etag(response.body),
+                "Cache-Control": f"public, max-age={max_age}",
+            }
+            if http_cache.etag_matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+                return Response(status_code=304, headers=headers)
+            response.headers.update(headers)
+            return response
+        return wrapper
+    return decorator
+
+
+def compressed(handler):
+    """Compress a large JSON response if the client accepts it."""
+    @wraps(handler)
+    async def wrapper(request):
+        response = await handler(request)
+        if (response.status_code != 200 or "content-encoding" in response.headers
+                or response.media_type != flask_app.json.mimetype
+                or len(response.body) < http_cache.COMPRESS_MIN_BYTES):
+            return response
+
+        response.headers["Vary"] = "Accept-Encoding"
+        encoding = http_cache.choose_encoding(request.headers.get("accept-encoding"))
+        if encoding:
+            response.body = http_cache.compress(response.body, encoding)
+            response.headers["Content-Encoding"] = encoding
+            response.headers["Content-Length"] = str(len(response.body))
+        return response
+    return wrapper
+
+
+@timed('/api/bootstrap')
+@compressed
+@versioned
+async def get_bootstrap(request):
+    """Get dropdowns, aggregates and first pages of both tables in one round trip."""
+    sql, params, payers, searched = build_bootstrap_query()
+    row = await run_query(read_pool(request), "fetchrow", sql, params)
+
+    with instrumentation.span("serialize"):
+        body = bootstrap_json(row, payers, searched)
+    return Response(body + "\n", media_type=flask_app.json.mimetype)
+
+
+@timed('/api/state-coverage')
+@compressed
+@versioned
+async def get_state_coverage(request):
+    """Get coverage status by state for heatmap with breakdown by status."""
+    states = await run_query(read_pool(request), "fetchval", STATE_COVERAGE_SQL)
+
+    with instrumentation.span("serialize"):
+        return Response(states + "\n", media_type=flask_app.json.mimetype)
+
+
+@timed('/api/state-coverage/<state>')
+@compressed
+@versioned
+async def get_state_payers(request):
+    """Get the payers behind one state's coverage counts, optionally for one status."""
+    state = request.path_params['state'].upper()
+    if not re.fullmatch(r'[A-Z]{2}', state):
+        return json_response({'error': 'State must be a two-letter code'}, 400)
+
+    query = build_state_payers_query(state, request.query_params)
+    pool = read_pool(request)
+
+    total, payers = await asyncio.gather(
+        run_query(pool, "fetchval", query['count_sql'], query['params']),
+        run_query(pool, "fetchval", query['page_sql'],
+                  query['params'] + [query['per_page'], query['offset']])
+    )
+
+    return raw_json_response({
+        'state': state,
+        'status': query['status'],
+        'total': total,
+        'page': query['page'],
+        'per_page': query['per_page'],
+        'total_pages': total_pages(total, query['per_page'])
+    }, payers=payers)
+
+
+@timed('/api/payers')
+@compressed
+@versioned
+async def get_payers(request):
+    """Get payers with filtering, sorting, pagination and a choice of fields."""
+    try:
+        query = build_payers_query(request.query_params)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+    pool = read_pool(request)
+
+    # Count (with facets, when asked) and page are independent, so run them
+    # on two connections at once
+    if query['facets_sql']:
+        counts = run_prepared(pool, "fetchrow", query['facets_sql'], query['params'])
+    else:
+        counts = count_rows(pool, query)
+    counted, payers = await asyncio.gather(
+        counts,
+        run_prepared(pool, "fetchval", query['page_sql'],
+                     query['params'] + [query['per_page'], query['offset']])
+    )
+
+    fragments = {}
+    if query['facets_sql']:
+        total, estimated = counted['count'], False
+        fragments['facets'] = counted['facets']
+    else:
+        total, estimated = counted
+    fragments['payers'] = payers
+    return raw_json_response({
+        'total': total,
+        'estimated': estimated,
+        'page': query['page'],
+        'per_page': query['per_page'],
+        'total_pages': total_pages(total, query['per_page'])
+    }, **fragments)
+
+
+@timed('/api/payers/suggest')
+@versioned
+async def suggest_payers(request):
+    """Suggest payer names starting with (or containing a word starting with) q."""
+    query = request.query_params.get('q', '')
+    limit = suggest_limit(request.query_params)
+
+    version = await current_version(request)
+    if not payer_name_index.is_current(version):
+        rows = await run_query(read_pool(request), "fetch", PAYER_NAMES_SQL)
+        payer_name_index.rebuild(rows, version)
+
+    with instrumentation.span("suggest"):
+        suggestions = payer_name_index.suggest(query, limit)
+
+    return json_response({'query': query, 'suggestions': suggestions})
+
+
+@timed('/api/payers/<int:payer_id>')
+@compressed
+@versioned
+async def get_payer(request):
+    """Get single payer details."""
+    payer = await run_query(read_pool(request), "fetchrow", f"""
+        SELECT {PAYER_COLUMNS_SQL}
+        {PAYER_FROM_SQL}
+        WHERE p.id = %s
+    """, [request.path_params['payer_id']])
+
+    if payer:
+        return json_response(dict(payer))
+    else:
+        return json_response({'error': 'Payer not found'}, 404)
+
+
+@timed('/api/payers/batch')
+@compressed
+@versioned
+async def get_payers_batch(request):
+    """Get several payers by id (ids=1,2,3), in request order, plus the ids not found."""
+    try:
+        query = build_payer_batch_query(request.query_params)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    row = await run_query(read_pool(request), "fetchrow", query['sql'], query['params'])
+    return raw_json_response({}, payers=row['payers'], missing=row['missing'])
+
+
+@timed('/api/payers/<int:payer_id>/history')
+@compressed
+@versioned
+async def get_payer_history(request):
+    """Get every version of a payer's policy with its validity period, newest first."""
+    row = await run_query(read_pool(request), "fetchrow", POLICY_HISTORY_SQL,
+                          [request.path_params['payer_id']])
+
+    if not row:
+        return json_response({'error': 'Payer not found'}, 404)
+    return raw_json_response({'payer_id': row['id'], 'name': row['name']}, versions=row['versions'])
+
+
+@timed('/api/coverage-statuses')
+@static_list()
+async def get_coverage_statuses(request):
+    """Get the 3 simplified coverage categories."""
+    return json_response(COVERAGE_STATUSES)
+
+
+@timed('/api/payer-types')
+@compressed
+@versioned
+async def get_payer_types(request):
+    """Get distinct payer types."""
+    rows = await run_query(read_pool(request), "fetch", PAYER_TYPES_SQL)
+    return json_response([row['payer_type'] for row in rows])
+
+
+@timed('/api/aggregates')
+@compressed
+@versioned
+async def get_aggregates(request):
+    """Get summary statistics."""
+    pool = read_pool(request)
+
+    totals, groups = await asyncio.gather(
+        asyncio.gather(*(run_query(pool, "fetchval", sql) for sql in AGGREGATE_TOTALS_SQL.values())),
+        asyncio.gather(*(run_query(pool, "fetch", sql) for sql in AGGREGATE_GROUPS_SQL.values()))
+    )
+
+    result = dict(zip(AGGREGATE_TOTALS_SQL, totals))
+    for key, rows in zip(AGGREGATE_GROUPS_SQL, groups):
+        result[key] = [dict(row) for row in rows]
+
+    return json_response(result)
+
+
+@timed('/api/searched-payers')
+@compressed
+@versioned
+async def get_searched_payers(request):
+    """Get payers that were searched but no E0469 policy found."""
+    query = build_searched_payers_query(request.query_params)
+    pool = read_pool(request)
+
+    (total, estimated), rows = await asyncio.gather(
+        count_rows(pool, query),
+        run_query(pool, "fetch", query['page_sql'],
+                  query['params'] + [query['per_page'], query['offset']])
+    )
+
+    return json_response({
+        'payers': [dict(row) for row in rows],
+        'total': total,
+        'estimated': estimated,
+        'page': query['page'],
+        'per_page': query['per_page'],
+        'total_pages': total_pages(total, query['per_page'])
+    })
+
+
+@timed('/api/web-search')
+async def web_search(request):
+    """Search the web for E0469 payer policies."""
+    data = await request.json()
+    query = data.get('query', '').strip()
+
+    if not query:
+        return json_response({'error': 'Search query is required'}, 400)
+
+    search_url, google_url = build_web_search_urls(query)
+    http = request.app.state.http
+
+    try:
+        response = await http.get(search_url)
+
+        results = []
+
+        if response.status_code == 200:
+            results = parse_duckduckgo_results(response.text)
+
+        # Also search Google (backup)
+        if len(results) < 5:
+            try:
+                g_response = await http.get(google_url)
+                if g_response.status_code == 200:
+                    merge_google_results(g_response.text, results)
+            except httpx.HTTPError:
+                pass  # Google search is optional fallback
+
+        return json_response({
+            'query': query,
+            'results': results[:10]
+        })
+
+    except httpx.TimeoutException:
+        return json_response({'error': 'Search timed out. Please try again.'}, 504)
+    except Exception as e:
+        return json_response({'error': f'Search failed: {str(e)}'}, 500)
+
+
+@timed('/api/coverage-trend')
+@compressed
+@versioned
+async def get_coverage_trend(request):
+    """Payers per coverage status at each month end, overall and per payer type."""
+    try:
+        query = build_coverage_trend_query(request.query_params)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    rows = await run_query(read_pool(request), "fetch", query['sql'], query['params'])
+    return json_response(coverage_trend_json(query, rows))
+
+
+@timed('/api/changes')
+@compressed
+async def get_changes(request):
+    """Payers, policies and searched payers changed or deleted after a cursor."""
+    try:
+        query = build_changes_query(request.query_params)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    # Always the primary, like dashboard.PRIMARY_READ_ENDPOINTS
+    rows = await run_query(request.app.state.pool, "fetch", query['sql'], query['params'])
+
+    with instrumentation.span("serialize"):
+        body = changes_json(query, rows)
+    return Response(body + "\n", media_type=flask_app.json.mimetype)
+
+
+async def stream_changes(request):
+    """Server-sent events with row-level deltas for payers changed by anyone."""
+    wake = asyncio.Event()
+    subscription = payer_changes.subscribe(wake.set, request.headers.get('last-event-id'))
+
+    async def events():
+        try:
+            yield change_feed.stream_preamble()
+            while True:
+                try:
+                    await asyncio.wait_for(wake.wait(), change_feed.HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield change_feed.HEARTBEAT
+                    continue
+                wake.clear()
+                for event in subscription.drain(payer_changes.resync_event()):
+                    yield event
+        finally:
+            payer_changes.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+async def publish_payer_changes(pool, pending):
+    """Publish the notifications collected over one coalescing window.
+
+    If the changed rows cannot be loaded, subscribers get a resync instead,
+    as from the Flask Listener: the window's changes are already taken.
+    """
+    await asyncio.sleep(change_feed.COALESCE_SECONDS)
+    changed = dict(pending)
+    pending.clear()
+
+    http_cache.data_version.invalidate()
+    try:
+        rows = await run_query(pool, "fetch", CHANGED_PAYER_ROWS_SQL, [list(changed)])
+    except Exception:
+        log.exception("change feed: loading %d changed payers failed", len(changed))
+        payer_changes.publish_resync()
+        return
+    payer_changes.publish_changes(changed, [dict(row) for row in rows])
+
+
+async def listen_for_changes(pool):
+    """LISTEN on a dedicated connection and feed payer_changes; reconnects on loss."""
+    connected_before = False
+    while True:
+        try:
+            conn = await asyncpg.connect(**asyncpg_params(PRIMARY_CONFIG))
+        except (OSError, asyncpg.PostgresError):
+            log.exception("change feed: connect failed")
+            await asyncio.sleep(change_feed.RECONNECT_SECONDS)
+            continue
+
+        pending = {}
+        flushes = set()
+
+        def on_notify(connection, pid, channel, payload):
+            changed = change_feed.collect_changes([change_feed.parse_notification(payload)])
+            if not changed:
+                return
+            flushing = bool(pending)
+            for payer_id, structural in changed.items():
+                pending[payer_id] = pending.get(payer_id, False) or structural
+            if not flushing:
+                task = asyncio.create_task(publish_payer_changes(pool, pending))
+                flushes.add(task)
+                task.add_done_callback(flushes.discard)
+
+        try:
+            await conn.add_listener(change_feed.CHANNEL, on_notify)
+            if connected_before:
+                # Notifications sent while disconnected are lost
+                http_cache.data_version.invalidate()
+                payer_changes.publish_resync()
+            connected_before = True
+
+            while True:
+                await asyncio.sleep(change_feed.HEARTBEAT_SECONDS)
+                await conn.fetchval("SELECT 1")  # surfaces a dead connection
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            log.exception("change feed: listener connection lost")
+        finally:
+            conn.terminate()
+        await asyncio.sleep(change_feed.RECONNECT_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Open the connection pools, HTTP client and change listener once per worker process."""
+    app.state.pool = await asyncpg.create_pool(
+        **asyncpg_params(PRIMARY_CONFIG),
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        connection_class=RegistryConnection
+    )
+    # Replica pools start empty and connect on first use, so a replica that
+    # is down at startup does not stop the worker
+    app.state.replica_pools = {}
+    for replica in replica_router.replicas:
+        app.state.replica_pools[replica.name] = await asyncpg.create_pool(
+            **asyncpg_params(replica.config),
+            timeout=db_routing.REPLICA_CONNECT_TIMEOUT,
+            min_size=0,
+            max_size=POOL_MAX_SIZE,
+            connection_class=RegistryConnection
+        )
+    app.state.http = httpx.AsyncClient(headers=WEB_SEARCH_HEADERS, timeout=WEB_SEARCH_TIMEOUT)
+    listener = asyncio.create_task(listen_for_changes(app.state.pool))
+    try:
+        yield
+    finally:
+        listener.cancel()
+        await app.state.http.aclose()
+        for pool in app.state.replica_pools.values():
+            await pool.close()
+        await app.state.pool.close()
+
+
+# Native routes first; anything they don't match (other methods included)
+# falls through to the Flask app
+app = Starlette(
+    routes=[
+        Route('/api/bootstrap', get_bootstrap, methods=['GET']),
+        Route('/api/state-coverage', get_state_coverage, methods=['GET']),
+        Route('/api/state-coverage/{state}', get_state_payers, methods=['GET']),
+        Route('/api/payers', get_payers, methods=['GET']),
+        Route('/api/payers/suggest', suggest_payers, methods=['GET']),
+        Route('/api/payers/batch', get_payers_batch, methods=['GET']),
+        Route('/api/payers/{payer_id:int}', get_payer, methods=['GET']),
+        Route('/api/payers/{payer_id:int}/history', get_payer_history, methods=['GET']),
+        Route('/api/coverage-statuses', get_coverage_statuses, methods=['GET']),
+        Route('/api/payer-types', get_payer_types, methods=['GET']),
+        Route('/api/aggregates', get_aggregates, methods=['GET']),
+        Route('/api/coverage-trend', get_coverage_trend, methods=['GET']),
+        Route('/api/searched-payers', get_searched_payers, methods=['GET']),
+        Route('/api/web-search', web_search, methods=['POST']),
+        Route('/api/changes', get_changes, methods=['GET']),
+        Route('/api/changes/stream', stream_changes, methods=['GET']),
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    lifespan=lifespan
+)
+
+
+if __name__ == '__main__':
+    workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+    print("Starting E0469 Payer Coverage Dashboard (ASGI)...")
+    print(f"Database: {PRIMARY_CONFIG.get('dbname')} on {PRIMARY_CONFIG.get('host')}:{PRIMARY_CONFIG.get('port')}")
+    for replica in replica_router.replicas:
+        print(f"Read replica: {replica.name}")
+    print(f"Workers: {workers}")
+    print("Dashboard URL: http://localhost:5002")
+    uvicorn.run("dashboard_asgi:app", host='0.0.0.0', port=5002, workers=workers)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Per-process psycopg2 connection pools for the E0469 dashboard.
+
+Every request used to open (and authenticate) a new connection and close it
+again, so nothing a connection learned survived the request. A pooled
+connection's close() hands it back instead: it is rolled back and kept for
+the next request, up to DB_POOL_SIZE idle connections per database. That is
+what lets query_registry prepare a statement once per connection rather than
+once per request.
+
+Connections are returned by close(), so callers keep the usual
+conn = connect() ... conn.close() pattern; a second close() is ignored.
+Connections that are broken or left in a transaction that cannot be rolled
+back are discarded rather than reused.
+
+Usage:
+    pool = ConnectionPool(config, cursor_factory=InstrumentedCursor)
+    conn = pool.get()
+    ...
+    conn.close()                         # back to the pool
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import psycopg2
+import psycopg2.extensions
+
+# Idle connections kept per database (0 disables pooling)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+
+log = logging.getLogger("dashboard.db_pool")
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection whose close() returns it to its pool.
+
+    prepared maps the names of the statements prepared on this connection
+    (see query_registry) in least recently used order.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.in_use = False
+        self.prepared = OrderedDict()
+
+    def close(self):
+        if self.pool is None:
+            self.discard()
+        elif self.in_use:
+            self.in_use = False
+            self.pool.put(self)
+
+    def discard(self):
+        """Really close the connection."""
+        psycopg2.extensions.connection.close(self)
+
+
+class ConnectionPool:
+    """Idle connections to one database, handed out most recently used first."""
+
+    def __init__(self, config, size=DB_POOL_SIZE, **connect_args):
+        self.config = config
+        self.size = size
+        self.connect_args = connect_args
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        """An idle connection, or a new one when none is left."""
+        conn = None
+        with self._lock:
+            while self._idle and conn is None:
+                conn = self._idle.pop()
+                if conn.closed:
+                    conn = None
+        if conn is None:
+            conn = psycopg2.connect(**self.config, **self.connect_args,
+                                    connection_factory=PooledConnection)
+            conn.pool = self
+        conn.in_use = True
+        return conn
+
+    def put(self, conn):
+        """Take a connection back, ending whatever transaction it was in."""
+        if conn.closed:
+            return
+        try:
+            conn.rollback()
+            conn.autocommit = False
+        except psycopg2.Error as e:
+            log.warning("discarding a pooled connection: %s", str(e).strip())
+            conn.discard()
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.discard()
+
+    def clear(self):
+        """Close every idle connection (after the server went away, say)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.discard()
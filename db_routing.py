@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Primary/replica routing for the E0469 dashboard.
+
+Writes, the /api/changes feed, and everything outside a request (change
+notifications, export jobs) use the primary. Other reads made while serving
+a GET or HEAD go to a streaming replica whose replay lag is at most
+REPLICA_MAX_LAG seconds, round-robin, or to the primary when no replica
+qualifies. A checker thread polls every replica's
+lag and replay position each REPLICA_CHECK_SECONDS, so a replica can fall up
+to that much further behind before it is skipped.
+
+Read-your-writes: a write response sets the LSN_COOKIE cookie to the
+primary's WAL position after the write. While it lasts, that session's
+reads only go to replicas that have replayed past it, otherwise to the
+primary.
+
+Replicas are libpq connection strings (key=value or URIs), separated by ';':
+
+    DB_REPLICA_DSNS="host=replica1 dbname=e0469_analysis user=postgres;postgresql://replica2/e0469_analysis"
+
+Usage:
+    router = ReplicaRouter(parse_dsns(os.environ.get("DB_REPLICA_DSNS", "")))
+    replica = router.choose(parse_lsn(request.cookies.get(LSN_COOKIE)))
+    conn = psycopg2.connect(**(replica.config if replica else primary_config))
+"""
+
+import itertools
+import logging
+import os
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+from instrumentation import DB_READ_ROUTES_TOTAL
+
+# Replicas further behind the primary than this (seconds) are not read from
+REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", 5))
+
+# How often each replica's lag and replay position are polled
+REPLICA_CHECK_SECONDS = float(os.environ.get("DB_REPLICA_CHECK_SECONDS", 1))
+
+# Give up on an unreachable replica after this long (libpq wants whole seconds)
+REPLICA_CONNECT_TIMEOUT = 2
+
+# Lifetime of the read-your-writes cookie set by a write
+READ_YOUR_WRITES_SECONDS = int(os.environ.get("READ_YOUR_WRITES_SECONDS", 60))
+
+LSN_COOKIE = "e0469_lsn"
+
+log = logging.getLogger("dashboard.db_routing")
+
+# Lag is 0 while everything received has been replayed: on an idle primary the
+# last replayed transaction can be old without the replica being behind. That
+# only holds while the WAL receiver is streaming; a disconnected replica has
+# replayed all it received too, so its lag is unknown (NULL) instead
+REPLICA_STATUS_SQL = """
+    SELECT
+        CASE
+            WHEN NOT r.streaming THEN NULL
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        END AS lag,
+        pg_last_wal_replay_lsn()::text AS replay_lsn,
+        r.streaming
+    FROM (
+        SELECT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') AS streaming
+    ) r
+    WHERE pg_is_in_recovery()
+"""
+
+# Position a replica must have replayed to see every write committed so far
+PRIMARY_LSN_SQL = "SELECT pg_current_wal_lsn()::text AS lsn"
+
+
+def parse_dsns(value):
+    """Connection strings from a ';'-separated list (empty: no replicas)."""
+    return [dsn.strip() for dsn in value.split(";") if dsn.strip()]
+
+
+def parse_dsn(dsn):
+    """psycopg2.connect keyword arguments for a libpq connection string."""
+    return psycopg2.extensions.parse_dsn(dsn)
+
+
+def parse_lsn(value):
+    """A WAL position ('16/B374D848') as an integer, or None when missing or malformed."""
+    high, _, low = (value or "").partition("/")
+    try:
+        return (int(high, 16) << 32) + int(low, 16)
+    except ValueError:
+        return None
+
+
+class Replica:
+    """One replica and its last polled state."""
+
+    def __init__(self, dsn):
+        self.config = parse_dsn(dsn)
+        self.name = f"{self.config.get('host', 'localhost')}:{self.config.get('port', 5432)}"
+        self.lag = None          # seconds; None while unknown or unreachable
+        self.replay_lsn = None   # integer WAL position
+        self._conn = None
+        self._problem = None     # last logged reason it is not used
+
+    def usable(self, max_lag, min_lsn=None):
+        if self.lag is None or self.lag > max_lag:
+            return False
+        return min_lsn is None or (self.replay_lsn is not None and self.replay_lsn >= min_lsn)
+
+    def mark_down(self):
+        """Skip this replica until the next successful check."""
+        self.lag = None
+
+    def check(self):
+        """Poll lag and replay position; a failure (or a server not in recovery) marks it down."""
+        try:
+            if self._conn is None or self._conn.closed:
+                self._conn = psycopg2.connect(**self.config, connect_timeout=REPLICA_CONNECT_TIMEOUT)
+                self._conn.autocommit = True
+            cur = self._conn.cursor()
+            cur.execute(REPLICA_STATUS_SQL)
+            row = cur.fetchone()
+        except psycopg2.Error as e:
+            self._down(f"unavailable: {e}".strip())
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            return
+
+        if row is None:
+            self._down("is not in recovery")
+            return
+        lag, replay_lsn, streaming = row
+        self.replay_lsn = parse_lsn(replay_lsn)
+        if not streaming:
+            self._down("is not streaming from the primary")
+            return
+        self.lag = None if lag is None else float(lag)
+        if self._problem is not None:
+            log.info("replica %s is back", self.name)
+            self._problem = None
+
+    def _down(self, problem):
+        self.lag = None
+        if problem != self._problem:
+            log.warning("replica %s %s; reading from the primary instead", self.name, problem)
+            self._problem = problem
+
+
+class ReplicaRouter:
+    """Picks the replica for a request's reads; None means the primary.
+
+    The checker thread starts with the first choose().
+    """
+
+    def __init__(self, dsns, max_lag=REPLICA_MAX_LAG, check_interval=REPLICA_CHECK_SECONDS):
+        self.replicas = [Replica(dsn) for dsn in dsns]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._turn = itertools.count()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None and self.replicas:
+                self._thread = threading.Thread(target=self._run, name="replica-check", daemon=True)
+                self._thread.start()
+
+    def choose(self, min_lsn=None):
+        """A replica within the lag bound that has replayed min_lsn, round-robin, or None."""
+        if not self.replicas:
+            return None
+        self.ensure_started()
+        usable = [replica for replica in self.replicas if replica.usable(self.max_lag, min_lsn)]
+        replica = usable[next(self._turn) % len(usable)] if usable else None
+        DB_READ_ROUTES_TOTAL.inc(replica.name if replica else "primary")
+        return replica
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            for replica in self.replicas:
+                replica.check()
+            time.sleep(max(0.0, self.check_interval - (time.monotonic() - started)))
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Background Excel export jobs for the E0469 dashboard.
+
+POST /api/exports queues a job and returns at once; a small thread pool
+builds the workbook while the client polls /api/exports/<id> for status and
+progress, then downloads the file from /api/exports/<id>/download:
+
+    {"id": "9f2c...", "status": "running", "progress": 40, "created_at": ...,
+     "finished_at": null, "expires_at": null, "error": null, "download_url": null}
+
+status goes queued -> running -> done (or failed). A request with the same
+key as a job that is queued, running or done gets that job instead of a new
+one; the dashboard keys exports by their filters and the data version, so an
+export is rebuilt once the data changes.
+
+Finished files live in EXPORT_DIR for EXPORT_RETENTION_SECONDS and are then
+deleted with their job. Each job's state is mirrored to <id>.json next to its
+file, so other worker processes on the same host can report on it and serve
+the download; deduplication is per process.
+
+Jobs run in the process that queued them. A queued or running job whose
+process has exited (or whose state has not moved for EXPORT_STALE_SECONDS)
+is marked failed and its partial file deleted, so clients stop polling and
+retention applies to it like any other job. Expired and orphaned jobs are
+purged on startup and then at most every EXPORT_PURGE_INTERVAL seconds, from
+submit() and get().
+
+Usage:
+    exports = ExportQueue(generate)      # generate(params, path, progress)
+    job = exports.submit(key, params)
+    job = exports.get(job_id)            # None when unknown or expired
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+EXPORT_DIR = os.environ.get("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "e0469_exports"))
+
+# Exports built at the same time
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", 2))
+
+# How long a finished export stays downloadable
+EXPORT_RETENTION_SECONDS = int(os.environ.get("EXPORT_RETENTION_SECONDS", 3600))
+
+# A queued or running job whose state is older than this is given up on
+EXPORT_STALE_SECONDS = int(os.environ.get("EXPORT_STALE_SECONDS", 3600))
+
+# Seconds between sweeps of the export directory
+EXPORT_PURGE_INTERVAL = int(os.environ.get("EXPORT_PURGE_INTERVAL", 60))
+
+# Mirror progress to disk only when it moved at least this much
+PROGRESS_STEP = 5
+
+log = logging.getLogger("dashboard.export_jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class ExportJob:
+    """One export: its state, and where its file goes."""
+
+    def __init__(self, job_id, key, params, directory, suffix):
+        self.id = job_id
+        self.key = key
+        self.params = params
+        self.status = QUEUED
+        self.progress = 0
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.finished_at = None
+        self.owner = os.getpid()
+        self.path = os.path.join(directory, job_id + suffix)
+        self.state_path = os.path.join(directory, job_id + ".json")
+
+    @property
+    def expires_at(self):
+        if self.finished_at is None:
+            return None
+        return self.finished_at + EXPORT_RETENTION_SECONDS
+
+    def expired(self, now=None):
+        return self.expires_at is not None and (now or time.time()) >= self.expires_at
+
+    def orphaned(self, now=None):
+        """Whether a queued or running job read from disk has lost its process."""
+        if self.status not in (QUEUED, RUNNING):
+            return False
+        if (now or time.time()) - self.updated_at >= EXPORT_STALE_SECONDS:
+            return True
+        if not self.owner:
+            return False
+        if self.owner == os.getpid():
+            # Not in this process's jobs, so left by an earlier one with the same pid
+            return True
+        try:
+            os.kill(self.owner, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "expires_at": self.expires_at,
+            "error": self.error,
+        }
+
+    def save(self):
+        """Write the job's state for other processes (atomically)."""
+        self.updated_at = time.time()
+        state = dict(self.to_dict(), key=self.key, params=self.params, path=self.path,
+                     owner=self.owner, updated_at=self.updated_at)
+        temporary = self.state_path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(state, f)
+        os.replace(temporary, self.state_path)
+
+    @classmethod
+    def load(cls, state_path):
+        """A job from its state file, or None when it is missing or unreadable."""
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        job = cls.__new__(cls)
+        job.id = state["id"]
+        job.key = state["key"]
+        job.params = state["params"]
+        job.status = state["status"]
+        job.progress = state["progress"]
+        job.error = state["error"]
+        job.created_at = state["created_at"]
+        job.updated_at = state.get("updated_at", job.created_at)
+        job.finished_at = state["finished_at"]
+        job.owner = state.get("owner", 0)
+        job.path = state["path"]
+        job.state_path = state_path
+        return job
+
+
+class ExportQueue:
+    """Runs export jobs on a thread pool, deduplicates them and expires old or orphaned jobs.
+
+    generate(params, path, progress) writes the export for params to path and
+    calls progress(percent) as it goes; an exception fails the job.
+    """
+
+    def __init__(self, generate, directory=EXPORT_DIR, workers=EXPORT_WORKERS, suffix=".xlsx"):
+        self._generate = generate
+        self._directory = directory
+        self._suffix = suffix
+        self._workers = workers
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._purged_at = 0.0
+        self.purge()
+
+    def _start(self):
+        if self._executor is None:
+            os.makedirs(self._directory, exist_ok=True)
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="export")
+
+    def submit(self, key, params):
+        """Queue an export, or return the live job with the same key."""
+        self._purge_due()
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and job.status != FAILED:
+                    return job
+            self._start()
+            job = ExportJob(uuid.uuid4().hex, key, params, self._directory, self._suffix)
+            self._jobs[job.id] = job
+            job.save()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        """The job with this id (from this process or the state directory), unless expired."""
+        self._purge_due()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and len(job_id) == 32 and job_id.isalnum():
+            job = ExportJob.load(os.path.join(self._directory, job_id + ".json"))
+            if job is not None and job.orphaned():
+                self._fail_orphan(job)
+        if job is None or job.expired():
+            return None
+        return job
+
+    def _purge_due(self):
+        if time.time() - self._purged_at >= EXPORT_PURGE_INTERVAL:
+            self.purge()
+
+    def purge(self):
+        """Delete finished jobs past their retention, with their files, and fail orphaned ones."""
+        now = time.time()
+        self._purged_at = now
+        with self._lock:
+            expired = [job for job in self._jobs.values() if job.expired(now)]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            self._remove(job)
+
+        # Jobs from other (or earlier) processes are only known by their files
+        try:
+            names = os.listdir(self._directory)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            own = set(self._jobs)
+        for name in names:
+            if name.endswith(".json"):
+                job = ExportJob.load(os.path.join(self._directory, name))
+                if job is None or job.id in own:
+                    continue
+                if job.expired(now):
+                    self._remove(job)
+                elif job.orphaned(now):
+                    self._fail_orphan(job)
+
+    def _fail_orphan(self, job):
+        log.warning("export %s was left %s by process %s; marking it failed", job.id, job.status, job.owner)
+        job.status = FAILED
+        job.error = "Export was interrupted; please request it again"
+        job.finished_at = time.time()
+        try:
+            os.remove(job.path)
+        except FileNotFoundError:
+            pass
+        job.save()
+
+    def _remove(self, job):
+        for path in (job.path, job.state_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _run(self, job):
+        job.status = RUNNING
+        job.save()
+
+        def progress(percent):
+            percent = max(0, min(int(percent), 99))
+            if percent >= job.progress + PROGRESS_STEP:
+                job.progress = percent
+                job.save()
+
+        try:
+            self._generate(job.params, job.path, progress)
+            job.progress = 100
+            job.status = DONE
+        except Exception as e:
+            log.exception("export %s failed", job.id)
+            job.status = FAILED
+            job.error = str(e)
+            try:
+                os.remove(job.path)
+            except FileNotFoundError:
+                pass
+        job.finished_at = time.time()
+        job.save()
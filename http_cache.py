@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+HTTP caching for the E0469 dashboard API.
+
+Read endpoints are tagged with the data version: the time of the last
+committed write to payers, payer_policies, searched_payers or deleted_rows,
+which schema.sql's data_version row records at commit. Responses carry a
+weak ETag and a Last-Modified header derived from it. A request whose
+If-None-Match (or, at one-second granularity, If-Modified-Since) still
+matches gets a 304 before any listing query runs. Static lists get a public
+max-age instead. JSON bodies over COMPRESS_MIN_BYTES are compressed with
+brotli (if the module is installed) or gzip, according to Accept-Encoding.
+
+The data version is cached per process for DATA_VERSION_TTL seconds
+(default 1) and reset after every write that process handles. Other workers
+may keep answering 304 for up to that long after a write.
+
+Files generated at build time are served as FingerprintedFile: the URL
+carries a hash of the content, so clients may cache them for a year.
+
+Usage:
+    import http_cache
+    http_cache.init_app(app, get_db_connection)
+
+    @app.route('/api/payers')
+    @http_cache.versioned
+    def get_payers(): ...
+
+    @app.route('/api/coverage-statuses')
+    @http_cache.static_list()
+    def get_coverage_statuses(): ...
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import Response, abort, make_response, request
+from werkzeug.http import http_date, parse_date
+
+from instrumentation import span
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+DATA_VERSION_TTL = float(os.environ.get("DATA_VERSION_TTL", 1))
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Versioned responses may be stored but must be revalidated on every use
+REVALIDATE = "no-cache"
+
+# Static lists only change on deploy
+STATIC_MAX_AGE = 3600
+
+# Fingerprinted assets never change under the same URL
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+DATA_VERSION_SQL = "SELECT EXTRACT(EPOCH FROM changed_at) AS version FROM data_version"
+
+
+class DataVersion:
+    """Process-wide cache of the data version with a short TTL.
+
+    Kept per source (the database a request reads from), since replicas
+    may be at different versions than the primary.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def cached(self, source=None):
+        """Return the cached version, or None once it has expired."""
+        with self._lock:
+            value, expires = self._entries.get(source, (None, 0.0))
+            if time.monotonic() < expires:
+                return value
+        return None
+
+    def store(self, value, source=None):
+        """Cache a freshly queried version (seconds since epoch) and return it."""
+        value = float(value or 0)
+        with self._lock:
+            self._entries[source] = (value, time.monotonic() + self.ttl)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+
+data_version = DataVersion(DATA_VERSION_TTL)
+
+
+def etag_for(version):
+    """Weak ETag for a data version; weak because the encoding may vary."""
+    return f'W/"{int(version * 1000000):x}"'
+
+
+def body_etag(body):
+    """Weak ETag for a static body."""
+    return f'W/"{hashlib.md5(body).hexdigest()}"'
+
+
+def _opaque_tag(tag):
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against an ETag."""
+    tags = [_opaque_tag(t) for t in if_none_match.split(",")]
+    return "*" in tags or _opaque_tag(etag) in tags
+
+
+def is_not_modified(version, if_none_match, if_modified_since):
+    """Evaluate conditional GET headers; If-None-Match wins when both are sent.
+
+    Last-Modified is only precise to the second while versions are not, so a
+    write in the same second as the client's copy would look unmodified:
+    If-Modified-Since only matches when the version's whole second is
+    strictly older than the date, and clients echoing Last-Modified back
+    revalidate through the ETag instead.
+    """
+    if if_none_match:
+        return etag_matches(if_none_match, etag_for(version))
+    if if_modified_since:
+        since = parse_date(if_modified_since)
+        return since is not None and int(version) < since.timestamp()
+    return False
+
+
+def validator_headers(version):
+    """ETag, Last-Modified and Cache-Control for a versioned response."""
+    return {
+        "ETag": etag_for(version),
+        "Last-Modified": http_date(int(version)),
+        "Cache-Control": REVALIDATE,
+    }
+
+
+def choose_encoding(accept_encoding):
+    """Pick br or gzip from an Accept-Encoding header, or None."""
+    accepted = set()
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    """Compress a response body with the chosen content coding."""
+    with span("compress"):
+        if encoding == "br":
+            return brotli.compress(body, quality=BROTLI_QUALITY)
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class FingerprintedFile:
+    """A build artifact served under a content hash, with compressed copies kept in memory.
+
+    The file is re-read when its modification time changes, so rebuilding it
+    takes effect without a restart.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self._body = None
+        self._fingerprint = None
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if mtime != self._mtime:
+                if mtime is None:
+                    body = fingerprint = None
+                else:
+                    with open(self.path, "rb") as f:
+                        body = f.read()
+                    fingerprint = hashlib.sha256(body).hexdigest()[:12]
+                self._mtime, self._body, self._fingerprint = mtime, body, fingerprint
+                self._encoded = {}
+            return self._body, self._fingerprint
+
+    def fingerprint(self):
+        """Content hash for the URL, or None if the file has not been built."""
+        return self._load()[1]
+
+    def body(self, encoding=None):
+        """File contents, compressed with encoding (br, gzip or None) once and reused."""
+        body, _ = self._load()
+        if body is None or encoding is None:
+            return body
+        with self._lock:
+            encoded = self._encoded.get(encoding)
+        if encoded is None:
+            encoded = compress(body, encoding)
+            with self._lock:
+                self._encoded[encoding] = encoded
+        return encoded
+
+
+# ---------------------------------------------------------------------------
+# Flask integration
+# ---------------------------------------------------------------------------
+
+_connect = None
+_version_sql = DATA_VERSION_SQL
+_source = None
+
+
+def current_version():
+    """Return the data version, querying it when the cached value has expired."""
+    source = _source() if _source else None
+    version = data_version.cached(source)
+    if version is None:
+        conn = _connect()
+        try:
+            cur = conn.cursor()
+            cur.execute(_version_sql)
+            version = data_version.store(cur.fetchone()['version'], source)
+        finally:
+            conn.close()
+    return version
+
+
+def versioned(view):
+    """Answer conditional GETs from the data version and tag fresh responses with it."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = current_version()
+        headers = validator_headers(version)
+
+        if is_not_modified(version, request.headers.get("If-None-Match"),
+                           request.headers.get("If-Modified-Since")):
+            return Response(status=304, headers=headers)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            response.headers.update(headers)
+        return response
+    return wrapper
+
+
+def static_list(max_age=STATIC_MAX_AGE):
+    """Let clients cache a response that only changes on deploy."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            response.headers["Cache-Control"] = f"public, max-age={max_age}"
+            response.headers["ETag"] = body_etag(response.get_data())
+            if etag_matches(request.headers.get("If-None-Match", ""), response.headers["ETag"]):
+                return Response(status=304, headers={
+                    "ETag": response.headers["ETag"],
+                    "Cache-Control": response.headers["Cache-Control"],
+                })
+            return response
+        return wrapper
+    return decorator
+
+
+def immutable_file(asset, fingerprint, mimetype):
+    """Serve a FingerprintedFile requested by its hash; 404 for a stale or missing hash."""
+    if fingerprint != asset.fingerprint():
+        abort(404)
+
+    encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+    response = Response(asset.body(encoding), mimetype=mimetype)
+    response.headers["Cache-Control"] = IMMUTABLE
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def compress_response(response):
+    """Compress a large JSON response in place if the client accepts it."""
+    if (response.direct_passthrough or response.status_code != 200
+            or "Content-Encoding" in response.headers
+            or response.mimetype != "application/json"):
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+    if encoding:
+        response.set_data(compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app, connect, version_sql=DATA_VERSION_SQL, source=None):
+    """Install compression and write invalidation; connect() opens a dict-cursor connection.
+
+    version_sql returns the data version as a 'version' column (seconds since
+    epoch). source(), if given, names the database connect() reads from for
+    the current request; versions are cached per source.
+    """
+    global _connect, _version_sql, _source
+    _connect = connect
+    _version_sql = version_sql
+    _source = source
+
+    @app.after_request
+    def _compress_and_invalidate(response):
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            data_version.invalidate()
+        return compress_response(response)
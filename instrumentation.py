@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Request timing and SQL instrumentation for the E0469 dashboard.
+
+Records span timings for every request (DB connect, each query with its
+normalized SQL, row fetching, JSON serialization, export generation) and
+exposes them three ways:
+
+- a Server-Timing header on every response (visible in browser dev tools)
+- Prometheus text metrics at /metrics
+- a slow-query log for statements over SLOW_QUERY_MS (default 200 ms)
+
+Metrics live in process memory, so each worker process reports its own.
+Requests served outside Flask (the ASGI app) collect spans with
+begin_spans() and report themselves with observe_request().
+
+Usage:
+    import instrumentation
+    instrumentation.init_app(app)
+    psycopg2.connect(..., cursor_factory=instrumentation.InstrumentedCursor)
+
+    with instrumentation.span("export"):
+        build_workbook()
+"""
+
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from psycopg2.extras import RealDictCursor
+
+# Statements slower than this (milliseconds) are logged
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 200))
+
+# Longest SQL text kept in metric labels and Server-Timing descriptions
+SQL_LABEL_LENGTH = 200
+SERVER_TIMING_DESC_LENGTH = 80
+
+# Histogram buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+slow_query_log = logging.getLogger("dashboard.slow_query")
+
+
+# ---------------------------------------------------------------------------
+# Metrics registry (Prometheus text exposition format 0.0.4)
+# ---------------------------------------------------------------------------
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape_label(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets and optional labels."""
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.labels, label_values, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                labels = _format_labels(self.labels, label_values, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+REQUESTS_TOTAL = Counter(
+    "dashboard_http_requests_total", "HTTP requests handled.", ["method", "endpoint", "status"])
+REQUEST_DURATION = Histogram(
+    "dashboard_http_request_duration_seconds", "HTTP request latency.", ["method", "endpoint"])
+DB_CONNECT_DURATION = Histogram(
+    "dashboard_db_connect_duration_seconds", "Time to open a database connection.")
+QUERY_DURATION = Histogram(
+    "dashboard_db_query_duration_seconds", "Query execution time by normalized SQL.", ["query"])
+SLOW_QUERIES_TOTAL = Counter(
+    "dashboard_db_slow_queries_total", "Queries slower than SLOW_QUERY_MS.", ["query"])
+SPAN_DURATION = Histogram(
+    "dashboard_span_duration_seconds", "Time spent in named request phases.", ["span"])
+DB_READ_ROUTES_TOTAL = Counter(
+    "dashboard_db_read_routes_total", "Requests whose reads went to each database (see db_routing).",
+    ["target"])
+PREPARED_STATEMENTS_TOTAL = Counter(
+    "dashboard_db_prepared_statements_total",
+    "Registered statements run by name (hit) or prepared first (prepare); see query_registry.",
+    ["result"])
+
+METRICS = [REQUESTS_TOTAL, REQUEST_DURATION, DB_CONNECT_DURATION, QUERY_DURATION,
+           SLOW_QUERIES_TOTAL, SPAN_DURATION, DB_READ_ROUTES_TOTAL,
+           PREPARED_STATEMENTS_TOTAL]
+
+
+def render_metrics():
+    """Render every registered metric in Prometheus text format."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# Spans
+# ---------------------------------------------------------------------------
+
+# Span list for the current non-Flask request (one per asyncio task)
+_current_spans = contextvars.ContextVar("dashboard_spans", default=None)
+
+
+def _record_span(name, seconds, desc=None):
+    """Attach a finished span to the current request, if there is one."""
+    if has_request_context():
+        spans = g.setdefault("_spans", [])
+    else:
+        spans = _current_spans.get()
+    if spans is not None:
+        spans.append((name, seconds, desc))
+
+
+def begin_spans():
+    """Start collecting spans for a request handled outside Flask."""
+    spans = []
+    _current_spans.set(spans)
+    return spans
+
+
+def observe_request(method, endpoint, status, seconds):
+    """Count one finished HTTP request and record its latency."""
+    REQUEST_DURATION.observe(seconds, method, endpoint)
+    REQUESTS_TOTAL.inc(method, endpoint, str(status))
+
+
+@contextmanager
+def span(name, desc=None):
+    """Time a block of work and record it as a named span."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        SPAN_DURATION.observe(elapsed, name)
+        _record_span(name, elapsed, desc)
+
+
+@contextmanager
+def connect_span():
+    """Time opening a database connection."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        DB_CONNECT_DURATION.observe(elapsed)
+        _record_span("db_connect", elapsed)
+
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(query):
+    """Collapse whitespace and strip literals so equal query shapes share a label."""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    else:
+        query = str(query)
+    query = _STRING_LITERAL.sub("?", query)
+    query = _NUMBER_LITERAL.sub("?", query)
+    query = _WHITESPACE.sub(" ", query).strip()
+    return query[:SQL_LABEL_LENGTH]
+
+
+def record_query(query, seconds):
+    """Record one executed statement in metrics, the request spans and the slow log."""
+    normalized = normalize_sql(query)
+    QUERY_DURATION.observe(seconds, normalized)
+    _record_span("sql", seconds, normalized)
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES_TOTAL.inc(normalized)
+        endpoint = request.path if has_request_context() else "-"
+        slow_query_log.warning("slow query %.1f ms on %s: %s", seconds * 1000, endpoint, normalized)
+
+
+@contextmanager
+def query_timer(query):
+    """Time one statement executed inside the block."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_query(query, time.perf_counter() - started)
+
+
+class InstrumentedCursor(RealDictCursor):
+    """RealDictCursor that times every execute and fetch."""
+
+    def execute(self, query, vars=None):
+        with query_timer(query):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with query_timer(query):
+            return super().executemany(query, vars_list)
+
+    def fetchone(self):
+        with span("fetch"):
+            return super().fetchone()
+
+    def fetchmany(self, size=None):
+        with span("fetch"):
+            return super().fetchmany(size)
+
+    def fetchall(self):
+        with span("fetch"):
+            return super().fetchall()
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that records jsonify() time as a 'serialize' span."""
+
+    def response(self, *args, **kwargs):
+        with span("serialize"):
+            return super().response(*args, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Flask integration
+# ---------------------------------------------------------------------------
+
+def _quote_desc(desc):
+    desc = desc[:SERVER_TIMING_DESC_LENGTH].replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{desc}"'
+
+
+def server_timing_header(spans, total_seconds):
+    """Build a Server-Timing header; queries are numbered sql_1, sql_2, ..."""
+    entries = []
+    query_count = 0
+    # Fetches and serialization happen in many small steps; report each as one total
+    totals = {}
+
+    for name, seconds, desc in spans:
+        if name in ("fetch", "serialize"):
+            totals[name] = totals.get(name, 0.0) + seconds
+            continue
+        if name == "sql":
+            query_count += 1
+            name = f"sql_{query_count}"
+        entry = f"{name};dur={seconds * 1000:.2f}"
+        if desc:
+            entry += f";desc={_quote_desc(desc)}"
+        entries.append(entry)
+
+    for name, seconds in totals.items():
+        entries.append(f"{name};dur={seconds * 1000:.2f}")
+
+    entries.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def init_app(app):
+    """Install request timing hooks, the JSON timing provider and /metrics."""
+    if not isinstance(app.json, TimedJSONProvider):
+        app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_request_timer():
+        g._request_started = time.perf_counter()
+        g._spans = []
+
+    @app.after_request
+    def _finish_request_timer(response):
+        started = g.pop("_request_started", None)
+        if started is None:
+            return response
+
+        elapsed = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule else "<unmatched>"
+        observe_request(request.method, endpoint, response.status_code, elapsed)
+
+        response.headers["Server-Timing"] = server_timing_header(g.get("_spans", []), elapsed)
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        """Prometheus scrape endpoint."""
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -1,12 +1,25 @@
 #!/usr/bin/env python3
 """
 Load E0469 payer data from Python file into PostgreSQL database.
+
+Usage:
+    python3 load_data.py
+
+    # Also write a read-only SQLite snapshot for DB_BACKEND=sqlite
+    python3 load_data.py --sqlite e0469_analysis.sqlite3
+
+    # Snapshot the database as it is, without loading
+    python3 load_data.py --sqlite e0469_analysis.sqlite3 --snapshot-only
 """
 
+import argparse
+import re
 import psycopg2
 from psycopg2.extras import RealDictCursor
 import os
 
+import sqlite_backend
+
 # Database configuration
 DB_CONFIG = {
     "dbname": os.environ.get("DB_NAME", "e0469_analysis"),
@@ -28,6 +41,17 @@ def normalize_coverage_status(status):
     return "Prior-Auth Required"
 
 
+def load_coverage_status_ids(cur):
+    """Map coverage_categories names to their SMALLINT ids."""
+    cur.execute("SELECT name, id FROM coverage_categories")
+    return dict(cur.fetchall())
+
+
+def coverage_status_id(status_ids, status):
+    """Id of a detailed coverage status; unknown statuses fall back to their simplified category."""
+    return status_ids.get(status) or status_ids[normalize_coverage_status(status)]
+
+
 def normalize_investigational(value):
     """Convert investigational to Yes/No boolean."""
     if not value:
@@ -36,6 +60,42 @@ def normalize_investigational(value):
         return "Yes"
     return "No"
 
+
+# State names as payer names spell them, for payers.state (the coverage map)
+STATE_CODES = {
+    "Alabama": "AL", "Alaska": "AK", "Arizona": "AZ", "Arkansas": "AR", "California": "CA",
+    "Medi-Cal": "CA", "Colorado": "CO", "Connecticut": "CT", "Delaware": "DE",
+    "District of Columbia": "DC", "Florida": "FL", "Georgia": "GA", "Hawaii": "HI",
+    "Idaho": "ID", "Illinois": "IL", "Indiana": "IN", "Iowa": "IA", "Kansas": "KS",
+    "Kentucky": "KY", "Louisiana": "LA", "Maine": "ME", "Maryland": "MD",
+    "Massachusetts": "MA", "Michigan": "MI", "Minnesota": "MN", "Mississippi": "MS",
+    "Missouri": "MO", "Montana": "MT", "Nebraska": "NE", "Nevada": "NV",
+    "New Hampshire": "NH", "New Jersey": "NJ", "New Mexico": "NM", "New York": "NY",
+    "North Carolina": "NC", "North Dakota": "ND", "Ohio": "OH", "Oklahoma": "OK",
+    "Oregon": "OR", "Pennsylvania": "PA", "Rhode Island": "RI", "South Carolina": "SC",
+    "South Dakota": "SD", "Tennessee": "TN", "Texas": "TX", "Utah": "UT", "Vermont": "VT",
+    "Virginia": "VA", "Washington": "WA", "West Virginia": "WV", "Wisconsin": "WI",
+    "Wyoming": "WY",
+}
+
+# A state's name, or its code in capitals (e.g. "Kaiser Permanente WA"), as a
+# whole word; longer names first so "West Virginia" wins over "Virginia"
+STATE_PATTERN = re.compile(r"\b(%s)\b" % "|".join(
+    [re.escape(name) for name in sorted(STATE_CODES, key=len, reverse=True)]
+    + sorted(set(STATE_CODES.values()))))
+
+
+def payer_state(name):
+    """Two-letter code of the first state a payer's name mentions, or None (national payers).
+
+    A payer named for several states (e.g. "Oregon/Alaska") is placed in the first.
+    """
+    match = STATE_PATTERN.search(name)
+    if match is None:
+        return None
+    return STATE_CODES.get(match.group(1), match.group(1))
+
+
 # Payer data from E0469_Explicit_Payer_Policies.py
 payer_data = [
     # CMS/Medicare - E0469 added to fee schedule 10/1/2024
@@ -912,26 +972,59 @@ def load_payers(conn):
 
     print(f"Loading {len(payer_data)} payers with explicit E0469 policies...")
 
+    status_ids = load_coverage_status_ids(cur)
+
     for payer in payer_data:
-        # Insert payer
+        # Insert payer; an unchanged one is left alone (no updated_at bump,
+        # NOTIFY or change-feed row), so its id comes from the SELECT
         cur.execute("""
-            INSERT INTO payers (name, payer_type)
-            VALUES (%s, %s)
-            ON CONFLICT (name) DO UPDATE SET payer_type = EXCLUDED.payer_type
-            RETURNING id
-        """, (payer["name"], payer["type"]))
+            WITH upserted AS (
+                INSERT INTO payers (name, payer_type, state)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (name) DO UPDATE SET
+                    payer_type = EXCLUDED.payer_type,
+                    state = EXCLUDED.state
+                WHERE (payers.payer_type, payers.state)
+                    IS DISTINCT FROM (EXCLUDED.payer_type, EXCLUDED.state)
+                RETURNING id
+            )
+            SELECT id FROM upserted
+            UNION ALL
+            SELECT id FROM payers WHERE name = %s
+            LIMIT 1
+        """, (payer["name"], payer["type"], payer_state(payer["name"]), payer["name"]))
         payer_id = cur.fetchone()[0]
 
-        # Insert policy with normalized values
+        # Insert or update the current policy with the detailed status (the
+        # simplified category is generated from it); the archive_policy_version
+        # trigger keeps the previous version when anything changed, and an
+        # unchanged policy is not written, so an unchanged reload writes nothing
         cur.execute("""
             INSERT INTO payer_policies (
-                payer_id, coverage_status, prior_auth_required, investigational,
+                payer_id, coverage_status_id, prior_auth_required, investigational,
                 not_med_necessary, policy_date, policy_number, notes, source_url
             ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT DO NOTHING
+            ON CONFLICT (payer_id) WHERE is_current DO UPDATE SET
+                coverage_status_id = EXCLUDED.coverage_status_id,
+                prior_auth_required = EXCLUDED.prior_auth_required,
+                investigational = EXCLUDED.investigational,
+                not_med_necessary = EXCLUDED.not_med_necessary,
+                policy_date = EXCLUDED.policy_date,
+                policy_number = EXCLUDED.policy_number,
+                notes = EXCLUDED.notes,
+                source_url = EXCLUDED.source_url
+            WHERE (payer_policies.coverage_status_id, payer_policies.prior_auth_required,
+                   payer_policies.investigational, payer_policies.not_med_necessary,
+                   payer_policies.policy_date, payer_policies.policy_number,
+                   payer_policies.notes, payer_policies.source_url)
+                IS DISTINCT FROM
+                  (EXCLUDED.coverage_status_id, EXCLUDED.prior_auth_required,
+                   EXCLUDED.investigational, EXCLUDED.not_med_necessary,
+                   EXCLUDED.policy_date, EXCLUDED.policy_number,
+                   EXCLUDED.notes, EXCLUDED.source_url)
         """, (
             payer_id,
-            normalize_coverage_status(payer["coverage"]),
+            coverage_status_id(status_ids, payer["coverage"]),
             payer["prior_auth"],
             normalize_investigational(payer["investigational"]),
             payer["not_med_necessary"],
@@ -941,6 +1034,8 @@ def load_payers(conn):
             payer["source"]
         ))
 
+    # Fold the trend rows the policy triggers appended into one per month
+    cur.execute("SELECT compact_coverage_trend()")
     conn.commit()
     print(f"Loaded {len(payer_data)} payers with policies.")
 
@@ -958,6 +1053,8 @@ def load_searched_payers(conn):
             ON CONFLICT (name) DO UPDATE SET
                 payer_type = EXCLUDED.payer_type,
                 notes = EXCLUDED.notes
+            WHERE (searched_payers.payer_type, searched_payers.notes)
+                IS DISTINCT FROM (EXCLUDED.payer_type, EXCLUDED.notes)
         """, (payer["name"], payer["type"], payer["notes"]))
 
     conn.commit()
@@ -971,16 +1068,18 @@ def print_stats(conn):
     cur.execute("SELECT COUNT(*) FROM payers")
     payer_count = cur.fetchone()[0]
 
-    cur.execute("SELECT COUNT(*) FROM payer_policies")
-    policy_count = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*), COUNT(*) FILTER (WHERE NOT is_current) FROM payer_policies")
+    policy_count, archived_count = cur.fetchone()
 
     cur.execute("SELECT COUNT(*) FROM searched_payers")
     searched_count = cur.fetchone()[0]
 
     cur.execute("""
-        SELECT coverage_status, COUNT(*)
-        FROM payer_policies
-        GROUP BY coverage_status
+        SELECT cc.name, COUNT(*)
+        FROM payer_policies pp
+        LEFT JOIN coverage_categories cc ON cc.id = pp.coverage_category_id
+        WHERE pp.is_current
+        GROUP BY cc.name
         ORDER BY COUNT(*) DESC
     """)
     coverage_stats = cur.fetchall()
@@ -989,7 +1088,7 @@ def print_stats(conn):
     print("Database Statistics")
     print("="*50)
     print(f"Payers with explicit E0469 policies: {payer_count}")
-    print(f"Total policy records: {policy_count}")
+    print(f"Total policy records: {policy_count} ({archived_count} earlier versions)")
     print(f"Searched payers (no E0469 found): {searched_count}")
     print("\nCoverage Status Breakdown:")
     for status, count in coverage_stats:
@@ -997,6 +1096,15 @@ def print_stats(conn):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Load E0469 payer data into PostgreSQL.")
+    parser.add_argument("--sqlite", metavar="PATH",
+                        help="write a read-only SQLite snapshot of the loaded data to PATH")
+    parser.add_argument("--snapshot-only", action="store_true",
+                        help="skip loading; only write the --sqlite snapshot")
+    args = parser.parse_args()
+    if args.snapshot_only and not args.sqlite:
+        parser.error("--snapshot-only requires --sqlite")
+
     print("Connecting to database...")
     try:
         conn = psycopg2.connect(**DB_CONFIG)
@@ -1008,9 +1116,14 @@ def main():
         return
 
     try:
-        load_payers(conn)
-        load_searched_payers(conn)
-        print_stats(conn)
+        if not args.snapshot_only:
+            load_payers(conn)
+            load_searched_payers(conn)
+            print_stats(conn)
+            conn.commit()
+        if args.sqlite:
+            print(f"Writing SQLite snapshot to {args.sqlite}...")
+            sqlite_backend.write_snapshot(conn, args.sqlite)
     except Exception as e:
         print(f"Error loading data: {e}")
         conn.rollback()
@@ -1018,7 +1131,10 @@ def main():
     finally:
         conn.close()
 
-    print("\nData loaded successfully!")
+    if not args.snapshot_only:
+        print("\nData loaded successfully!")
+    if args.sqlite:
+        print(f"Snapshot written to {args.sqlite}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+In-memory prefix index over payer names for typeahead suggestions.
+
+Names are kept in two sorted lists: the full lowercased name, and the tail of
+the name starting at each later word ("shield" finds "Blue Cross Blue
+Shield"). A lookup is a bisect plus a short scan, so it costs microseconds
+regardless of table size. Full-name matches rank ahead of word matches.
+
+The index is tagged with the data version it was built from; callers rebuild
+it when http_cache reports a newer version.
+
+Usage:
+    index = NameIndex()
+    if not index.is_current(version):
+        index.rebuild(rows, version)    # rows of (id, name)
+    index.suggest("blue", 10)
+"""
+
+import re
+import threading
+from bisect import bisect_left
+
+# A word starts after whitespace or common name punctuation
+WORD_START = re.compile(r"(?<=[\s\-/(&,.])\w")
+
+PAYER_NAMES_SQL = "SELECT id, name FROM payers"
+
+
+class NameIndex:
+    """Sorted prefix index of payer names."""
+
+    def __init__(self):
+        self.version = None
+        self._names = []
+        self._words = []
+        self._lock = threading.Lock()
+
+    def is_current(self, version):
+        # A newer index also serves: reads from lagging replicas see older versions
+        return self.version is not None and self.version >= version
+
+    def rebuild(self, rows, version):
+        """Replace the index with rows of (id, name) read at the given data version."""
+        names = []
+        words = []
+        for payer_id, name in rows:
+            lowered = name.lower()
+            names.append((lowered, name, payer_id))
+            for match in WORD_START.finditer(lowered):
+                words.append((lowered[match.start():], name, payer_id))
+        names.sort()
+        words.sort()
+
+        with self._lock:
+            self._names = names
+            self._words = words
+            self.version = version
+
+    def suggest(self, prefix, limit=10):
+        """Return up to limit {'id', 'name'} matches for a case-insensitive prefix."""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+
+        with self._lock:
+            names, words = self._names, self._words
+
+        results = []
+        seen = set()
+        for entries in (names, words):
+            i = bisect_left(entries, (prefix,))
+            while i < len(entries) and len(results) < limit and entries[i][0].startswith(prefix):
+                _, name, payer_id = entries[i]
+                if payer_id not in seen:
+                    seen.add(payer_id)
+                    results.append({'id': payer_id, 'name': name})
+                i += 1
+        return results
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Prepared-statement registry for the dashboard's hot queries.
+
+/api/payers builds its SQL from a finite set of shapes (which filters are
+set x the whitelisted sort fields x the chosen fields), but sent as plain
+text every statement is parsed and planned again. Here each shape is
+prepared once per connection, under a name derived from its text, and run
+by name afterwards; parameters vary, the shape does not.
+
+Each connection keeps at most MAX_PREPARED statements, least recently used
+first out (DEALLOCATEd on the server). That needs connections that outlive a
+request, with a prepared dict to track them: psycopg2 connections from
+db_pool, or asyncpg pool connections, where asyncpg's own statement cache
+does the preparing. A connection without one (SQLite, a plain psycopg2
+connection) runs the statement as ordinary text.
+
+Hit rates are exported as dashboard_db_prepared_statements_total{result}:
+"hit" ran an already prepared statement, "prepare" had to prepare it first.
+
+Usage:
+    cur = conn.cursor()
+    query_registry.execute(cur, query['count_sql'], query['params'])
+    total = cur.fetchone()['count']
+
+    # asyncpg
+    total = await query_registry.run(conn, "fetchval", query['count_sql'], query['params'])
+"""
+
+import hashlib
+import itertools
+import os
+import re
+from functools import lru_cache
+
+from instrumentation import PREPARED_STATEMENTS_TOTAL, InstrumentedCursor, query_timer
+
+# Statements kept prepared on one connection
+MAX_PREPARED = int(os.environ.get("DB_MAX_PREPARED", 64))
+
+_PLACEHOLDER = re.compile(r"%(s|%)")
+
+
+@lru_cache(maxsize=256)
+def numbered(sql):
+    """Rewrite psycopg2 %s placeholders as server-side $1, $2, ... (and %% as %)."""
+    numbers = itertools.count(1)
+    return _PLACEHOLDER.sub(lambda m: f"${next(numbers)}" if m.group(1) == "s" else "%", sql)
+
+
+@lru_cache(maxsize=256)
+def statement_name(sql):
+    """A stable name for a statement's text."""
+    return "q_" + hashlib.sha1(sql.encode()).hexdigest()[:16]
+
+
+def execute(cur, sql, params=()):
+    """Execute sql on a psycopg2 cursor through its connection's prepared statements."""
+    prepared = getattr(getattr(cur, "connection", None), "prepared", None)
+    if prepared is None:
+        cur.execute(sql, params)
+        return
+
+    name = statement_name(sql)
+    placeholders = ", ".join(["%s"] * len(params))
+    # Time it here under the query's own text rather than as PREPARE/EXECUTE
+    if isinstance(cur, InstrumentedCursor):
+        execute_text = super(InstrumentedCursor, cur).execute
+    else:
+        execute_text = cur.execute
+    with query_timer(sql):
+        if name in prepared:
+            prepared.move_to_end(name)
+            PREPARED_STATEMENTS_TOTAL.inc("hit")
+        else:
+            if len(prepared) >= MAX_PREPARED:
+                evicted, _ = prepared.popitem(last=False)
+                execute_text(f"DEALLOCATE {evicted}")
+            execute_text(f"PREPARE {name} AS {numbered(sql)}")
+            prepared[name] = sql
+            PREPARED_STATEMENTS_TOTAL.inc("prepare")
+        execute_text(f"EXECUTE {name} ({placeholders})" if params else f"EXECUTE {name}", params)
+
+
+async def run(conn, method, sql, params=()):
+    """Run sql on an asyncpg connection, counting it against the connection's prepared dict.
+
+    method is the Connection method to call (fetch, fetchrow or fetchval).
+    asyncpg itself prepares each statement once per connection and runs it
+    by name from its statement cache (a PreparedStatement object cannot be
+    kept across pool acquisitions), so here the registry only mirrors that
+    cache to report hits; the count is approximate once more distinct
+    statements than the cache holds have run on the connection.
+    """
+    prepared = getattr(conn, "prepared", None)
+    with query_timer(sql):
+        if prepared is not None:
+            if sql in prepared:
+                prepared.move_to_end(sql)
+                PREPARED_STATEMENTS_TOTAL.inc("hit")
+            else:
+                if len(prepared) >= MAX_PREPARED:
+                    prepared.popitem(last=False)
+                prepared[sql] = True
+                PREPARED_STATEMENTS_TOTAL.inc("prepare")
+        return await getattr(conn, method)(numbered(sql), *params)
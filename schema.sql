@@ -2,48 +2,64 @@
 -- PostgreSQL 16
 
 -- Drop tables if they exist (for clean setup)
+DROP TABLE IF EXISTS data_version CASCADE;
+DROP TABLE IF EXISTS deleted_rows CASCADE;
+DROP TABLE IF EXISTS coverage_trend_deltas CASCADE;
 DROP TABLE IF EXISTS payer_policies CASCADE;
 DROP TABLE IF EXISTS searched_payers CASCADE;
 DROP TABLE IF EXISTS coverage_categories CASCADE;
 DROP TABLE IF EXISTS payers CASCADE;
 
--- Coverage categories reference table
+-- Coverage categories reference table. Ids are fixed: the simplified
+-- categories are 100 Covered, 200 Prior-Auth Required and 300 Not Covered,
+-- and every detailed status sits in its simplified category's hundred
+-- (category_id). Higher categories are more restrictive.
 CREATE TABLE coverage_categories (
-    id SERIAL PRIMARY KEY,
+    id SMALLINT PRIMARY KEY,
     name VARCHAR(100) UNIQUE NOT NULL,
+    category_id SMALLINT NOT NULL REFERENCES coverage_categories(id),
     color_code VARCHAR(20),
     description TEXT,
     sort_order INTEGER
 );
 
 -- Insert coverage categories with color codes
-INSERT INTO coverage_categories (name, color_code, description, sort_order) VALUES
-    ('NOT COVERED', '#FFC7CE', 'Categorical exclusion from benefits', 1),
-    ('NOT COVERED - Experimental/Investigational', '#FFC7CE', 'Explicit exclusion as experimental', 2),
-    ('NOT COVERED - EIU Non-Reimbursable', '#FFC7CE', 'EIU list - non-reimbursable', 3),
-    ('Investigational', '#FFEB9C', 'Insufficient evidence for coverage', 4),
-    ('Investigational - Experimental', '#FFEB9C', 'Considered experimental/investigational', 5),
-    ('Partial - OLE Unproven', '#FFEB9C', 'OLE devices unproven, HFCWO may be covered', 6),
-    ('Partial - Limited Conditions', '#FFEB9C', 'Coverage limited to specific conditions', 7),
-    ('Partial - Some Investigational', '#FFEB9C', 'Some uses considered investigational', 8),
-    ('Case-by-Case (No LCD)', '#BDD7EE', 'No LCD - claims reviewed individually', 9),
-    ('Case Review - Prior Auth Needed', '#BDD7EE', 'Requires prior auth review', 10),
-    ('Prior Auth Required', '#BDD7EE', 'Prior authorization required', 11),
-    ('Prior Auth Required (MA)', '#BDD7EE', 'Medicare Advantage prior auth required', 12),
-    ('Covered with Criteria', '#C6EFCE', 'Covered when criteria met', 13),
-    ('Covered with Prior Auth', '#C6EFCE', 'Covered with prior authorization', 14),
-    ('Covered with Limits', '#C6EFCE', 'Covered with frequency/quantity limits', 15),
-    ('Covered - Fee Schedule', '#C6EFCE', 'Listed in fee schedule', 16),
-    ('Covered - Per Fee Schedule', '#C6EFCE', 'Coverage per fee schedule', 17),
-    ('Covered - Rental Only', '#C6EFCE', 'Rental only, no purchase', 18),
-    ('Varies - EIU or Clinical Review', '#BDD7EE', 'Plan-dependent coverage', 19),
-    ('Reference Only', '#E2E8F0', 'Manufacturer/reference document', 20);
+INSERT INTO coverage_categories (id, name, category_id, color_code, description, sort_order) VALUES
+    (301, 'NOT COVERED', 300, '#FFC7CE', 'Categorical exclusion from benefits', 1),
+    (302, 'NOT COVERED - Experimental/Investigational', 300, '#FFC7CE', 'Explicit exclusion as experimental', 2),
+    (303, 'NOT COVERED - EIU Non-Reimbursable', 300, '#FFC7CE', 'EIU list - non-reimbursable', 3),
+    (201, 'Investigational', 200, '#FFEB9C', 'Insufficient evidence for coverage', 4),
+    (202, 'Investigational - Experimental', 200, '#FFEB9C', 'Considered experimental/investigational', 5),
+    (203, 'Partial - OLE Unproven', 200, '#FFEB9C', 'OLE devices unproven, HFCWO may be covered', 6),
+    (204, 'Partial - Limited Conditions', 200, '#FFEB9C', 'Coverage limited to specific conditions', 7),
+    (205, 'Partial - Some Investigational', 200, '#FFEB9C', 'Some uses considered investigational', 8),
+    (206, 'Case-by-Case (No LCD)', 200, '#BDD7EE', 'No LCD - claims reviewed individually', 9),
+    (207, 'Case Review - Prior Auth Needed', 200, '#BDD7EE', 'Requires prior auth review', 10),
+    (208, 'Prior Auth Required', 200, '#BDD7EE', 'Prior authorization required', 11),
+    (209, 'Prior Auth Required (MA)', 200, '#BDD7EE', 'Medicare Advantage prior auth required', 12),
+    (212, 'Prior Auth Required - Clinical Review', 200, '#BDD7EE', 'Prior auth with clinical review', 13),
+    (101, 'Covered with Criteria', 100, '#C6EFCE', 'Covered when criteria met', 14),
+    (102, 'Covered with Prior Auth', 100, '#C6EFCE', 'Covered with prior authorization', 15),
+    (103, 'Covered with Limits', 100, '#C6EFCE', 'Covered with frequency/quantity limits', 16),
+    (104, 'Covered - Fee Schedule', 100, '#C6EFCE', 'Listed in fee schedule', 17),
+    (105, 'Covered - Per Fee Schedule', 100, '#C6EFCE', 'Coverage per fee schedule', 18),
+    (106, 'Covered - Rental Only', 100, '#C6EFCE', 'Rental only, no purchase', 19),
+    (210, 'Varies - EIU or Clinical Review', 200, '#BDD7EE', 'Plan-dependent coverage', 20),
+    (211, 'Reference Only', 200, '#E2E8F0', 'Manufacturer/reference document', 21),
+    -- Simplified categories (dashboard colors and filters; also stored when
+    -- only the category is known)
+    (100, 'Covered', 100, '#C6EFCE', 'Simplified: explicit coverage', 22),
+    (200, 'Prior-Auth Required', 200, '#BDD7EE', 'Simplified: investigational, partial, case-by-case or prior auth', 23),
+    (300, 'Not Covered', 300, '#FFC7CE', 'Simplified: not covered or non-reimbursable', 24);
 
 -- Payers master table
 CREATE TABLE payers (
     id SERIAL PRIMARY KEY,
     name VARCHAR(255) NOT NULL UNIQUE,
     payer_type VARCHAR(100),
+    -- Two-letter code of the state a regional payer serves (load_data.payer_state);
+    -- NULL for national payers, which the coverage map leaves out
+    state VARCHAR(2),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -51,12 +67,22 @@ CREATE TABLE payers (
 -- Create index on payer name for faster searches
 CREATE INDEX idx_payers_name ON payers(name);
 CREATE INDEX idx_payers_type ON payers(payer_type);
+-- State + name serves both the map counts and the per-state payer lists
+CREATE INDEX idx_payers_state ON payers(state, name);
+-- (updated_at, id) is the /api/changes cursor order
+CREATE INDEX idx_payers_updated_at ON payers(updated_at, id);
 
--- Payer policies table (coverage details)
+-- Payer policies table (coverage details). Each payer has one current
+-- version; changing a current row's content archives the previous version
+-- (archive_policy_version) with valid_from/valid_to bounds.
 CREATE TABLE payer_policies (
     id SERIAL PRIMARY KEY,
     payer_id INTEGER NOT NULL REFERENCES payers(id) ON DELETE CASCADE,
-    coverage_status VARCHAR(100),
+    -- Detailed status as published by the payer
+    coverage_status_id SMALLINT REFERENCES coverage_categories(id),
+    -- Its simplified category: the hundred the status id sits in
+    coverage_category_id SMALLINT GENERATED ALWAYS AS (coverage_status_id / 100 * 100) STORED
+        REFERENCES coverage_categories(id),
     prior_auth_required VARCHAR(100),
     investigational VARCHAR(100),
     not_med_necessary VARCHAR(100),
@@ -65,12 +91,20 @@ CREATE TABLE payer_policies (
     notes TEXT,
     source_url TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    valid_from TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    valid_to TIMESTAMP,
+    is_current BOOLEAN NOT NULL DEFAULT TRUE
 );
 
 -- Create indexes for common queries
-CREATE INDEX idx_payer_policies_payer_id ON payer_policies(payer_id);
-CREATE INDEX idx_payer_policies_coverage ON payer_policies(coverage_status);
+-- One current version per payer; also the lookup every dashboard join uses
+CREATE UNIQUE INDEX idx_payer_policies_current ON payer_policies(payer_id) WHERE is_current;
+-- Version history per payer (and the ON DELETE CASCADE lookup)
+CREATE INDEX idx_payer_policies_payer_id ON payer_policies(payer_id, valid_from);
+CREATE INDEX idx_payer_policies_coverage ON payer_policies(coverage_category_id);
+CREATE INDEX idx_payer_policies_coverage_status ON payer_policies(coverage_status_id);
+CREATE INDEX idx_payer_policies_updated_at ON payer_policies(updated_at, id);
 
 -- Searched payers (no explicit E0469 policy found)
 CREATE TABLE searched_payers (
@@ -80,10 +114,40 @@ CREATE TABLE searched_payers (
     notes TEXT,
     date_searched DATE DEFAULT CURRENT_DATE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT searched_payer_unique UNIQUE(name)
 );
 
 CREATE INDEX idx_searched_payers_type ON searched_payers(payer_type);
+CREATE INDEX idx_searched_payers_updated_at ON searched_payers(updated_at, id);
+
+-- Tombstones for /api/changes: one row per deleted payer, policy or searched payer
+CREATE TABLE deleted_rows (
+    id BIGSERIAL PRIMARY KEY,
+    table_name VARCHAR(50) NOT NULL,
+    row_id INTEGER NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_deleted_rows_deleted_at ON deleted_rows(deleted_at, id);
+
+-- Monthly coverage trend rollup for /api/coverage-trend. Each policy version
+-- adds +1 in the month of valid_from and -1 in the month of valid_to, so the
+-- running sum of delta up to a month is the number of payers in each
+-- simplified coverage category at that month's end. Kept current by triggers below;
+-- rebuild_coverage_trend() recomputes it after bulk loads.
+-- Append-only: writers insert delta rows and never update shared counters (two
+-- transactions moving payers between the same categories in opposite
+-- directions would deadlock on them), readers sum per (month, payer_type,
+-- category), and compact_coverage_trend() folds the rows back together.
+CREATE TABLE coverage_trend_deltas (
+    month DATE NOT NULL,
+    payer_type VARCHAR(100) NOT NULL,
+    coverage_category_id SMALLINT REFERENCES coverage_categories(id),
+    delta INTEGER NOT NULL
+);
+
+CREATE INDEX idx_coverage_trend_deltas ON coverage_trend_deltas(month, payer_type, coverage_category_id);
 
 -- Function to update timestamp on row update
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -105,13 +169,275 @@ CREATE TRIGGER update_payer_policies_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Archive the previous version when a current policy's content changes;
+-- the current row keeps its id and starts a new validity period. The
+-- archived row is stamped updated_at = now so /api/changes picks it up.
+CREATE OR REPLACE FUNCTION archive_policy_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF OLD.is_current AND NEW.is_current AND
+       (NEW.coverage_status_id, NEW.prior_auth_required, NEW.investigational, NEW.not_med_necessary,
+        NEW.policy_date, NEW.policy_number, NEW.notes, NEW.source_url)
+       IS DISTINCT FROM
+       (OLD.coverage_status_id, OLD.prior_auth_required, OLD.investigational, OLD.not_med_necessary,
+        OLD.policy_date, OLD.policy_number, OLD.notes, OLD.source_url) THEN
+        INSERT INTO payer_policies (
+            payer_id, coverage_status_id, prior_auth_required, investigational, not_med_necessary,
+            policy_date, policy_number, notes, source_url, created_at, updated_at,
+            valid_from, valid_to, is_current
+        ) VALUES (
+            OLD.payer_id, OLD.coverage_status_id, OLD.prior_auth_required, OLD.investigational,
+            OLD.not_med_necessary, OLD.policy_date, OLD.policy_number, OLD.notes, OLD.source_url,
+            OLD.created_at, CURRENT_TIMESTAMP, OLD.valid_from, CURRENT_TIMESTAMP, FALSE
+        );
+        NEW.valid_from = CURRENT_TIMESTAMP;
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER archive_payer_policy_version
+    BEFORE UPDATE ON payer_policies
+    FOR EACH ROW
+    EXECUTE FUNCTION archive_policy_version();
+
+CREATE TRIGGER update_searched_payers_updated_at
+    BEFORE UPDATE ON searched_payers
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- Record a tombstone for every deleted row (cascaded policy deletes included)
+CREATE OR REPLACE FUNCTION record_deleted_row()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO deleted_rows (table_name, row_id) VALUES (TG_TABLE_NAME, OLD.id);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER record_payers_deleted
+    AFTER DELETE ON payers
+    FOR EACH ROW
+    EXECUTE FUNCTION record_deleted_row();
+
+CREATE TRIGGER record_payer_policies_deleted
+    AFTER DELETE ON payer_policies
+    FOR EACH ROW
+    EXECUTE FUNCTION record_deleted_row();
+
+CREATE TRIGGER record_searched_payers_deleted
+    AFTER DELETE ON searched_payers
+    FOR EACH ROW
+    EXECUTE FUNCTION record_deleted_row();
+
+-- Data version for HTTP caching (http_cache.py). updated_at is the writing
+-- transaction's start time, so MAX(updated_at) can stand still when a long
+-- transaction commits after a shorter one. Instead every committing write
+-- stamps this single row from a deferred trigger: the stamp is taken at
+-- commit, and the row lock, taken after all of the transaction's other
+-- locks, puts the stamps in commit order. Each stamp is later than the last.
+CREATE TABLE data_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO data_version DEFAULT VALUES;
+
+CREATE OR REPLACE FUNCTION bump_data_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Once per transaction, however many rows it wrote
+    IF current_setting('dashboard.data_version_bumped', TRUE) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    PERFORM set_config('dashboard.data_version_bumped', 'on', TRUE);
+    UPDATE data_version
+    SET changed_at = GREATEST(clock_timestamp()::timestamp, changed_at + interval '1 microsecond');
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE CONSTRAINT TRIGGER bump_payers_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON payers
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW
+    EXECUTE FUNCTION bump_data_version();
+
+CREATE CONSTRAINT TRIGGER bump_payer_policies_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON payer_policies
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW
+    EXECUTE FUNCTION bump_data_version();
+
+CREATE CONSTRAINT TRIGGER bump_searched_payers_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON searched_payers
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW
+    EXECUTE FUNCTION bump_data_version();
+
+CREATE CONSTRAINT TRIGGER bump_deleted_rows_data_version
+    AFTER INSERT ON deleted_rows
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW
+    EXECUTE FUNCTION bump_data_version();
+
+-- Coverage trend maintenance: apply one policy version's deltas with the given sign
+CREATE OR REPLACE FUNCTION adjust_coverage_trend(
+    trend_payer_type VARCHAR, trend_category_id SMALLINT,
+    trend_from TIMESTAMP, trend_to TIMESTAMP, sign INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO coverage_trend_deltas (month, payer_type, coverage_category_id, delta)
+    SELECT date_trunc('month', changed_at)::date,
+           COALESCE(trend_payer_type, 'Unspecified'),
+           trend_category_id,
+           SUM(change)
+    FROM (VALUES (trend_from, sign), (trend_to, -sign)) AS changes(changed_at, change)
+    WHERE changed_at IS NOT NULL
+    GROUP BY 1
+    HAVING SUM(change) <> 0;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION maintain_coverage_trend()
+RETURNS TRIGGER AS $$
+DECLARE
+    trend_payer_type VARCHAR(100);
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        -- A deleted payer already removed its versions (remove_payer_coverage_trend)
+        SELECT payer_type INTO trend_payer_type FROM payers WHERE id = OLD.payer_id;
+        IF FOUND THEN
+            PERFORM adjust_coverage_trend(trend_payer_type, OLD.coverage_category_id,
+                                          OLD.valid_from, OLD.valid_to, -1);
+        END IF;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        SELECT payer_type INTO trend_payer_type FROM payers WHERE id = NEW.payer_id;
+        PERFORM adjust_coverage_trend(trend_payer_type, NEW.coverage_category_id,
+                                      NEW.valid_from, NEW.valid_to, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER maintain_payer_policies_trend
+    AFTER INSERT OR DELETE ON payer_policies
+    FOR EACH ROW
+    EXECUTE FUNCTION maintain_coverage_trend();
+
+CREATE TRIGGER maintain_payer_policies_trend_update
+    AFTER UPDATE ON payer_policies
+    FOR EACH ROW
+    WHEN ((OLD.payer_id, OLD.coverage_category_id, OLD.valid_from, OLD.valid_to)
+          IS DISTINCT FROM (NEW.payer_id, NEW.coverage_category_id, NEW.valid_from, NEW.valid_to))
+    EXECUTE FUNCTION maintain_coverage_trend();
+
+-- Move a payer's versions to its new payer_type, or out of the rollup on delete
+CREATE OR REPLACE FUNCTION move_payer_coverage_trend()
+RETURNS TRIGGER AS $$
+DECLARE
+    version RECORD;
+BEGIN
+    FOR version IN
+        SELECT coverage_category_id, valid_from, valid_to FROM payer_policies WHERE payer_id = OLD.id
+    LOOP
+        PERFORM adjust_coverage_trend(OLD.payer_type, version.coverage_category_id,
+                                      version.valid_from, version.valid_to, -1);
+        IF TG_OP = 'UPDATE' THEN
+            PERFORM adjust_coverage_trend(NEW.payer_type, version.coverage_category_id,
+                                          version.valid_from, version.valid_to, 1);
+        END IF;
+    END LOOP;
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER remove_payer_coverage_trend
+    BEFORE DELETE ON payers
+    FOR EACH ROW
+    EXECUTE FUNCTION move_payer_coverage_trend();
+
+CREATE TRIGGER move_payer_coverage_trend
+    AFTER UPDATE OF payer_type ON payers
+    FOR EACH ROW
+    WHEN (OLD.payer_type IS DISTINCT FROM NEW.payer_type)
+    EXECUTE FUNCTION move_payer_coverage_trend();
+
+-- Recompute the whole rollup (after COPY loads or with triggers disabled)
+CREATE OR REPLACE FUNCTION rebuild_coverage_trend()
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM coverage_trend_deltas;
+    INSERT INTO coverage_trend_deltas (month, payer_type, coverage_category_id, delta)
+    SELECT date_trunc('month', changes.changed_at)::date,
+           COALESCE(p.payer_type, 'Unspecified'),
+           pp.coverage_category_id,
+           SUM(changes.change)
+    FROM payer_policies pp
+    JOIN payers p ON p.id = pp.payer_id
+    CROSS JOIN LATERAL (VALUES (pp.valid_from, 1), (pp.valid_to, -1)) AS changes(changed_at, change)
+    WHERE changes.changed_at IS NOT NULL
+    GROUP BY 1, 2, 3;
+END;
+$$ language 'plpgsql';
+
+-- Fold the rows appended since the last rebuild or compaction into one per
+-- (month, payer_type, category). Safe next to writers: rows inserted after
+-- the DELETE's snapshot are left for the next run. Run it periodically, e.g.
+--   psql -c "SELECT compact_coverage_trend()"
+CREATE OR REPLACE FUNCTION compact_coverage_trend()
+RETURNS VOID AS $$
+BEGIN
+    WITH removed AS (
+        DELETE FROM coverage_trend_deltas RETURNING *
+    )
+    INSERT INTO coverage_trend_deltas (month, payer_type, coverage_category_id, delta)
+    SELECT month, payer_type, coverage_category_id, SUM(delta)
+    FROM removed
+    GROUP BY 1, 2, 3;
+END;
+$$ language 'plpgsql';
+
+-- Row-level change notifications for the dashboard's live stream (change_feed.py)
+CREATE OR REPLACE FUNCTION notify_payer_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_payer_id INTEGER;
+BEGIN
+    IF TG_TABLE_NAME = 'payers' THEN
+        changed_payer_id := COALESCE(NEW.id, OLD.id);
+    ELSIF NOT COALESCE(NEW.is_current, OLD.is_current) THEN
+        RETURN NULL;  -- archived versions do not change the listing
+    ELSE
+        changed_payer_id := COALESCE(NEW.payer_id, OLD.payer_id);
+    END IF;
+    PERFORM pg_notify('payer_changes', json_build_object(
+        'table', TG_TABLE_NAME, 'op', TG_OP, 'payer_id', changed_payer_id)::text);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_payers_change
+    AFTER INSERT OR UPDATE OR DELETE ON payers
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_payer_change();
+
+CREATE TRIGGER notify_payer_policies_change
+    AFTER INSERT OR UPDATE OR DELETE ON payer_policies
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_payer_change();
+
 -- View for payer with latest policy info
 CREATE VIEW payer_coverage_view AS
 SELECT
     p.id,
     p.name,
     p.payer_type,
-    pp.coverage_status,
+    cc.name AS coverage_status,
     pp.prior_auth_required,
     pp.investigational,
     pp.not_med_necessary,
@@ -121,18 +447,40 @@ SELECT
     pp.source_url,
     cc.color_code
 FROM payers p
-LEFT JOIN payer_policies pp ON p.id = pp.payer_id
-LEFT JOIN coverage_categories cc ON pp.coverage_status = cc.name
+LEFT JOIN payer_policies pp ON p.id = pp.payer_id AND pp.is_current
+LEFT JOIN coverage_categories cc ON cc.id = pp.coverage_status_id
 ORDER BY p.name;
 
+-- Coverage history: every version of every payer's policy, newest first
+CREATE VIEW payer_coverage_history AS
+SELECT
+    p.id AS payer_id,
+    p.name,
+    pp.id AS policy_id,
+    cc.name AS coverage_status,
+    pp.prior_auth_required,
+    pp.investigational,
+    pp.valid_from,
+    pp.valid_to,
+    pp.is_current
+FROM payers p
+JOIN payer_policies pp ON p.id = pp.payer_id
+LEFT JOIN coverage_categories cc ON cc.id = pp.coverage_status_id
+ORDER BY p.name, pp.valid_from DESC;
+
 -- Summary stats view
 CREATE VIEW coverage_summary AS
 SELECT
-    coverage_status,
-    COUNT(*) as count
-FROM payer_policies
-GROUP BY coverage_status
-ORDER BY count DESC;
+    cc.name AS coverage_status,
+    s.count
+FROM (
+    SELECT coverage_status_id, COUNT(*) as count
+    FROM payer_policies
+    WHERE is_current
+    GROUP BY coverage_status_id
+) s
+LEFT JOIN coverage_categories cc ON cc.id = s.coverage_status_id
+ORDER BY s.count DESC;
 
 -- Payer type summary view
 CREATE VIEW payer_type_summary AS
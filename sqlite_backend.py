@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Embedded, read-only SQLite backend for the E0469 dashboard.
+
+load_data.py --sqlite PATH copies the tables the read endpoints use out of
+PostgreSQL into one SQLite file, with the same indexes and the source's data
+version:
+
+    python3 load_data.py --sqlite e0469_analysis.sqlite3
+    python3 load_data.py --sqlite e0469_analysis.sqlite3 --snapshot-only
+
+and the dashboard serves it without a database server:
+
+    DB_BACKEND=sqlite SQLITE_PATH=e0469_analysis.sqlite3 python3 dashboard.py
+
+The file is opened read-only, so any number of processes or hosts can
+share a copy. A new snapshot is written next to the old one and renamed
+over it; replace deployed copies the same way (mv, not an in-place cp).
+
+connect() returns a connection whose cursors take the psycopg2 paramstyle
+(%s, with %% for a literal %), turn ILIKE into SQLite's LIKE (which ignores
+ASCII case) and return dict rows, so the dashboard's portable queries run
+unchanged. Statements that build JSON in Postgres have SQLite twins here.
+"""
+
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timezone
+
+import psycopg2
+import psycopg2.extensions
+
+from http_cache import DATA_VERSION_SQL
+from instrumentation import query_timer, span
+
+# Rows copied per round trip when writing a snapshot
+SNAPSHOT_BATCH_ROWS = 5000
+
+# Columns copied from each table: the ones the read endpoints use
+SNAPSHOT_TABLES = {
+    "coverage_categories": ("id", "name", "category_id", "color_code", "description", "sort_order"),
+    "payers": ("id", "name", "payer_type", "state"),
+    "payer_policies": ("id", "payer_id", "coverage_status_id", "coverage_category_id",
+                       "prior_auth_required", "investigational", "not_med_necessary", "policy_date",
+                       "policy_number", "notes", "source_url", "valid_from", "valid_to", "is_current"),
+    "searched_payers": ("id", "name", "payer_type", "notes", "date_searched"),
+    "coverage_trend_deltas": ("month", "payer_type", "coverage_category_id", "delta"),
+}
+
+# Timestamps are stored as ISO 8601 text, booleans as 0/1
+SNAPSHOT_SCHEMA_SQL = """
+    CREATE TABLE coverage_categories (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        category_id INTEGER NOT NULL,
+        color_code TEXT,
+        description TEXT,
+        sort_order INTEGER
+    );
+    CREATE TABLE payers (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        payer_type TEXT,
+        state TEXT
+    );
+    CREATE TABLE payer_policies (
+        id INTEGER PRIMARY KEY,
+        payer_id INTEGER NOT NULL,
+        coverage_status_id INTEGER,
+        coverage_category_id INTEGER,
+        prior_auth_required TEXT,
+        investigational TEXT,
+        not_med_necessary TEXT,
+        policy_date TEXT,
+        policy_number TEXT,
+        notes TEXT,
+        source_url TEXT,
+        valid_from TEXT NOT NULL,
+        valid_to TEXT,
+        is_current INTEGER NOT NULL
+    );
+    CREATE TABLE searched_payers (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        payer_type TEXT,
+        notes TEXT,
+        date_searched DATE
+    );
+    CREATE TABLE coverage_trend_deltas (
+        month DATE NOT NULL,
+        payer_type TEXT NOT NULL,
+        coverage_category_id INTEGER,
+        delta INTEGER NOT NULL
+    );
+    CREATE TABLE snapshot_info (
+        version REAL NOT NULL,
+        created_at TEXT NOT NULL
+    );
+"""
+
+# schema.sql's read indexes, built after the bulk copy
+SNAPSHOT_INDEXES_SQL = """
+    CREATE INDEX idx_payers_name ON payers(name);
+    CREATE INDEX idx_payers_type ON payers(payer_type);
+    CREATE INDEX idx_payers_state ON payers(state, name);
+    CREATE UNIQUE INDEX idx_payer_policies_current ON payer_policies(payer_id) WHERE is_current;
+    CREATE INDEX idx_payer_policies_payer_id ON payer_policies(payer_id, valid_from);
+    CREATE INDEX idx_payer_policies_coverage ON payer_policies(coverage_category_id);
+    CREATE INDEX idx_payer_policies_coverage_status ON payer_policies(coverage_status_id);
+    CREATE INDEX idx_searched_payers_type ON searched_payers(payer_type);
+    CREATE INDEX idx_coverage_trend_deltas ON coverage_trend_deltas(month, payer_type, coverage_category_id);
+"""
+
+# The data version of the source database when the snapshot was taken
+SNAPSHOT_VERSION_SQL = "SELECT version FROM snapshot_info"
+
+
+def snapshot_value(value):
+    """A Postgres value as stored in the snapshot; timestamps as Postgres' JSON writes them."""
+    if isinstance(value, datetime):
+        text = value.isoformat()
+        return text.rstrip("0") if "." in text else text
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def write_snapshot(pg_conn, path):
+    """Copy the dashboard's read tables from pg_conn into a new SQLite file at path.
+
+    Reads one REPEATABLE READ transaction, so the snapshot is consistent;
+    pg_conn must not be inside a transaction. The file is built under a
+    temporary name and renamed over path, so readers never see it half written.
+    """
+    temporary = path + ".tmp"
+    if os.path.exists(temporary):
+        os.remove(temporary)
+
+    db = sqlite3.connect(temporary)
+    try:
+        db.executescript(SNAPSHOT_SCHEMA_SQL)
+        with pg_conn:
+            cur = pg_conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            cur.execute(DATA_VERSION_SQL)
+            version = float(cur.fetchone()[0] or 0)
+
+            for table, columns in SNAPSHOT_TABLES.items():
+                insert = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                          f"VALUES ({', '.join('?' for _ in columns)})")
+                rows = pg_conn.cursor(name=f"snapshot_{table}", cursor_factory=psycopg2.extensions.cursor)
+                rows.itersize = SNAPSHOT_BATCH_ROWS
+                rows.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY 1")
+                while True:
+                    batch = rows.fetchmany(SNAPSHOT_BATCH_ROWS)
+                    if not batch:
+                        break
+                    db.executemany(insert, ([snapshot_value(value) for value in row] for row in batch))
+                rows.close()
+
+        db.execute("INSERT INTO snapshot_info (version, created_at) VALUES (?, ?)",
+                   (version, datetime.now(timezone.utc).isoformat()))
+        db.executescript(SNAPSHOT_INDEXES_SQL)
+        db.execute("ANALYZE")
+        db.commit()
+        db.close()
+        os.replace(temporary, path)
+    except BaseException:
+        db.close()
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return version
+
+
+# Dates go in as ISO text and DATE columns come back as dates, as from psycopg2
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+
+# psycopg2 placeholders, and the %% escape they imply
+PARAMETER_RE = re.compile(r"%[s%]")
+ILIKE_RE = re.compile(r"\bILIKE\b", re.IGNORECASE)
+
+
+def translate(query, params):
+    """Rewrite a psycopg2-style statement for sqlite3 (qmark paramstyle, LIKE for ILIKE)."""
+    query = ILIKE_RE.sub("LIKE", query)
+    if params is None:
+        return query, ()
+    return PARAMETER_RE.sub(lambda m: "?" if m.group() == "%s" else "%", query), params
+
+
+def dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SnapshotCursor:
+    """sqlite3 cursor with psycopg2's paramstyle, timed like InstrumentedCursor."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        # Accepted for named-cursor callers; sqlite3 already steps through rows lazily
+        self.itersize = SNAPSHOT_BATCH_ROWS
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, query, vars=None):
+        with query_timer(query):
+            self._cursor.execute(*translate(query, vars))
+
+    def fetchone(self):
+        with span("fetch"):
+            return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        with span("fetch"):
+            return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def fetchall(self):
+        with span("fetch"):
+            return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SnapshotConnection:
+    """Read-only connection to a snapshot, shaped like the psycopg2 connections it stands in for."""
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"SQLite snapshot not found: {path}")
+        uri = "file:" + path.replace("?", "%3f").replace("#", "%23") + "?mode=ro"
+        self._conn = sqlite3.connect(uri, uri=True, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._conn.row_factory = dict_row
+
+    def cursor(self, name=None, **kwargs):
+        return SnapshotCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+def connect(path):
+    return SnapshotConnection(path)
+
+
+def json_array_sql(select_sql, columns, values=None):
+    """Scalar subquery returning select_sql's rows as a JSON array of objects, in its order.
+
+    values maps a column to the SQL expression (over t) that replaces it,
+    e.g. to emit a nested JSON value or a formatted date.
+    """
+    values = values or {}
+    pairs = ", ".join(f"'{column}', {values.get(column, f't.{column}')}" for column in columns)
+    return f"(SELECT json_group_array(json_object({pairs})) FROM ({select_sql}) t)"
+
+
+def http_date_sql(column):
+    """A DATE column as Flask's JSON encoder writes dates (RFC 822, midnight GMT)."""
+    return (f"substr('SunMonTueWedThuFriSat', 3 * strftime('%w', {column}) + 1, 3) || ', ' || "
+            f"strftime('%d ', {column}) || "
+            f"substr('JanFebMarAprMayJunJulAugSepOctNovDec', 3 * strftime('%m', {column}) - 2, 3) || "
+            f"strftime(' %Y 00:00:00 GMT', {column})")
+
+
+def payers_facets_sql(where_sql, investigational_sql):
+    """build_payers_query's facet statement: the total and {facet: [{value, count}]} JSON.
+
+    SQLite has no GROUPING SETS, so each facet is its own GROUP BY over the
+    filtered rows, which are materialized once.
+    """
+    def facet(name):
+        return f"""json((SELECT json_group_array(json_object('value', value, 'count', count))
+                    FROM (SELECT value, count FROM facet_counts WHERE facet = '{name}'
+                          ORDER BY count DESC, value NULLS LAST)))"""
+
+    return f"""
+        WITH filtered AS MATERIALIZED (
+            SELECT
+                p.payer_type,
+                pp.coverage_status_id,
+                pp.coverage_category_id,
+                {investigational_sql} AS investigational
+            FROM payers p
+            LEFT JOIN payer_policies pp ON p.id = pp.payer_id AND pp.is_current
+            WHERE {where_sql}
+        ),
+        facet_counts AS (
+            SELECT 'payer_type' AS facet, payer_type AS value, COUNT(*) AS count
+            FROM filtered GROUP BY payer_type
+            UNION ALL
+            SELECT 'coverage_status', cc.name, COUNT(*)
+            FROM filtered f LEFT JOIN coverage_categories cc ON cc.id = f.coverage_status_id
+            GROUP BY f.coverage_status_id
+            UNION ALL
+            SELECT 'coverage_category', cc.name, COUNT(*)
+            FROM filtered f LEFT JOIN coverage_categories cc ON cc.id = f.coverage_category_id
+            GROUP BY f.coverage_category_id
+            UNION ALL
+            SELECT 'investigational', investigational, COUNT(*)
+            FROM filtered GROUP BY investigational
+        )
+        SELECT
+            (SELECT COUNT(*) FROM filtered) AS count,
+            json_object(
+                'payer_type', {facet('payer_type')},
+                'coverage_status', {facet('coverage_status')},
+                'coverage_category', {facet('coverage_category')},
+                'investigational', {facet('investigational')}
+            ) AS facets
+    """
+
+
+def payer_batch_sql(select_sql, fields):
+    """build_payer_batch_query's statement; select_sql joins the requested ids as r.
+
+    Takes the ids as one JSON array parameter.
+    """
+    return f"""
+        WITH requested AS (
+            SELECT value AS id, key AS ord FROM json_each(%s)
+        )
+        SELECT
+            {json_array_sql(select_sql, fields)} AS payers,
+            (SELECT json_group_array(id)
+             FROM (SELECT r.id FROM requested r
+                   WHERE NOT EXISTS (SELECT 1 FROM payers p WHERE p.id = r.id)
+                   ORDER BY r.ord)) AS missing
+    """
+
+
+def coverage_trend_sql(type_filter):
+    """build_coverage_trend_query's statement, with the same parameters."""
+    return f"""
+        WITH RECURSIVE deltas AS (
+            SELECT MAX(month, %s) AS month, payer_type, coverage_category_id, SUM(delta) AS delta
+            FROM coverage_trend_deltas
+            WHERE month <= %s {type_filter}
+            GROUP BY 1, 2, 3
+        ),
+        series AS (
+            SELECT DISTINCT payer_type, coverage_category_id FROM deltas
+        ),
+        months(month) AS (
+            SELECT %s
+            UNION ALL
+            SELECT date(month, '+1 month') FROM months WHERE month < %s
+        )
+        SELECT
+            s.payer_type,
+            COALESCE(cc.name, 'Unspecified') AS coverage_status,
+            CAST(SUM(COALESCE(d.delta, 0)) OVER (
+                PARTITION BY s.payer_type, s.coverage_category_id ORDER BY m.month
+            ) AS INTEGER) AS count
+        FROM series s
+        CROSS JOIN months m
+        LEFT JOIN deltas d
+            ON d.month = m.month AND d.payer_type = s.payer_type
+            AND d.coverage_category_id IS s.coverage_category_id
+        LEFT JOIN coverage_categories cc ON cc.id = s.coverage_category_id
+        ORDER BY s.payer_type, s.coverage_category_id NULLS LAST, m.month
+    """
+
+
+# dashboard.POLICY_HISTORY_SQL
+POLICY_HISTORY_SQL = f"""
+        SELECT p.id, p.name, {json_array_sql('''
+                SELECT
+                    pp.id AS policy_id,
+                    cs.name AS coverage_status,
+                    cg.name AS coverage_category,
+                    COALESCE(cg.color_code, '#E2E8F0') AS color_code,
+                    pp.prior_auth_required,
+                    pp.investigational,
+                    pp.not_med_necessary,
+                    pp.policy_date,
+                    pp.policy_number,
+                    pp.notes,
+                    pp.source_url,
+                    pp.valid_from,
+                    pp.valid_to,
+                    pp.is_current
+                FROM payer_policies pp
+                LEFT JOIN coverage_categories cs ON cs.id = pp.coverage_status_id
+                LEFT JOIN coverage_categories cg ON cg.id = pp.coverage_category_id
+                WHERE pp.payer_id = p.id
+                ORDER BY pp.valid_from DESC, pp.id DESC''',
+            ['policy_id', 'coverage_status', 'coverage_category', 'color_code', 'prior_auth_required',
+             'investigational', 'not_med_necessary', 'policy_date', 'policy_number', 'notes',
+             'source_url', 'valid_from', 'valid_to', 'is_current'],
+            {'is_current': "json(CASE WHEN t.is_current THEN 'true' ELSE 'false' END)"})} AS versions
+        FROM payers p
+        WHERE p.id = %s
+"""
+
+# dashboard.STATE_COVERAGE_SQL
+STATE_COVERAGE_SQL = f"""
+        WITH by_status AS (
+            SELECT
+                p.state,
+                pp.coverage_category_id,
+                COUNT(*) as payer_count
+            FROM payers p
+            JOIN payer_policies pp ON p.id = pp.payer_id AND pp.is_current
+            WHERE p.state IS NOT NULL AND pp.coverage_category_id IS NOT NULL
+            GROUP BY p.state, pp.coverage_category_id
+        ),
+        by_state AS (
+            SELECT
+                b.state,
+                MAX(b.coverage_category_id) as coverage_category_id,
+                SUM(b.payer_count) as total_payers,
+                json_group_object(cc.name, b.payer_count) as statuses
+            FROM by_status b
+            JOIN coverage_categories cc ON cc.id = b.coverage_category_id
+            GROUP BY b.state
+        )
+        SELECT {json_array_sql('''
+            SELECT
+                s.state,
+                cc.name AS coverage_status,
+                COALESCE(cc.color_code, '#E2E8F0') AS color,
+                s.total_payers,
+                s.statuses
+            FROM by_state s
+            LEFT JOIN coverage_categories cc ON cc.id = s.coverage_category_id
+            ORDER BY s.state''',
+            ['state', 'coverage_status', 'color', 'total_payers', 'statuses'],
+            {'statuses': 'json(t.statuses)'})} as states
+    """
+